@@ -7,28 +7,72 @@ https://github.com/raemond/bay_511
 
 from __future__ import annotations
 
+import asyncio
+from collections import defaultdict
 from datetime import timedelta
 from typing import TYPE_CHECKING
 
 from homeassistant.const import Platform
+from homeassistant.core import callback
+from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.loader import async_get_loaded_integration
 
+from .accuracy import Bay511AccuracyStore
 from .api import Bay511ApiClient
+from .cache import async_get_response_cache
 from .const import (
     CONF_AGENCY,
     CONF_API_KEY,
+    CONF_BACKGROUND_STARTUP,
+    CONF_EXTRA_API_KEYS,
+    CONF_FETCH_MODE,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_SCHEDULE_FALLBACK,
+    CONF_SERVICE_ALERTS,
+    CONF_STARTUP_CONCURRENCY,
     CONF_STOP_CODE,
     CONF_STOPS,
+    CONF_TRIP_UPDATE_AGENCIES,
+    CONF_UPDATE_INTERVAL,
+    CONF_VEHICLES,
+    DEFAULT_BACKGROUND_STARTUP,
+    DEFAULT_FETCH_MODE,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_SCHEDULE_FALLBACK,
+    DEFAULT_SERVICE_ALERTS,
+    DEFAULT_STARTUP_CONCURRENCY,
     DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_VEHICLES,
+    FETCH_MODE_AGENCY,
+    FETCH_MODE_AUTO,
+    SCHEDULE_CHECK_INTERVAL,
 )
 from .const import DOMAIN as DOMAIN
 from .const import LOGGER as LOGGER
-from .coordinator import Bay511DataUpdateCoordinator
+from .coordinator import (
+    Bay511AgencyDataUpdateCoordinator,
+    Bay511AlertsDataUpdateCoordinator,
+    Bay511DataUpdateCoordinator,
+    Bay511VehicleDataUpdateCoordinator,
+)
 from .data import Bay511Data
+from .models import StopSnapshot
+from .polling import Bay511PollingPolicy
+from .ratelimit import async_get_api_key_pool
+from .schedule import async_get_schedule
+from .services import async_setup_services
+from .storage import Bay511SnapshotStore
 
 if TYPE_CHECKING:
+    from datetime import datetime
+
     from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.typing import ConfigType
+    from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
     from .data import Bay511ConfigEntry
 
@@ -36,6 +80,14 @@ PLATFORMS: list[Platform] = [
     Platform.SENSOR,
 ]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:  # noqa: ARG001
+    """Set up the integration's services."""
+    async_setup_services(hass)
+    return True
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -43,31 +95,77 @@ async def async_setup_entry(
 ) -> bool:
     """Set up this integration using UI."""
     # Create API client
+    api_keys = _api_keys(entry)
     client = Bay511ApiClient(
-        api_key=entry.data[CONF_API_KEY],
+        api_key=api_keys,
         session=async_get_clientsession(hass),
+        budget=async_get_api_key_pool(hass, api_keys),
+        cache=async_get_response_cache(hass),
     )
 
-    # Create coordinators for each stop
-    coordinators = {}
-    for stop in entry.data[CONF_STOPS]:
-        stop_key = f"{stop[CONF_AGENCY]}_{stop[CONF_STOP_CODE]}"
-        coordinator = Bay511DataUpdateCoordinator(
-            hass=hass,
-            client=client,
-            agency=stop[CONF_AGENCY],
-            stop_code=stop[CONF_STOP_CODE],
-            update_interval=timedelta(seconds=DEFAULT_UPDATE_INTERVAL),
-        )
-        coordinators[stop_key] = coordinator
+    coordinators, agency_coordinators = _create_coordinators(hass, entry, client)
+    _async_setup_schedules(hass, entry, client, coordinators, agency_coordinators)
 
+    # Coordinators that fetch from the API themselves
+    pollers: list[DataUpdateCoordinator] = [
+        *agency_coordinators.values(),
+        *(c for c in coordinators.values() if c.polling is not None),
+    ]
+    for poller in pollers:
+        entry.async_on_unload(client.budget.register(poller))
+    vehicle_coordinators = _create_vehicle_coordinators(
+        hass, entry, client, coordinators
+    )
+    alert_coordinators = _create_alert_coordinators(hass, entry, client, coordinators)
+
+    # Show the last known arrivals until the first live poll
+    snapshot_store = Bay511SnapshotStore(hass, entry.entry_id)
+    await _async_restore_snapshots(snapshot_store, coordinators, agency_coordinators)
+
+    # Restored pollers skip the first refresh and poll on their spread-out
+    # schedule instead
+    pending = []
+    for poller in pollers:
+        if poller.data is None:
+            pending.append(poller)
+        elif isinstance(poller, Bay511AgencyDataUpdateCoordinator):
+            poller.schedule_next_poll(list(poller.data.values()))
+        else:
+            poller.schedule_next_poll([poller.data])
+
+    accuracy_store = Bay511AccuracyStore(hass, entry.entry_id)
+    await accuracy_store.async_load()
+
+    for stop_key, coordinator in coordinators.items():
+        entry.async_on_unload(snapshot_store.async_track(stop_key, coordinator))
+        entry.async_on_unload(accuracy_store.async_track(stop_key, coordinator))
+        entry.async_on_unload(coordinator.async_start_countdown())
+
+    concurrency = int(
+        entry.options.get(CONF_STARTUP_CONCURRENCY, DEFAULT_STARTUP_CONCURRENCY)
+    )
+    background_startup = entry.options.get(
+        CONF_BACKGROUND_STARTUP, DEFAULT_BACKGROUND_STARTUP
+    )
+    if background_startup:
+        # Let sensors without a stored snapshot start out empty instead of
+        # waiting for the network
+        for coordinator in coordinators.values():
+            if coordinator.data is None:
+                coordinator.data = StopSnapshot.empty(coordinator.stop_code)
+    else:
         # Fetch initial data
-        await coordinator.async_config_entry_first_refresh()
+        await _async_refresh_all(pending, concurrency, first_refresh=True)
 
     # Store runtime data
     entry.runtime_data = Bay511Data(
         client=client,
         coordinators=coordinators,
+        agency_coordinators=agency_coordinators,
+        vehicle_coordinators=vehicle_coordinators,
+        alert_coordinators=alert_coordinators,
+        snapshot_store=snapshot_store,
+        accuracy_store=accuracy_store,
         integration=async_get_loaded_integration(hass, entry.domain),
     )
 
@@ -75,15 +173,273 @@ async def async_setup_entry(
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
+    if background_startup:
+        entry.async_create_background_task(
+            hass,
+            _async_refresh_all(pending, concurrency, first_refresh=False),
+            f"{DOMAIN} first refresh",
+        )
+
     return True
 
 
+def _create_coordinators(
+    hass: HomeAssistant,
+    entry: Bay511ConfigEntry,
+    client: Bay511ApiClient,
+) -> tuple[
+    dict[str, Bay511DataUpdateCoordinator],
+    dict[str, Bay511AgencyDataUpdateCoordinator],
+]:
+    """Create a coordinator per stop and per agency fetched as a whole."""
+    fetch_mode = entry.options.get(CONF_FETCH_MODE, DEFAULT_FETCH_MODE)
+    trip_update_agencies = {
+        agency.strip().upper()
+        for agency in entry.options.get(CONF_TRIP_UPDATE_AGENCIES, [])
+    }
+
+    stops_by_agency: dict[str, list[str]] = defaultdict(list)
+    for stop in entry.data[CONF_STOPS]:
+        stops_by_agency[stop[CONF_AGENCY]].append(stop[CONF_STOP_CODE])
+
+    # Create coordinators for each stop, fed by one agency-wide fetch where
+    # that saves requests
+    coordinators = {}
+    agency_coordinators = {}
+    for agency, stop_codes in stops_by_agency.items():
+        agency_coordinator = None
+        # The TripUpdates feed only exists agency-wide
+        trip_updates = agency.upper() in trip_update_agencies
+        if trip_updates or _use_agency_fetch(fetch_mode, stop_codes):
+            agency_coordinator = Bay511AgencyDataUpdateCoordinator(
+                hass=hass,
+                client=client,
+                agency=agency,
+                polling=_polling(entry),
+                trip_updates=trip_updates,
+            )
+            agency_coordinators[agency] = agency_coordinator
+            # No entity listens to the agency coordinator directly
+            _keep_polling(entry, agency_coordinator)
+
+        for stop_code in stop_codes:
+            stop_key = f"{agency}_{stop_code}"
+            coordinator = Bay511DataUpdateCoordinator(
+                hass=hass,
+                client=client,
+                agency=agency,
+                stop_code=stop_code,
+                polling=None if agency_coordinator else _polling(entry),
+            )
+            coordinators[stop_key] = coordinator
+
+            if agency_coordinator:
+                agency_coordinator.add_stop(coordinator)
+
+    return coordinators, agency_coordinators
+
+
+def _create_vehicle_coordinators(
+    hass: HomeAssistant,
+    entry: Bay511ConfigEntry,
+    client: Bay511ApiClient,
+    coordinators: dict[str, Bay511DataUpdateCoordinator],
+) -> dict[str, Bay511VehicleDataUpdateCoordinator]:
+    """Create a coordinator tracking the vehicles of each agency's lines."""
+    vehicle_coordinators: dict[str, Bay511VehicleDataUpdateCoordinator] = {}
+    if not entry.options.get(CONF_VEHICLES, DEFAULT_VEHICLES):
+        return vehicle_coordinators
+    for coordinator in coordinators.values():
+        vehicle_coordinator = vehicle_coordinators.get(coordinator.agency)
+        if vehicle_coordinator is None:
+            vehicle_coordinator = Bay511VehicleDataUpdateCoordinator(
+                hass=hass,
+                client=client,
+                agency=coordinator.agency,
+                polling=_polling(entry),
+            )
+            vehicle_coordinators[coordinator.agency] = vehicle_coordinator
+            entry.async_on_unload(client.budget.register(vehicle_coordinator))
+            # The lines to track are only known once the stops have arrivals,
+            # so the first poll waits for the update interval instead of
+            # delaying startup
+            _keep_polling(entry, vehicle_coordinator)
+        vehicle_coordinator.add_stop(coordinator)
+    return vehicle_coordinators
+
+
+def _create_alert_coordinators(
+    hass: HomeAssistant,
+    entry: Bay511ConfigEntry,
+    client: Bay511ApiClient,
+    coordinators: dict[str, Bay511DataUpdateCoordinator],
+) -> dict[str, Bay511AlertsDataUpdateCoordinator]:
+    """Create a coordinator fetching the service alerts of each agency."""
+    alert_coordinators: dict[str, Bay511AlertsDataUpdateCoordinator] = {}
+    if not entry.options.get(CONF_SERVICE_ALERTS, DEFAULT_SERVICE_ALERTS):
+        return alert_coordinators
+    for coordinator in coordinators.values():
+        alert_coordinator = alert_coordinators.get(coordinator.agency)
+        if alert_coordinator is None:
+            alert_coordinator = Bay511AlertsDataUpdateCoordinator(
+                hass=hass, client=client, agency=coordinator.agency
+            )
+            alert_coordinators[coordinator.agency] = alert_coordinator
+            entry.async_on_unload(client.budget.register(alert_coordinator))
+            # Stops are notified by the coordinator itself, so nothing else
+            # listens to it
+            _keep_polling(entry, alert_coordinator)
+            # Alerts aren't stored; fetch them without holding up or failing
+            # setup
+            entry.async_create_background_task(
+                hass,
+                alert_coordinator.async_refresh(),
+                f"{DOMAIN} {coordinator.agency} alerts",
+            )
+        alert_coordinator.add_stop(coordinator)
+    return alert_coordinators
+
+
+def _async_setup_schedules(
+    hass: HomeAssistant,
+    entry: Bay511ConfigEntry,
+    client: Bay511ApiClient,
+    coordinators: dict[str, Bay511DataUpdateCoordinator],
+    agency_coordinators: dict[str, Bay511AgencyDataUpdateCoordinator],
+) -> None:
+    """Give coordinators their agency's schedule and keep the schedules indexed."""
+    schedules = {}
+    if entry.options.get(CONF_SCHEDULE_FALLBACK, DEFAULT_SCHEDULE_FALLBACK):
+        for coordinator in coordinators.values():
+            coordinator.schedule = schedules.get(coordinator.agency)
+            if coordinator.schedule is None:
+                coordinator.schedule = async_get_schedule(hass, coordinator.agency)
+                schedules[coordinator.agency] = coordinator.schedule
+    # TripUpdates feeds refer to stops by GTFS stop_id, which the schedule
+    # translates to stop codes
+    for agency, agency_coordinator in agency_coordinators.items():
+        if agency_coordinator.trip_updates:
+            agency_coordinator.schedule = schedules.get(agency)
+            if agency_coordinator.schedule is None:
+                agency_coordinator.schedule = async_get_schedule(hass, agency)
+                schedules[agency] = agency_coordinator.schedule
+    if not schedules:
+        return
+
+    @callback
+    def _async_update_schedules(_now: datetime | None = None) -> None:
+        # Feeds are only downloaded or indexed again once they are outdated
+        for agency, schedule in schedules.items():
+            entry.async_create_background_task(
+                hass, schedule.async_update(client), f"{DOMAIN} {agency} schedule"
+            )
+
+    _async_update_schedules()
+    entry.async_on_unload(
+        async_track_time_interval(
+            hass, _async_update_schedules, timedelta(seconds=SCHEDULE_CHECK_INTERVAL)
+        )
+    )
+
+
+async def _async_restore_snapshots(
+    snapshot_store: Bay511SnapshotStore,
+    coordinators: dict[str, Bay511DataUpdateCoordinator],
+    agency_coordinators: dict[str, Bay511AgencyDataUpdateCoordinator],
+) -> None:
+    """Give coordinators the snapshots saved before the last shutdown."""
+    for stop_key, snapshot in (await snapshot_store.async_load()).items():
+        if stop_key in coordinators:
+            coordinators[stop_key].data = snapshot
+    for agency_coordinator in agency_coordinators.values():
+        agency_coordinator.restore_from_stops()
+
+
+async def _async_refresh_all(
+    coordinators: list[DataUpdateCoordinator],
+    concurrency: int,
+    *,
+    first_refresh: bool,
+) -> None:
+    """Refresh coordinators concurrently, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _async_refresh(coordinator: DataUpdateCoordinator) -> None:
+        async with semaphore:
+            if first_refresh:
+                await coordinator.async_config_entry_first_refresh()
+            else:
+                await coordinator.async_refresh()
+
+    results = await asyncio.gather(
+        *(_async_refresh(coordinator) for coordinator in coordinators),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+def _keep_polling(entry: Bay511ConfigEntry, coordinator: DataUpdateCoordinator) -> None:
+    """Keep a coordinator that no entity listens to polling while loaded."""
+    # Coordinators only schedule their next refresh while they have listeners
+    entry.async_on_unload(coordinator.async_add_listener(lambda: None))
+
+
+def _api_keys(entry: Bay511ConfigEntry) -> list[str]:
+    """Return the entry's API key followed by its extra keys."""
+    api_keys = [entry.data[CONF_API_KEY]]
+    for api_key in entry.options.get(CONF_EXTRA_API_KEYS, []):
+        if (api_key := api_key.strip()) and api_key not in api_keys:
+            api_keys.append(api_key)
+    return api_keys
+
+
+def _polling(entry: Bay511ConfigEntry) -> Bay511PollingPolicy:
+    """Return a polling policy from the interval options."""
+    return Bay511PollingPolicy(
+        base_interval=_option_interval(
+            entry, CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL
+        ),
+        min_interval=_option_interval(
+            entry, CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL
+        ),
+        max_interval=_option_interval(
+            entry, CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL
+        ),
+    )
+
+
+def _option_interval(entry: Bay511ConfigEntry, key: str, default: int) -> timedelta:
+    """Return an interval option given in seconds."""
+    return timedelta(seconds=entry.options.get(key, default))
+
+
+def _use_agency_fetch(fetch_mode: str, stop_codes: list[str]) -> bool:
+    """Return whether an agency's stops should share one StopMonitoring fetch."""
+    if fetch_mode == FETCH_MODE_AUTO:
+        return len(stop_codes) > 1
+    return fetch_mode == FETCH_MODE_AGENCY
+
+
 async def async_unload_entry(
     hass: HomeAssistant,
     entry: Bay511ConfigEntry,
 ) -> bool:
     """Handle removal of an entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        await entry.runtime_data.snapshot_store.async_flush()
+        await entry.runtime_data.accuracy_store.async_flush()
+    return unload_ok
+
+
+async def async_remove_entry(
+    hass: HomeAssistant,
+    entry: Bay511ConfigEntry,
+) -> None:
+    """Delete stored data when an entry is removed."""
+    await Bay511SnapshotStore(hass, entry.entry_id).async_remove()
+    await Bay511AccuracyStore(hass, entry.entry_id).async_remove()
 
 
 async def async_reload_entry(
@@ -92,4 +448,3 @@ async def async_reload_entry(
 ) -> None:
     """Reload config entry."""
     await hass.config_entries.async_reload(entry.entry_id)
-
@@ -0,0 +1,270 @@
+"""History of how accurate 511's predicted arrival times turn out to be."""
+
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    ACCURACY_BUFFER_SIZE,
+    ACCURACY_LEAD,
+    ACCURACY_PERCENTILES,
+    ACCURACY_SAVE_DELAY,
+    ACCURACY_STORAGE_VERSION,
+    DOMAIN,
+)
+from .models import parse_arrival_time
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from homeassistant.core import HomeAssistant
+
+    from .coordinator import Bay511DataUpdateCoordinator
+    from .models import Arrival, StopSnapshot
+
+# Aimed, expected and observed POSIX times of an arrival
+_FIELDS = 3
+
+
+class Bay511AccuracyBuffer:
+    """
+    The last `size` observed arrivals of a line at a stop.
+
+    Arrivals are kept as consecutive (aimed, expected, observed) integers in
+    one preallocated array that is overwritten in a circle, so adding one is
+    O(1) and the memory used never grows. Percentiles are computed from the
+    buffer when first asked for after an arrival was added.
+    """
+
+    __slots__ = ("_count", "_data", "_head", "_percentiles", "size")
+
+    def __init__(self, size: int = ACCURACY_BUFFER_SIZE) -> None:
+        """Initialize an empty buffer."""
+        self.size = size
+        self._data = array("q", bytes(8 * _FIELDS * size))
+        self._head = 0
+        self._count = 0
+        self._percentiles: dict[str, Any] | None = None
+
+    def __len__(self) -> int:
+        """Return the number of arrivals kept."""
+        return self._count
+
+    def add(self, aimed: int, expected: int, observed: int) -> None:
+        """Add an observed arrival, replacing the oldest once full."""
+        position = self._head * _FIELDS
+        data = self._data
+        data[position] = aimed
+        data[position + 1] = expected
+        data[position + 2] = observed
+        self._head = (self._head + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+        self._percentiles = None
+
+    def records(self) -> list[tuple[int, int, int]]:
+        """Return the kept arrivals, oldest first."""
+        start = (self._head - self._count) % self.size
+        data = self._data
+        records = []
+        for index in range(self._count):
+            position = (start + index) % self.size * _FIELDS
+            records.append((data[position], data[position + 1], data[position + 2]))
+        return records
+
+    def percentiles(self) -> dict[str, Any]:
+        """
+        Return percentiles of the prediction error and delay, in seconds.
+
+        The prediction error is how much later than predicted a vehicle got
+        to the stop, and the delay how much later than scheduled.
+        """
+        if self._percentiles is None:
+            records = self.records()
+            errors = sorted(observed - expected for _, expected, observed in records)
+            delays = sorted(observed - aimed for aimed, _, observed in records)
+            self._percentiles = {
+                "samples": len(records),
+                "prediction_error": _percentiles(errors),
+                "delay": _percentiles(delays),
+            }
+        return self._percentiles
+
+
+def _percentiles(values: list[int]) -> dict[str, int | None]:
+    """Return the nearest-rank percentiles of sorted values."""
+    return {
+        f"p{percentile}": values[min(len(values) - 1, len(values) * percentile // 100)]
+        if values
+        else None
+        for percentile in ACCURACY_PERCENTILES
+    }
+
+
+def _timestamp(value: str | None) -> int | None:
+    """Return the POSIX time of an arrival time."""
+    parsed = parse_arrival_time(value)
+    return int(parsed.timestamp()) if parsed is not None else None
+
+
+def _arrival_key(arrival: Arrival) -> tuple[str | None, str | None, str | None]:
+    """Return what identifies an arrival across updates."""
+    return (arrival.line_ref, arrival.direction, arrival.aimed_arrival_time)
+
+
+class Bay511StopAccuracy:
+    """
+    Prediction accuracy of every line at one stop.
+
+    Each live update remembers, for every arrival not yet at the stop, the
+    last expected time predicted at least `ACCURACY_LEAD` seconds ahead, or
+    the first one if it was never that far out. When `vehicle_at_stop`
+    flips on, the arrival's aimed and remembered expected times and the
+    time of the update are added to the line's buffer.
+    """
+
+    def __init__(self) -> None:
+        """Initialize without any history."""
+        self.buffers: dict[str | None, Bay511AccuracyBuffer] = {}
+        self._predicted: dict[tuple[str | None, str | None, str | None], int] = {}
+        self._fetched_at: float | None = None
+
+    def percentiles(self, line_ref: str | None) -> dict[str, Any] | None:
+        """Return the accuracy of a line's predictions, if any was observed."""
+        buffer = self.buffers.get(line_ref)
+        return buffer.percentiles() if buffer else None
+
+    def observe(self, snapshot: StopSnapshot) -> bool:
+        """Record the arrivals that reached the stop; return if any did."""
+        if snapshot.fetched_at is None:
+            return False
+        now = snapshot.fetched_at.timestamp()
+        if now == self._fetched_at:
+            # A countdown of the same update
+            return False
+        self._fetched_at = now
+
+        predicted = {}
+        recorded = False
+        for arrival in snapshot.arrivals:
+            key = _arrival_key(arrival)
+            expected = _timestamp(arrival.expected_arrival_time)
+            previous = self._predicted.get(key)
+            if arrival.vehicle_at_stop:
+                if previous is not None:
+                    aimed = _timestamp(arrival.aimed_arrival_time)
+                    self.add(arrival.line_ref, aimed or previous, previous, int(now))
+                    recorded = True
+                continue
+            if expected is None:
+                continue
+            if previous is None or expected - now >= ACCURACY_LEAD:
+                predicted[key] = expected
+            else:
+                predicted[key] = previous
+        # Arrivals that left the list without being seen at the stop are
+        # forgotten, so this stays as small as the list
+        self._predicted = predicted
+        return recorded
+
+    def add(
+        self, line_ref: str | None, aimed: int, expected: int, observed: int
+    ) -> None:
+        """Add an observed arrival to a line's buffer."""
+        if (buffer := self.buffers.get(line_ref)) is None:
+            buffer = self.buffers[line_ref] = Bay511AccuracyBuffer()
+        buffer.add(aimed, expected, observed)
+
+    def as_compact(self) -> list[list[Any]]:
+        """Pack the buffers into lists for storage."""
+        return [
+            [line_ref, [value for record in buffer.records() for value in record]]
+            for line_ref, buffer in self.buffers.items()
+        ]
+
+    @classmethod
+    def from_compact(cls, compact: list[list[Any]]) -> Bay511StopAccuracy:
+        """Unpack stored buffers."""
+        accuracy = cls()
+        for line_ref, values in compact:
+            for index in range(0, len(values) - _FIELDS + 1, _FIELDS):
+                accuracy.add(line_ref, *values[index : index + _FIELDS])
+        return accuracy
+
+
+class Bay511AccuracyStore:
+    """
+    Keep the prediction accuracy of every stop on disk.
+
+    Only stops whose buffers changed are packed again, at most once per
+    `ACCURACY_SAVE_DELAY`, so the cost of saving grows with the arrivals
+    observed since the last write rather than with the history kept.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the store for a config entry."""
+        self._store: Store[dict[str, list[list[Any]]]] = Store(
+            hass,
+            ACCURACY_STORAGE_VERSION,
+            f"{DOMAIN}.{entry_id}.accuracy",
+        )
+        self._stops: dict[str, Bay511StopAccuracy] = {}
+        self._compact: dict[str, list[list[Any]]] = {}
+        self._dirty: set[str] = set()
+
+    async def async_load(self) -> None:
+        """Load the stored history."""
+        self._compact = await self._store.async_load() or {}
+
+    @callback
+    def async_track(
+        self, stop_key: str, coordinator: Bay511DataUpdateCoordinator
+    ) -> Callable[[], None]:
+        """Record a coordinator's arrivals and give it their accuracy."""
+        if (accuracy := self._stops.get(stop_key)) is None:
+            compact = self._compact.get(stop_key)
+            accuracy = (
+                Bay511StopAccuracy.from_compact(compact)
+                if compact
+                else Bay511StopAccuracy()
+            )
+            self._stops[stop_key] = accuracy
+        coordinator.accuracy = accuracy
+
+        @callback
+        def _async_observe() -> None:
+            if (
+                coordinator.last_update_success
+                and coordinator.data is not None
+                and not coordinator.stale
+                and not coordinator.scheduled
+                and accuracy.observe(coordinator.data)
+            ):
+                # Only schedule a write when none is pending, so steady
+                # arrivals don't postpone it indefinitely
+                if not self._dirty:
+                    self._store.async_delay_save(
+                        self._data_to_save, ACCURACY_SAVE_DELAY
+                    )
+                self._dirty.add(stop_key)
+
+        return coordinator.async_add_listener(_async_observe)
+
+    async def async_flush(self) -> None:
+        """Write pending changes right away."""
+        await self._store.async_save(self._data_to_save())
+
+    async def async_remove(self) -> None:
+        """Delete the stored history."""
+        await self._store.async_remove()
+
+    @callback
+    def _data_to_save(self) -> dict[str, list[list[Any]]]:
+        """Pack the stops that changed and return the data to write."""
+        for stop_key in self._dirty:
+            self._compact[stop_key] = self._stops[stop_key].as_compact()
+        self._dirty.clear()
+        return self._compact
@@ -0,0 +1,127 @@
+"""Service alerts of an agency, indexed by stop and line and diffed by ID."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .models import ServiceAlert
+
+
+@dataclass(slots=True)
+class Bay511AlertChange:
+    """The stops and lines affected by the alerts added, changed or removed."""
+
+    stop_codes: set[str] = field(default_factory=set)
+    line_refs: set[str] = field(default_factory=set)
+    agency_wide: bool = False
+
+    def __bool__(self) -> bool:
+        """Return whether any alert changed."""
+        return bool(self.stop_codes or self.line_refs or self.agency_wide)
+
+    def add(self, alert: ServiceAlert) -> None:
+        """Add the scope of an alert that was added, changed or removed."""
+        self.stop_codes |= alert.stop_codes
+        self.line_refs |= alert.line_refs
+        self.agency_wide = self.agency_wide or alert.agency_wide
+
+    def affects(self, stop_code: str, line_refs: Iterable[str | None]) -> bool:
+        """Return whether the alerts shown at a stop may have changed."""
+        return (
+            self.agency_wide
+            or stop_code in self.stop_codes
+            or not self.line_refs.isdisjoint(line_refs)
+        )
+
+
+class Bay511AlertIndex:
+    """
+    The alerts of an agency, by the stops and lines they affect.
+
+    Each response is diffed against the previous one by alert ID, and only
+    alerts that were added, removed or changed are re-indexed. The returned
+    `Bay511AlertChange` tells which stops and lines need to show new alerts.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self.alerts: dict[str, ServiceAlert] = {}
+        self._by_stop: dict[str, dict[str, ServiceAlert]] = {}
+        self._by_line: dict[str, dict[str, ServiceAlert]] = {}
+        self._agency_wide: dict[str, ServiceAlert] = {}
+        self.updates = 0
+        self.changed = 0
+
+    def update(self, alerts: Iterable[ServiceAlert]) -> Bay511AlertChange:
+        """Replace the alerts with those of a response and return the change."""
+        change = Bay511AlertChange()
+        current = {alert.alert_id: alert for alert in alerts}
+        self.updates += 1
+        for alert_id in self.alerts.keys() - current.keys():
+            change.add(self._remove(self.alerts[alert_id]))
+            self.changed += 1
+        for alert_id, alert in current.items():
+            previous = self.alerts.get(alert_id)
+            if previous == alert:
+                continue
+            if previous is not None:
+                change.add(self._remove(previous))
+            change.add(self._add(alert))
+            self.changed += 1
+        return change
+
+    def for_stop(
+        self,
+        stop_code: str,
+        line_refs: Iterable[str | None] = (),
+        now: float | None = None,
+    ) -> list[ServiceAlert]:
+        """Return the alerts in effect at a stop served by some lines."""
+        now = now if now is not None else time.time()
+        found = dict(self._agency_wide)
+        found.update(self._by_stop.get(stop_code, {}))
+        for line_ref in line_refs:
+            if line_ref is not None:
+                found.update(self._by_line.get(line_ref, {}))
+        return sorted(
+            (alert for alert in found.values() if alert.active(now)),
+            key=lambda alert: alert.alert_id,
+        )
+
+    def _add(self, alert: ServiceAlert) -> ServiceAlert:
+        """Index an alert and return it."""
+        self.alerts[alert.alert_id] = alert
+        for stop_code in alert.stop_codes:
+            self._by_stop.setdefault(stop_code, {})[alert.alert_id] = alert
+        for line_ref in alert.line_refs:
+            self._by_line.setdefault(line_ref, {})[alert.alert_id] = alert
+        if alert.agency_wide:
+            self._agency_wide[alert.alert_id] = alert
+        return alert
+
+    def _remove(self, alert: ServiceAlert) -> ServiceAlert:
+        """Unindex an alert and return it."""
+        del self.alerts[alert.alert_id]
+        for stop_code in alert.stop_codes:
+            _discard(self._by_stop, stop_code, alert.alert_id)
+        for line_ref in alert.line_refs:
+            _discard(self._by_line, line_ref, alert.alert_id)
+        self._agency_wide.pop(alert.alert_id, None)
+        return alert
+
+
+def _discard(
+    index: dict[str, dict[str, ServiceAlert]], key: str, alert_id: str
+) -> None:
+    """Remove an alert from a bucket, dropping the bucket once empty."""
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    bucket.pop(alert_id, None)
+    if not bucket:
+        del index[key]
@@ -2,15 +2,58 @@
 
 from __future__ import annotations
 
+import codecs
 import json
 import socket
-from datetime import datetime
-from typing import Any
+import time
+from datetime import UTC, datetime
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any
 
 import aiohttp
 import async_timeout
 
-from .const import API_BASE_URL, LOGGER
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from .breaker import Bay511CircuitBreaker
+from .cache import Bay511ResponseCache
+from .const import API_BASE_URL, CACHE_TTL, GTFS_DOWNLOAD_TIMEOUT, LOGGER
+from .gtfs_rt import async_read_trip_updates
+from .metrics import Bay511ClientMetrics
+from .models import Arrival, ServiceAlert, StopSnapshot, intern_string
+from .ratelimit import Bay511ApiKeyPool, Bay511RequestBudget
+from .streaming import (
+    async_read_stop_visits,
+    async_read_vehicle_activities,
+    async_save_stream,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import (
+        Awaitable,
+        Callable,
+        Iterable,
+        Iterator,
+        Mapping,
+        Sequence,
+    )
+    from pathlib import Path
+
+    from .metrics import Bay511EndpointMetrics
+
+
+# GTFS-Realtime feeds are only sent as protobuf when asked for
+_PROTOBUF_HEADERS = {"Accept": "application/x-google-protobuf"}
+
+# Statuses that take the key a request was sent with out of rotation
+_REJECTED_STATUSES = (
+    HTTPStatus.UNAUTHORIZED,
+    HTTPStatus.FORBIDDEN,
+    HTTPStatus.TOO_MANY_REQUESTS,
+)
 
 
 class Bay511ApiClientError(Exception):
@@ -21,160 +64,425 @@ class Bay511ApiClientCommunicationError(Bay511ApiClientError):
     """Exception to indicate a communication error."""
 
 
+class Bay511ApiClientUnavailableError(Bay511ApiClientCommunicationError):
+    """Exception to indicate requests to a failing endpoint are paused."""
+
+
 class Bay511ApiClientAuthenticationError(Bay511ApiClientError):
     """Exception to indicate an authentication error."""
 
 
+class Bay511ApiClientRateLimitError(Bay511ApiClientError):
+    """Exception to indicate the API key's request quota is used up."""
+
+
 def _verify_response_or_raise(response: aiohttp.ClientResponse) -> None:
     """Verify that the response is valid."""
     if response.status in (401, 403):
         msg = "Invalid API key"
         raise Bay511ApiClientAuthenticationError(msg)
+    if response.status == HTTPStatus.TOO_MANY_REQUESTS:
+        msg = "Rate limit exceeded"
+        raise Bay511ApiClientRateLimitError(msg)
     response.raise_for_status()
 
 
+def _decode_json(body: bytes) -> Any:
+    """Decode a JSON response body, skipping a UTF-8 BOM without copying."""
+    if orjson is None:
+        # The stdlib detects and skips the BOM itself when given bytes
+        return json.loads(body)
+    offset = len(codecs.BOM_UTF8) if body.startswith(codecs.BOM_UTF8) else 0
+    return orjson.loads(memoryview(body)[offset:])
+
+
+def _retry_after(response: aiohttp.ClientResponse) -> float | None:
+    """Return the delay requested by a Retry-After header, if any."""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _iter_monitored_stop_visits(data: dict) -> Iterator[dict[str, Any]]:
+    """Yield every MonitoredStopVisit of a stop monitoring response."""
+    # Navigate through the nested JSON structure
+    service_delivery = data.get("ServiceDelivery", {})
+    stop_monitoring = service_delivery.get("StopMonitoringDelivery", {})
+
+    if not stop_monitoring or "MonitoredStopVisit" not in stop_monitoring:
+        return
+
+    visits = stop_monitoring["MonitoredStopVisit"]
+
+    # Handle both single visit and list of visits
+    if not isinstance(visits, list):
+        visits = [visits]
+
+    yield from visits
+
+
 class Bay511ApiClient:
     """Bay Area 511 API Client."""
 
     def __init__(
         self,
-        api_key: str,
+        api_key: str | Sequence[str],
         session: aiohttp.ClientSession,
+        budget: Bay511ApiKeyPool | None = None,
+        cache: Bay511ResponseCache | None = None,
+        base_url: str = API_BASE_URL,
     ) -> None:
         """Initialize Bay Area 511 API Client."""
-        self._api_key = api_key
+        api_keys = [api_key] if isinstance(api_key, str) else api_key
         self._session = session
+        self._base_url = base_url
+        self.budget = budget or Bay511ApiKeyPool(
+            {key: Bay511RequestBudget() for key in api_keys}
+        )
+        self.cache = cache or Bay511ResponseCache()
+        # One breaker per endpoint, shared by every coordinator of the client
+        self.breakers: dict[str, Bay511CircuitBreaker] = {}
+        self.metrics = Bay511ClientMetrics()
 
     async def async_get_stop_monitoring(
         self, agency: str, stop_code: str
-    ) -> dict[str, Any]:
+    ) -> StopSnapshot:
         """Get stop monitoring data for a specific stop."""
         params = {
-            "api_key": self._api_key,
             "agency": agency,
             "stopcode": stop_code,
             "format": "json",
         }
 
-        data = await self._api_wrapper(
-            method="get",
-            url=f"{API_BASE_URL}/StopMonitoring",
-            params=params,
-        )
+        data = await self._cached_get("StopMonitoring", params)
 
-        return self._parse_stop_monitoring(data)
+        start = time.perf_counter()
+        snapshot = self._parse_stop_monitoring(data)
+        self._record_parse("StopMonitoring", time.perf_counter() - start)
+        return snapshot
 
     async def async_get_operators(self) -> list[dict[str, str]]:
         """Get list of transit operators."""
         params = {
-            "api_key": self._api_key,
             "format": "json",
         }
 
-        return await self._api_wrapper(
-            method="get",
-            url=f"{API_BASE_URL}/operators",
-            params=params,
-        )
+        return await self._cached_get("operators", params)
 
-    async def async_get_stops_for_operator(
-        self, operator_id: str
-    ) -> list[dict[str, Any]]:
+    async def async_get_stops_for_operator(self, operator_id: str) -> dict[str, Any]:
         """Get stops for a specific operator."""
         params = {
-            "api_key": self._api_key,
             "operator_id": operator_id,
             "format": "json",
         }
 
-        return await self._api_wrapper(
-            method="get",
-            url=f"{API_BASE_URL}/stops",
-            params=params,
+        return await self._cached_get("stops", params)
+
+    async def async_download_gtfs_feed(self, agency: str, path: Path) -> int:
+        """Download an agency's GTFS feed to a file and return its size."""
+        params = {
+            "operator_id": agency,
+        }
+
+        # Feeds are tens of megabytes; write them out instead of keeping them
+        return await self._guarded_get(
+            "datafeeds",
+            params,
+            lambda response: async_save_stream(response, path),
+            request_timeout=GTFS_DOWNLOAD_TIMEOUT,
+        )
+
+    async def async_get_agency_stop_monitoring(
+        self,
+        agency: str,
+        stop_codes: Iterable[str] | None = None,
+        line_refs: Iterable[str] | None = None,
+    ) -> dict[str, StopSnapshot]:
+        """
+        Get stop monitoring data for every stop of an agency in one request.
+
+        The result is keyed by stop code. When ``stop_codes`` is given, only
+        those stops are kept and each of them gets an entry, even if the
+        agency currently reports no arrivals for it. When ``line_refs`` is
+        given, only arrivals of those lines are kept.
+        """
+        params = {
+            "agency": agency,
+            "format": "json",
+        }
+
+        if stop_codes is None and line_refs is None:
+            data = await self._cached_get("StopMonitoring", params)
+        else:
+            # Agency-wide responses can be several megabytes; filter the
+            # visits while streaming instead of decoding the whole response
+            stop_codes = sorted(stop_codes) if stop_codes is not None else None
+            line_refs = sorted(line_refs) if line_refs is not None else None
+            data = await self._cached_get(
+                "StopMonitoring",
+                params,
+                decode=lambda response: async_read_stop_visits(
+                    response, stop_codes, line_refs
+                ),
+                key_extra=(
+                    ("stops", tuple(stop_codes or ())),
+                    ("lines", tuple(line_refs or ())),
+                ),
+            )
+
+        start = time.perf_counter()
+        snapshots = self._parse_agency_stop_monitoring(data, stop_codes)
+        self._record_parse("StopMonitoring", time.perf_counter() - start)
+        return snapshots
+
+    async def async_get_agency_trip_updates(
+        self,
+        agency: str,
+        stop_codes: Iterable[str],
+        stop_id_codes: Mapping[str, str] | None = None,
+    ) -> dict[str, StopSnapshot]:
+        """
+        Get the predicted arrivals of an agency's stops from GTFS-Realtime.
+
+        The agency's TripUpdates feed is fetched and indexed by stop once,
+        and the index is shared through the response cache, so every
+        coordinator and config entry monitoring the agency reuses it. The
+        feed's stop_ids are translated with ``stop_id_codes`` where they
+        differ from the stop codes. The result is keyed by stop code, with
+        an entry for each of ``stop_codes``.
+        """
+        params = {
+            "agency": agency,
+        }
+
+        index = await self._cached_get(
+            "TripUpdates",
+            params,
+            decode=lambda response: async_read_trip_updates(response, stop_id_codes),
+            # Indexes built before the agency's stop_ids were known differ
+            key_extra=(("stop_ids", bool(stop_id_codes)),),
+            headers=_PROTOBUF_HEADERS,
         )
 
-    def _parse_stop_monitoring(self, data: dict) -> dict[str, Any]:
-        """Parse stop monitoring response into a more usable format."""
-        result = {
-            "stop_name": None,
-            "stop_code": None,
-            "arrivals": [],
+        start = time.perf_counter()
+        fetched_at = datetime.now(UTC)
+        snapshots = {
+            stop_code: index.snapshot(stop_code, fetched_at) for stop_code in stop_codes
+        }
+        self._record_parse("TripUpdates", time.perf_counter() - start)
+        return snapshots
+
+    async def async_get_agency_vehicle_activities(
+        self, agency: str, line_refs: Iterable[str]
+    ) -> list[dict[str, Any]]:
+        """
+        Get the live vehicles of some of an agency's lines in one request.
+
+        Returns the ``VehicleActivity`` entries of ``line_refs``, filtered
+        while streaming the agency-wide response.
+        """
+        params = {
+            "agency": agency,
+            "format": "json",
         }
+        line_refs = sorted(line_refs)
+        return await self._cached_get(
+            "VehicleMonitoring",
+            params,
+            decode=lambda response: async_read_vehicle_activities(response, line_refs),
+            key_extra=(("lines", tuple(line_refs)),),
+        )
+
+    async def async_get_agency_service_alerts(self, agency: str) -> list[ServiceAlert]:
+        """Get the service alerts of an agency."""
+        params = {
+            "agency": agency,
+            "format": "json",
+        }
+        data = await self._cached_get("servicealerts", params)
+
+        start = time.perf_counter()
+        entities = data.get("Entities") or data.get("entity") or []
+        alerts = [
+            ServiceAlert.from_entity(entity)
+            for entity in entities
+            if entity.get("Alert") or entity.get("alert")
+        ]
+        self._record_parse("servicealerts", time.perf_counter() - start)
+        return alerts
+
+    def _record_parse(self, endpoint: str, seconds: float) -> None:
+        """Record how long turning a response into snapshots took."""
+        self.metrics.endpoint(endpoint).record_parse(seconds)
+        self.metrics.notify()
+
+    def _parse_stop_monitoring(self, data: dict) -> StopSnapshot:
+        """Parse stop monitoring response into a more usable format."""
+        stop_name = stop_code = None
+        arrivals: list[Arrival] = []
 
         try:
-            # Navigate through the nested JSON structure
-            service_delivery = data.get("ServiceDelivery", {})
-            stop_monitoring = service_delivery.get("StopMonitoringDelivery", {})
-
-            if stop_monitoring and "MonitoredStopVisit" in stop_monitoring:
-                visits = stop_monitoring["MonitoredStopVisit"]
-
-                # Handle both single visit and list of visits
-                if not isinstance(visits, list):
-                    visits = [visits]
-
-                for visit in visits:
-                    monitored_vehicle = visit.get("MonitoredVehicleJourney", {})
-
-                    # Extract stop info (same for all visits)
-                    if result["stop_name"] is None:
-                        monitored_call = monitored_vehicle.get("MonitoredCall", {})
-                        result["stop_name"] = monitored_call.get("StopPointName")
-                        result["stop_code"] = monitored_call.get("StopPointRef")
-
-                    # Extract arrival info
-                    monitored_call = monitored_vehicle.get("MonitoredCall", {})
-                    arrival_info = {
-                        "line_ref": monitored_vehicle.get("LineRef"),
-                        "direction": monitored_vehicle.get("DirectionRef"),
-                        "destination": monitored_vehicle.get("DestinationName"),
-                        "aimed_arrival_time": monitored_call.get(
-                            "AimedArrivalTime"
-                        ),
-                        "expected_arrival_time": monitored_call.get(
-                            "ExpectedArrivalTime"
-                        ),
-                        "vehicle_at_stop": monitored_call.get(
-                            "VehicleAtStop", False
-                        ),
-                    }
-
-                    # Calculate minutes until arrival
-                    if arrival_info["expected_arrival_time"]:
-                        try:
-                            expected_str = arrival_info["expected_arrival_time"]
-                            expected = datetime.fromisoformat(
-                                expected_str
-                            )
-                            now = datetime.now(expected.tzinfo)
-                            seconds = (expected - now).total_seconds()
-                            minutes_away = int(seconds / 60)
-                            # Don't show negative times
-                            arrival_info["minutes_away"] = max(0, minutes_away)
-                        except Exception as e:  # noqa: BLE001
-                            LOGGER.debug("Could not calculate minutes away: %s", e)
-                            arrival_info["minutes_away"] = None
-                    else:
-                        arrival_info["minutes_away"] = None
-
-                    result["arrivals"].append(arrival_info)
+            for visit in _iter_monitored_stop_visits(data):
+                monitored_call = visit.get("MonitoredVehicleJourney", {}).get(
+                    "MonitoredCall", {}
+                )
+
+                # Extract stop info (same for all visits)
+                if stop_name is None:
+                    stop_name = intern_string(monitored_call.get("StopPointName"))
+                    stop_code = monitored_call.get("StopPointRef")
+
+                arrivals.append(Arrival.from_visit(visit))
 
         except Exception as e:  # noqa: BLE001
             LOGGER.error("Error parsing stop monitoring data: %s", e)
 
+        return StopSnapshot(stop_name, stop_code, tuple(arrivals), datetime.now(UTC))
+
+    def _parse_agency_stop_monitoring(
+        self, data: dict, stop_codes: Iterable[str] | None = None
+    ) -> dict[str, StopSnapshot]:
+        """Split an agency-wide stop monitoring response into per-stop snapshots."""
+        wanted = set(stop_codes) if stop_codes is not None else None
+        stop_names: dict[str, str | None] = dict.fromkeys(wanted or ())
+        arrivals: dict[str, list[Arrival]] = {}
+
+        try:
+            for visit in _iter_monitored_stop_visits(data):
+                monitored_call = visit.get("MonitoredVehicleJourney", {}).get(
+                    "MonitoredCall", {}
+                )
+                stop_code = monitored_call.get("StopPointRef")
+                if stop_code is None or (
+                    wanted is not None and stop_code not in wanted
+                ):
+                    continue
+
+                if stop_names.get(stop_code) is None:
+                    stop_names[stop_code] = intern_string(
+                        monitored_call.get("StopPointName")
+                    )
+
+                arrivals.setdefault(stop_code, []).append(Arrival.from_visit(visit))
+
+        except Exception as e:  # noqa: BLE001
+            LOGGER.error("Error parsing agency stop monitoring data: %s", e)
+
+        fetched_at = datetime.now(UTC)
+        return {
+            stop_code: StopSnapshot(
+                stop_name, stop_code, tuple(arrivals.get(stop_code, ())), fetched_at
+            )
+            for stop_code, stop_name in stop_names.items()
+        }
+
+    async def _cached_get(
+        self,
+        endpoint: str,
+        params: dict[str, str],
+        decode: Callable[[aiohttp.ClientResponse], Awaitable[Any]] | None = None,
+        key_extra: tuple[Any, ...] = (),
+        headers: dict[str, str] | None = None,
+    ) -> Any:
+        """GET an endpoint through the response cache."""
+        # The API key is only added when sending, so entries using different
+        # keys share responses
+        key = (endpoint, *sorted(params.items()), *key_extra)
+        return await self.cache.async_get(
+            key,
+            CACHE_TTL.get(endpoint, 0),
+            lambda: self._guarded_get(endpoint, params, decode, headers=headers),
+        )
+
+    async def _guarded_get(
+        self,
+        endpoint: str,
+        params: dict[str, str],
+        decode: Callable[[aiohttp.ClientResponse], Awaitable[Any]] | None,
+        *,
+        request_timeout: float = 10,
+        headers: dict[str, str] | None = None,
+    ) -> Any:
+        """GET an endpoint unless its circuit breaker is open."""
+        metrics = self.metrics.endpoint(endpoint)
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = Bay511CircuitBreaker(endpoint)
+
+        try:
+            if not breaker.allow_request():
+                msg = f"{endpoint} is failing, retrying in {breaker.retry_in:.0f} s"
+                raise Bay511ApiClientUnavailableError(msg)
+            try:
+                result = await self._pooled_request(
+                    method="get",
+                    url=f"{self._base_url}/{endpoint}",
+                    headers=headers,
+                    params=params,
+                    decode=decode,
+                    metrics=metrics,
+                    request_timeout=request_timeout,
+                )
+            except Bay511ApiClientCommunicationError:
+                # Timeouts, connection errors and 5xx responses
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+        except Bay511ApiClientError as exception:
+            metrics.record_error(exception)
+            self.metrics.notify()
+            raise
+
+        breaker.record_success()
         return result
 
-    async def _api_wrapper(
+    async def _pooled_request(self, params: dict[str, str], **kwargs: Any) -> Any:
+        """
+        Send a request with the key that has the most requests left.
+
+        A key rejected by 511 is taken out of rotation and the request is
+        sent again with the next one, until every key was tried.
+        """
+        tried: set[str] = set()
+        error: Bay511ApiClientError | None = None
+        while (api_key := self.budget.acquire(tried)) is not None:
+            tried.add(api_key)
+            try:
+                return await self._api_wrapper(
+                    api_key=api_key, params={**params, "api_key": api_key}, **kwargs
+                )
+            except (
+                Bay511ApiClientAuthenticationError,
+                Bay511ApiClientRateLimitError,
+            ) as exception:
+                error = exception
+        if error is not None:
+            raise error
+        if self.budget.unauthorized:
+            msg = "Every API key was rejected as invalid"
+            raise Bay511ApiClientAuthenticationError(msg)
+        msg = "Request budget of every API key is exhausted"
+        raise Bay511ApiClientRateLimitError(msg)
+
+    async def _api_wrapper(  # noqa: PLR0913
         self,
         method: str,
         url: str,
+        api_key: str,
         data: dict | None = None,
         headers: dict | None = None,
         params: dict | None = None,
+        decode: Callable[[aiohttp.ClientResponse], Awaitable[Any]] | None = None,
+        metrics: Bay511EndpointMetrics | None = None,
+        request_timeout: float = 10,
     ) -> Any:
         """Get information from the API."""
         try:
-            async with async_timeout.timeout(10):
+            async with async_timeout.timeout(request_timeout):
+                start = time.perf_counter()
                 response = await self._session.request(
                     method=method,
                     url=url,
@@ -182,27 +490,46 @@ class Bay511ApiClient:
                     json=data,
                     params=params,
                 )
+                self.budget.update_from_headers(api_key, response.headers)
+                self.metrics.record_headers(response.headers)
+                if response.status in _REJECTED_STATUSES:
+                    self.budget.reject(api_key, response.status, _retry_after(response))
                 _verify_response_or_raise(response)
 
-                # Get text response to handle BOM
-                text = await response.text()
-
-                # Remove BOM if present
-                text = text.removeprefix("\ufeff")
-
-                # Parse JSON manually
-                return json.loads(text)
-
+                if decode is not None:
+                    result = await decode(response)
+                else:
+                    # Parse the raw bytes; 511 prefixes its JSON with a BOM
+                    result = _decode_json(await response.read())
+
+                if metrics is not None:
+                    # Request, download and decoding, in seconds and bytes
+                    metrics.record_response(
+                        time.perf_counter() - start, response.content.total_bytes
+                    )
+                return result
+
+        except Bay511ApiClientError:
+            raise
         except TimeoutError as exception:
             msg = f"Timeout error fetching information - {exception}"
             raise Bay511ApiClientCommunicationError(msg) from exception
+        except aiohttp.ClientResponseError as exception:
+            msg = f"Error fetching information - {exception}"
+            if exception.status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                raise Bay511ApiClientCommunicationError(msg) from exception
+            # The request itself was rejected; retrying won't help
+            raise Bay511ApiClientError(msg) from exception
         except (aiohttp.ClientError, socket.gaierror) as exception:
             msg = f"Error fetching information - {exception}"
             raise Bay511ApiClientCommunicationError(msg) from exception
         except json.JSONDecodeError as exception:
             msg = f"Invalid JSON response from API - {exception}"
             raise Bay511ApiClientError(msg) from exception
+        except ValueError as exception:
+            # Malformed protobuf feeds
+            msg = f"Invalid response from API - {exception}"
+            raise Bay511ApiClientError(msg) from exception
         except Exception as exception:
             msg = f"Something really wrong happened! - {exception}"
             raise Bay511ApiClientError(msg) from exception
-
@@ -0,0 +1,103 @@
+"""Circuit breaker for failing Bay Area 511 endpoints."""
+
+from __future__ import annotations
+
+import random
+import time
+
+from .const import (
+    BREAKER_BASE_DELAY,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_MAX_DELAY,
+    LOGGER,
+)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class Bay511CircuitBreaker:
+    """
+    Stop sending requests to an endpoint that keeps failing.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects requests locally. It stays open for an exponentially growing,
+    jittered delay, then lets a single trial request through: success closes
+    it again, failure opens it for twice as long.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        base_delay: float = BREAKER_BASE_DELAY,
+        max_delay: float = BREAKER_MAX_DELAY,
+    ) -> None:
+        """Initialize a closed breaker."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = 0
+        self.opened = 0
+        self._open_until = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """Return whether requests are let through."""
+        if self.failures < self.failure_threshold:
+            return STATE_CLOSED
+        if time.monotonic() < self._open_until:
+            return STATE_OPEN
+        return STATE_HALF_OPEN
+
+    @property
+    def retry_in(self) -> float:
+        """Return the seconds until the breaker lets a request through."""
+        if self.state != STATE_OPEN:
+            return 0.0
+        return self._open_until - time.monotonic()
+
+    def allow_request(self) -> bool:
+        """Return whether a request may be sent now, claiming the trial slot."""
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_OPEN or self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        """Close the breaker after a request got through."""
+        if self.failures >= self.failure_threshold:
+            LOGGER.info("%s is responding again", self.name)
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failed request, opening the breaker if there were too many."""
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures < self.failure_threshold:
+            return
+
+        # Double the delay for every failure past the threshold, then use
+        # "equal jitter" so clients that failed together don't retry together
+        exponent = min(self.failures - self.failure_threshold, 16)
+        delay = min(self.max_delay, self.base_delay * 2**exponent)
+        delay = delay / 2 + random.uniform(0, delay / 2)  # noqa: S311
+        self._open_until = time.monotonic() + delay
+        self.opened += 1
+        LOGGER.warning(
+            "%s failed %s times in a row, pausing requests for %.0f seconds",
+            self.name,
+            self.failures,
+            delay,
+        )
+
+    def release(self) -> None:
+        """Give up the trial slot without a verdict on the endpoint."""
+        self._trial_in_flight = False
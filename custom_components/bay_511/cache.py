@@ -0,0 +1,114 @@
+"""Response cache with request coalescing for the Bay Area 511 API."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+from .const import CACHE_MAX_ENTRIES, DOMAIN
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Hashable
+
+    from homeassistant.core import HomeAssistant
+
+
+class Bay511ResponseCache:
+    """
+    Bounded TTL/LRU cache of decoded API responses.
+
+    Identical requests made while one is already in flight wait for that
+    request instead of sending their own. Successful responses are kept for
+    the TTL of their endpoint; when the cache is full, the least recently
+    used response is evicted. Errors are never cached.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES) -> None:
+        """Initialize an empty cache."""
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[Hashable, asyncio.Task[Any]] = {}
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+    async def async_get(
+        self,
+        key: Hashable,
+        ttl: float,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return a cached response or fetch it, sharing concurrent fetches."""
+        cached = self._entries.get(key)
+        if cached is not None:
+            expires, value = cached
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if (in_flight := self._in_flight.get(key)) is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+
+        self.misses += 1
+        # The fetch runs in its own task, so cancelling the request that
+        # started it, as when its entry unloads, doesn't cancel the others
+        task = asyncio.get_running_loop().create_task(
+            self._async_fetch(key, ttl, fetch)
+        )
+        task.add_done_callback(_retrieve_exception)
+        self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _async_fetch(
+        self,
+        key: Hashable,
+        ttl: float,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Fetch a response and keep it for its TTL."""
+        try:
+            value = await fetch()
+        finally:
+            del self._in_flight[key]
+        if ttl > 0:
+            self._store(key, ttl, value)
+        return value
+
+    def _store(self, key: Hashable, ttl: float, value: Any) -> None:
+        """Add a response, evicting the least recently used ones if full."""
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+def _retrieve_exception(task: asyncio.Task[Any]) -> None:
+    """Mark a failed fetch as handled when every request waiting for it left."""
+    if not task.cancelled():
+        task.exception()
+
+
+def async_get_response_cache(hass: HomeAssistant) -> Bay511ResponseCache:
+    """Return the response cache shared by all config entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "cache" not in domain_data:
+        domain_data["cache"] = Bay511ResponseCache()
+    return domain_data["cache"]
@@ -0,0 +1,241 @@
+"""Operator and stop catalogs of the 511 API, cached on disk."""
+
+from __future__ import annotations
+
+import re
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.helpers.storage import Store
+
+from .api import Bay511ApiClientError
+from .const import (
+    CATALOG_SEARCH_LIMIT,
+    CATALOG_STORAGE_VERSION,
+    CATALOG_TTL,
+    DOMAIN,
+    LOGGER,
+)
+from .models import TransitStop
+from .spatial import Bay511StopGrid
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+    from .api import Bay511ApiClient
+
+_WORD = re.compile(r"[0-9a-z]+")
+
+
+def _words(text: str | None) -> list[str]:
+    """Split a stop name or search query into lower-case words."""
+    return _WORD.findall(text.lower()) if text else []
+
+
+class Bay511StopIndex:
+    """
+    Search an agency's stops by code or name as the user types.
+
+    Every stop code and every word of a stop name is kept in one sorted list,
+    so the stops starting with a typed prefix are a bisected slice of it. A
+    query with several words returns the stops matching all of them.
+    """
+
+    def __init__(self, stops: list[TransitStop]) -> None:
+        """Index the given stops."""
+        self.stops = stops
+        self._by_code = {stop.code: stop for stop in stops}
+        entries = sorted(
+            (word, position)
+            for position, stop in enumerate(stops)
+            for word in {stop.code.lower(), *_words(stop.name)}
+        )
+        self._words = [word for word, _ in entries]
+        self._positions = [position for _, position in entries]
+
+    def get(self, code: str) -> TransitStop | None:
+        """Return the stop with a code."""
+        return self._by_code.get(code)
+
+    def search(
+        self, query: str, limit: int = CATALOG_SEARCH_LIMIT
+    ) -> list[TransitStop]:
+        """Return the stops whose code or name words start with the query's."""
+        matches: set[int] | None = None
+        for word in _words(query):
+            start = bisect_left(self._words, word)
+            # Every word starting with `word` sorts before `word` + U+FFFF
+            end = bisect_left(self._words, word + "\uffff", start)
+            found = set(self._positions[start:end])
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+        if matches is None:
+            return []
+
+        code = query.strip()
+        stops = [self.stops[position] for position in matches]
+        # Codes typed in full first, then by name
+        stops.sort(key=lambda stop: (stop.code != code, stop.name or "", stop.code))
+        return stops[:limit]
+
+
+class Bay511Catalog:
+    """
+    Operators and stops of the 511 API shared by all config flows.
+
+    Catalogs are kept on disk and used for up to `CATALOG_TTL` seconds. Older
+    ones are still used right away while a fresh copy is fetched in the
+    background, so only the very first use of a catalog waits for 511.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize an empty catalog."""
+        self.hass = hass
+        self._store: Store[dict[str, Any]] = Store(
+            hass, CATALOG_STORAGE_VERSION, f"{DOMAIN}.catalog"
+        )
+        self._data: dict[str, Any] | None = None
+        self._indexes: dict[str, Bay511StopIndex] = {}
+        # Grids by agencies, with the indexes they were built from
+        self._grids: dict[
+            tuple[str, ...], tuple[list[Bay511StopIndex], Bay511StopGrid]
+        ] = {}
+        self._refreshing: set[str] = set()
+
+    async def async_operators(self, client: Bay511ApiClient) -> dict[str, str]:
+        """Return the names of the operators keyed by their id."""
+        cached = await self._async_cached("operators", client)
+        if cached is not None:
+            return dict(cached)
+        return self._store_operators(await client.async_get_operators())
+
+    async def async_store_operators(
+        self, operators: list[dict[str, Any]]
+    ) -> dict[str, str]:
+        """Keep an operators list fetched elsewhere, like by the key check."""
+        await self._async_load()
+        return self._store_operators(operators)
+
+    async def async_stop_index(
+        self, client: Bay511ApiClient, agency: str
+    ) -> Bay511StopIndex:
+        """Return the searchable stops of an agency."""
+        key = f"stops_{agency}"
+        cached = await self._async_cached(key, client)
+        if cached is None:
+            self._store_stops(agency, await client.async_get_stops_for_operator(agency))
+        elif key not in self._indexes:
+            self._indexes[key] = Bay511StopIndex(
+                [TransitStop(*stop) for stop in cached]
+            )
+        return self._indexes[key]
+
+    async def async_stop_grid(
+        self, client: Bay511ApiClient, agencies: list[str]
+    ) -> Bay511StopGrid:
+        """
+        Return the spatial index of the stops of some agencies.
+
+        The grid is built on first use and kept until one of the agencies'
+        catalogs is refreshed. Building it from the stored catalog takes a
+        few milliseconds, less than reading a serialized copy would.
+        """
+        loaded: list[tuple[str, Bay511StopIndex]] = []
+        for agency in sorted(agencies):
+            try:
+                loaded.append((agency, await self.async_stop_index(client, agency)))
+            except Bay511ApiClientError as exception:
+                LOGGER.warning("Could not get the stops of %s: %s", agency, exception)
+        # Keyed by the agencies that loaded, so a failed fetch isn't cached
+        key = tuple(agency for agency, _ in loaded)
+        indexes = [index for _, index in loaded]
+        cached = self._grids.get(key)
+        # Indexes compare by identity, and a refresh replaces an agency's index
+        if cached is not None and cached[0] == indexes:
+            return cached[1]
+        grid = Bay511StopGrid(
+            [(agency, stop) for agency, index in loaded for stop in index.stops]
+        )
+        self._grids[key] = (indexes, grid)
+        return grid
+
+    async def _async_cached(self, key: str, client: Bay511ApiClient) -> Any:
+        """Return a stored catalog, refreshing it in the background if old."""
+        data = await self._async_load()
+        stored = data.get(key)
+        if stored is None:
+            return None
+        fetched, items = stored
+        if time.time() - fetched > CATALOG_TTL and key not in self._refreshing:
+            self._refreshing.add(key)
+            self.hass.async_create_background_task(
+                self._async_refresh(key, client), f"{DOMAIN} {key} catalog refresh"
+            )
+        return items
+
+    async def _async_refresh(self, key: str, client: Bay511ApiClient) -> None:
+        """Fetch a fresh copy of a catalog."""
+        try:
+            if key == "operators":
+                self._store_operators(await client.async_get_operators())
+            else:
+                agency = key.removeprefix("stops_")
+                self._store_stops(
+                    agency, await client.async_get_stops_for_operator(agency)
+                )
+        except Bay511ApiClientError as exception:
+            LOGGER.debug("Could not refresh the %s catalog: %s", key, exception)
+        finally:
+            self._refreshing.discard(key)
+
+    def _store_operators(self, operators: list[dict[str, Any]]) -> dict[str, str]:
+        """Keep the id and name of every operator."""
+        names = {
+            str(operator["Id"]): operator.get("Name") or str(operator["Id"])
+            for operator in operators
+            if operator.get("Id")
+        }
+        self._save("operators", sorted(names.items()))
+        return names
+
+    def _store_stops(self, agency: str, data: dict[str, Any]) -> None:
+        """Keep the code, name and location of every stop of an agency."""
+        stop_points = (
+            (data.get("Contents") or {})
+            .get("dataObjects", {})
+            .get("ScheduledStopPoint", [])
+        )
+        stops = [
+            TransitStop.from_stop_point(stop_point)
+            for stop_point in stop_points
+            if stop_point.get("id") is not None
+        ]
+        key = f"stops_{agency}"
+        self._indexes[key] = Bay511StopIndex(stops)
+        self._save(
+            key,
+            [[stop.code, stop.name, stop.longitude, stop.latitude] for stop in stops],
+        )
+
+    async def _async_load(self) -> dict[str, Any]:
+        """Load the stored catalogs on first use."""
+        if self._data is None:
+            self._data = await self._store.async_load() or {}
+        return self._data
+
+    def _save(self, key: str, items: list[Any]) -> None:
+        """Store a catalog with the time it was fetched."""
+        data = self._data if self._data is not None else {}
+        data[key] = [time.time(), items]
+        self._data = data
+        self._store.async_delay_save(lambda: data, 1)
+
+
+def async_get_catalog(hass: HomeAssistant) -> Bay511Catalog:
+    """Return the catalog shared by all config flows."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "catalog" not in domain_data:
+        domain_data["catalog"] = Bay511Catalog(hass)
+    return domain_data["catalog"]
@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
 import voluptuous as vol
 from homeassistant import config_entries
+from homeassistant.const import ATTR_LATITUDE, ATTR_LONGITUDE
+from homeassistant.core import callback
 from homeassistant.helpers import selector
 from homeassistant.helpers.aiohttp_client import async_create_clientsession
 
@@ -12,16 +16,59 @@ from .api import (
     Bay511ApiClientAuthenticationError,
     Bay511ApiClientCommunicationError,
     Bay511ApiClientError,
+    Bay511ApiClientRateLimitError,
 )
+from .catalog import async_get_catalog
 from .const import (
+    BOARD_DIRECTIONS,
+    CONF_AGENCIES,
     CONF_AGENCY,
     CONF_API_KEY,
+    CONF_BACKGROUND_STARTUP,
+    CONF_BOARD_DIRECTIONS,
+    CONF_BOARD_LINES,
+    CONF_BOARD_SIZE,
+    CONF_EXTRA_API_KEYS,
+    CONF_FETCH_MODE,
+    CONF_LINE_SENSOR_DIRECTIONS,
+    CONF_LINE_SENSOR_LINES,
+    CONF_LINE_SENSORS,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_RADIUS,
+    CONF_SCHEDULE_FALLBACK,
+    CONF_SERVICE_ALERTS,
+    CONF_STARTUP_CONCURRENCY,
     CONF_STOP_CODE,
     CONF_STOPS,
+    CONF_TRIP_UPDATE_AGENCIES,
+    CONF_UPDATE_INTERVAL,
+    CONF_VEHICLES,
+    DEFAULT_BACKGROUND_STARTUP,
+    DEFAULT_BOARD_SIZE,
+    DEFAULT_FETCH_MODE,
+    DEFAULT_LINE_SENSORS,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_NEARBY_AGENCIES,
+    DEFAULT_NEARBY_RADIUS,
+    DEFAULT_SCHEDULE_FALLBACK,
+    DEFAULT_SERVICE_ALERTS,
+    DEFAULT_STARTUP_CONCURRENCY,
+    DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_VEHICLES,
     DOMAIN,
+    FETCH_MODES,
     LOGGER,
+    MAX_BOARD_SIZE,
+    MAX_NEARBY_RADIUS,
+    NEARBY_FALLBACK_STOPS,
 )
 
+if TYPE_CHECKING:
+    from .catalog import Bay511StopIndex
+    from .models import TransitStop
+
 
 class Bay511FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     """Config flow for Bay Area 511."""
@@ -32,7 +79,20 @@ class Bay511FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         """Initialize the config flow."""
         self._api_key: str | None = None
         self._stops: list[dict[str, str]] = []
-        self._operators: list[dict[str, str]] = []
+        self._operators: dict[str, str] = {}
+        self._client: Bay511ApiClient | None = None
+        # Agency, matching stops and whether to add another of a stop search
+        self._pending: tuple[str, list[TransitStop], bool] | None = None
+        # Distance, agency and stop of the stops found around the home zone
+        self._nearby: list[tuple[float, str, TransitStop]] = []
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,  # noqa: ARG004
+    ) -> Bay511OptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return Bay511OptionsFlowHandler()
 
     async def async_step_user(
         self,
@@ -47,7 +107,7 @@ class Bay511FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                 await self._test_api_key(user_input[CONF_API_KEY])
                 self._api_key = user_input[CONF_API_KEY]
                 # Move to stop configuration
-                return await self.async_step_stops()
+                return await self.async_step_add_stop()
 
             except Bay511ApiClientAuthenticationError as exception:
                 LOGGER.warning(exception)
@@ -76,52 +136,65 @@ class Bay511FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             errors=_errors,
         )
 
+    async def async_step_add_stop(
+        self,
+        user_input: dict | None = None,  # noqa: ARG002
+    ) -> config_entries.ConfigFlowResult:
+        """Choose how to add the next stop."""
+        menu_options = ["stops", "nearby"]
+        if self._stops:
+            menu_options.append("finish")
+        return self.async_show_menu(
+            step_id="add_stop",
+            menu_options=menu_options,
+            description_placeholders={"stops_added": str(len(self._stops))},
+        )
+
+    async def async_step_finish(
+        self,
+        user_input: dict | None = None,  # noqa: ARG002
+    ) -> config_entries.ConfigFlowResult:
+        """Create the entry with the stops added so far."""
+        return await self._async_create_entry()
+
     async def async_step_stops(
         self,
         user_input: dict | None = None,
     ) -> config_entries.ConfigFlowResult:
-        """Configure stops to monitor."""
+        """Configure stops to monitor, looking up stop names in the catalog."""
         _errors = {}
 
         if user_input is not None:
-            # Add the stop to our list
-            stop_entry = {
-                CONF_AGENCY: user_input[CONF_AGENCY],
-                CONF_STOP_CODE: user_input[CONF_STOP_CODE],
-            }
-
-            if user_input.get("add_another"):
-                self._stops.append(stop_entry)
-                # Show the form again for another stop
-                return await self.async_step_stops()
-            # Finish configuration
-            if stop_entry[CONF_STOP_CODE]:  # Only add if stop code was provided
-                self._stops.append(stop_entry)
-
-            if not self._stops:
+            agency = user_input[CONF_AGENCY].strip()
+            query = user_input[CONF_STOP_CODE].strip()
+            add_another = user_input.get("add_another", False)
+
+            if not query:
+                if self._stops and not add_another:
+                    return await self._async_create_entry()
                 _errors["base"] = "no_stops"
             else:
-                # Create the config entry
-                await self.async_set_unique_id(f"bay_511_{self._api_key[:8]}")
-                self._abort_if_unique_id_configured()
-
-                return self.async_create_entry(
-                    title=f"Bay Area 511 ({len(self._stops)} stops)",
-                    data={
-                        CONF_API_KEY: self._api_key,
-                        CONF_STOPS: self._stops,
-                    },
-                )
+                index = await self._async_stop_index(agency)
+                if index is None or index.get(query) is not None:
+                    # A known code, or no catalog to check it against
+                    return await self._async_add_stops(
+                        [(agency, query)], add_another=add_another
+                    )
+                matches = index.search(query)
+                if len(matches) == 1:
+                    return await self._async_add_stops(
+                        [(agency, matches[0].code)], add_another=add_another
+                    )
+                if matches:
+                    self._pending = (agency, matches, add_another)
+                    return await self.async_step_stop_select()
+                _errors[CONF_STOP_CODE] = "stop_not_found"
 
         return self.async_show_form(
             step_id="stops",
             data_schema=vol.Schema(
                 {
-                    vol.Required(CONF_AGENCY): selector.TextSelector(
-                        selector.TextSelectorConfig(
-                            type=selector.TextSelectorType.TEXT,
-                        ),
-                    ),
+                    vol.Required(CONF_AGENCY): self._agency_selector(),
                     vol.Required(CONF_STOP_CODE): selector.TextSelector(
                         selector.TextSelectorConfig(
                             type=selector.TextSelectorType.TEXT,
@@ -138,11 +211,407 @@ class Bay511FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             },
         )
 
+    async def async_step_stop_select(
+        self,
+        user_input: dict | None = None,
+    ) -> config_entries.ConfigFlowResult:
+        """Pick one of the stops matching a search."""
+        agency, matches, add_another = self._pending
+        if user_input is not None:
+            return await self._async_add_stops(
+                [(agency, user_input[CONF_STOP_CODE])], add_another=add_another
+            )
+
+        return self.async_show_form(
+            step_id="stop_select",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_STOP_CODE): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=[
+                                selector.SelectOptionDict(
+                                    value=stop.code, label=stop.label
+                                )
+                                for stop in matches
+                            ],
+                            mode=selector.SelectSelectorMode.LIST,
+                        ),
+                    ),
+                },
+            ),
+            description_placeholders={"matches": str(len(matches))},
+        )
+
+    async def async_step_nearby(
+        self,
+        user_input: dict | None = None,
+    ) -> config_entries.ConfigFlowResult:
+        """Find the stops around the home zone."""
+        _errors = {}
+
+        if user_input is not None:
+            agencies = [agency.strip() for agency in user_input[CONF_AGENCIES]]
+            radius = user_input[CONF_RADIUS]
+            latitude, longitude = self._home_location()
+            grid = await async_get_catalog(self.hass).async_stop_grid(
+                self._client, agencies
+            )
+            # Offer the closest stops when none is within the radius
+            self._nearby = grid.within(latitude, longitude, radius) or grid.nearest(
+                latitude, longitude, NEARBY_FALLBACK_STOPS
+            )
+            if self._nearby:
+                return await self.async_step_nearby_select()
+            _errors["base"] = "no_stops_nearby"
+
+        return self.async_show_form(
+            step_id="nearby",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_AGENCIES, default=self._nearby_agencies()
+                    ): self._agency_selector(multiple=True),
+                    vol.Required(
+                        CONF_RADIUS, default=DEFAULT_NEARBY_RADIUS
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=50,
+                            max=MAX_NEARBY_RADIUS,
+                            step=50,
+                            unit_of_measurement="m",
+                            mode=selector.NumberSelectorMode.BOX,
+                        ),
+                    ),
+                },
+            ),
+            errors=_errors,
+        )
+
+    async def async_step_nearby_select(
+        self,
+        user_input: dict | None = None,
+    ) -> config_entries.ConfigFlowResult:
+        """Pick some of the stops found around the home zone."""
+        _errors = {}
+
+        if user_input is not None:
+            if user_input[CONF_STOPS]:
+                return await self._async_add_stops(
+                    [tuple(stop.split(":", 1)) for stop in user_input[CONF_STOPS]],
+                    add_another=user_input.get("add_another", False),
+                )
+            _errors["base"] = "no_stops"
+
+        return self.async_show_form(
+            step_id="nearby_select",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_STOPS): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=[
+                                selector.SelectOptionDict(
+                                    value=f"{agency}:{stop.code}",
+                                    label=f"{stop.label}, {meters:.0f} m ({agency})",
+                                )
+                                for meters, agency, stop in self._nearby
+                            ],
+                            multiple=True,
+                            mode=selector.SelectSelectorMode.LIST,
+                        ),
+                    ),
+                    vol.Optional(
+                        "add_another", default=False
+                    ): selector.BooleanSelector(),
+                },
+            ),
+            errors=_errors,
+            description_placeholders={"found": str(len(self._nearby))},
+        )
+
+    async def _async_add_stops(
+        self, stops: list[tuple[str, str]], *, add_another: bool
+    ) -> config_entries.ConfigFlowResult:
+        """Add stops, then ask for another one or finish."""
+        for agency, stop_code in stops:
+            stop = {CONF_AGENCY: agency, CONF_STOP_CODE: stop_code}
+            if stop not in self._stops:
+                self._stops.append(stop)
+        if add_another:
+            # Offer to add another stop
+            return await self.async_step_add_stop()
+        return await self._async_create_entry()
+
+    async def _async_create_entry(self) -> config_entries.ConfigFlowResult:
+        """Create the config entry for the stops added."""
+        await self.async_set_unique_id(f"bay_511_{self._api_key[:8]}")
+        self._abort_if_unique_id_configured()
+        return self.async_create_entry(
+            title=f"Bay Area 511 ({len(self._stops)} stops)",
+            data={
+                CONF_API_KEY: self._api_key,
+                CONF_STOPS: self._stops,
+            },
+        )
+
+    def _agency_selector(self, *, multiple: bool = False) -> selector.Selector:
+        """Return a dropdown of the operators, or a text field without them."""
+        if not self._operators:
+            return selector.TextSelector(
+                selector.TextSelectorConfig(
+                    type=selector.TextSelectorType.TEXT, multiple=multiple
+                ),
+            )
+        return selector.SelectSelector(
+            selector.SelectSelectorConfig(
+                options=[
+                    selector.SelectOptionDict(value=agency, label=f"{name} ({agency})")
+                    for agency, name in sorted(
+                        self._operators.items(), key=lambda item: item[1]
+                    )
+                ],
+                multiple=multiple,
+                custom_value=True,
+                mode=selector.SelectSelectorMode.DROPDOWN,
+            ),
+        )
+
+    def _nearby_agencies(self) -> list[str]:
+        """Return the agencies of the stops added so far, or the defaults."""
+        agencies = sorted({stop[CONF_AGENCY] for stop in self._stops})
+        return agencies or list(DEFAULT_NEARBY_AGENCIES)
+
+    def _home_location(self) -> tuple[float, float]:
+        """Return the location of the home zone."""
+        if (home := self.hass.states.get("zone.home")) is not None and (
+            ATTR_LATITUDE in home.attributes and ATTR_LONGITUDE in home.attributes
+        ):
+            return home.attributes[ATTR_LATITUDE], home.attributes[ATTR_LONGITUDE]
+        return self.hass.config.latitude, self.hass.config.longitude
+
+    async def _async_stop_index(self, agency: str) -> Bay511StopIndex | None:
+        """Return the searchable stops of an agency, if they can be fetched."""
+        try:
+            return await async_get_catalog(self.hass).async_stop_index(
+                self._client, agency
+            )
+        except Bay511ApiClientError as exception:
+            LOGGER.debug("No stop catalog for %s: %s", agency, exception)
+            return None
+
     async def _test_api_key(self, api_key: str) -> None:
         """Validate API key by fetching operators list."""
-        client = Bay511ApiClient(
+        self._client = Bay511ApiClient(
             api_key=api_key,
             session=async_create_clientsession(self.hass),
         )
-        # Try to get operators list to validate the API key
-        self._operators = await client.async_get_operators()
+        # Try to get operators list to validate the API key, and keep it for
+        # the agency dropdown
+        operators = await self._client.async_get_operators()
+        self._operators = await async_get_catalog(self.hass).async_store_operators(
+            operators
+        )
+
+
+def _interval_selector() -> selector.NumberSelector:
+    """Return a selector for a polling interval in seconds."""
+    return selector.NumberSelector(
+        selector.NumberSelectorConfig(
+            min=10,
+            max=86400,
+            step=10,
+            unit_of_measurement="s",
+            mode=selector.NumberSelectorMode.BOX,
+        ),
+    )
+
+
+class Bay511OptionsFlowHandler(config_entries.OptionsFlow):
+    """Options flow for Bay Area 511."""
+
+    async def async_step_init(
+        self,
+        user_input: dict | None = None,
+    ) -> config_entries.ConfigFlowResult:
+        """Manage the options."""
+        _errors = {}
+
+        if user_input is not None:
+            try:
+                await self._test_extra_api_keys(user_input.get(CONF_EXTRA_API_KEYS, []))
+                return self.async_create_entry(data=user_input)
+
+            except Bay511ApiClientAuthenticationError as exception:
+                LOGGER.warning(exception)
+                _errors[CONF_EXTRA_API_KEYS] = "invalid_auth"
+            except Bay511ApiClientCommunicationError as exception:
+                LOGGER.error(exception)
+                _errors["base"] = "cannot_connect"
+            except Bay511ApiClientError as exception:
+                LOGGER.exception(exception)
+                _errors["base"] = "unknown"
+
+        options = {**self.config_entry.options, **(user_input or {})}
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_UPDATE_INTERVAL,
+                        default=options.get(
+                            CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL
+                        ),
+                    ): _interval_selector(),
+                    vol.Required(
+                        CONF_MIN_UPDATE_INTERVAL,
+                        default=options.get(
+                            CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL
+                        ),
+                    ): _interval_selector(),
+                    vol.Required(
+                        CONF_MAX_UPDATE_INTERVAL,
+                        default=options.get(
+                            CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL
+                        ),
+                    ): _interval_selector(),
+                    vol.Required(
+                        CONF_FETCH_MODE,
+                        default=options.get(CONF_FETCH_MODE, DEFAULT_FETCH_MODE),
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=FETCH_MODES,
+                            mode=selector.SelectSelectorMode.DROPDOWN,
+                            translation_key=CONF_FETCH_MODE,
+                        ),
+                    ),
+                    vol.Optional(
+                        CONF_TRIP_UPDATE_AGENCIES,
+                        default=options.get(CONF_TRIP_UPDATE_AGENCIES, []),
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=sorted(
+                                {
+                                    stop[CONF_AGENCY]
+                                    for stop in self.config_entry.data[CONF_STOPS]
+                                }
+                            ),
+                            multiple=True,
+                            custom_value=True,
+                            mode=selector.SelectSelectorMode.DROPDOWN,
+                        ),
+                    ),
+                    vol.Required(
+                        CONF_STARTUP_CONCURRENCY,
+                        default=options.get(
+                            CONF_STARTUP_CONCURRENCY, DEFAULT_STARTUP_CONCURRENCY
+                        ),
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=1,
+                            max=20,
+                            step=1,
+                            mode=selector.NumberSelectorMode.BOX,
+                        ),
+                    ),
+                    vol.Required(
+                        CONF_BACKGROUND_STARTUP,
+                        default=options.get(
+                            CONF_BACKGROUND_STARTUP, DEFAULT_BACKGROUND_STARTUP
+                        ),
+                    ): selector.BooleanSelector(),
+                    vol.Required(
+                        CONF_BOARD_SIZE,
+                        default=options.get(CONF_BOARD_SIZE, DEFAULT_BOARD_SIZE),
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=0,
+                            max=MAX_BOARD_SIZE,
+                            step=1,
+                            mode=selector.NumberSelectorMode.BOX,
+                        ),
+                    ),
+                    vol.Optional(
+                        CONF_BOARD_LINES,
+                        default=options.get(CONF_BOARD_LINES, []),
+                    ): selector.TextSelector(
+                        selector.TextSelectorConfig(multiple=True),
+                    ),
+                    vol.Optional(
+                        CONF_BOARD_DIRECTIONS,
+                        default=options.get(CONF_BOARD_DIRECTIONS, []),
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=BOARD_DIRECTIONS,
+                            multiple=True,
+                            custom_value=True,
+                            mode=selector.SelectSelectorMode.DROPDOWN,
+                        ),
+                    ),
+                    vol.Required(
+                        CONF_SCHEDULE_FALLBACK,
+                        default=options.get(
+                            CONF_SCHEDULE_FALLBACK, DEFAULT_SCHEDULE_FALLBACK
+                        ),
+                    ): selector.BooleanSelector(),
+                    vol.Required(
+                        CONF_LINE_SENSORS,
+                        default=options.get(CONF_LINE_SENSORS, DEFAULT_LINE_SENSORS),
+                    ): selector.BooleanSelector(),
+                    vol.Optional(
+                        CONF_LINE_SENSOR_LINES,
+                        default=options.get(CONF_LINE_SENSOR_LINES, []),
+                    ): selector.TextSelector(
+                        selector.TextSelectorConfig(multiple=True),
+                    ),
+                    vol.Optional(
+                        CONF_LINE_SENSOR_DIRECTIONS,
+                        default=options.get(CONF_LINE_SENSOR_DIRECTIONS, []),
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=BOARD_DIRECTIONS,
+                            multiple=True,
+                            custom_value=True,
+                            mode=selector.SelectSelectorMode.DROPDOWN,
+                        ),
+                    ),
+                    vol.Required(
+                        CONF_VEHICLES,
+                        default=options.get(CONF_VEHICLES, DEFAULT_VEHICLES),
+                    ): selector.BooleanSelector(),
+                    vol.Required(
+                        CONF_SERVICE_ALERTS,
+                        default=options.get(
+                            CONF_SERVICE_ALERTS, DEFAULT_SERVICE_ALERTS
+                        ),
+                    ): selector.BooleanSelector(),
+                    vol.Optional(
+                        CONF_EXTRA_API_KEYS,
+                        default=options.get(CONF_EXTRA_API_KEYS, []),
+                    ): selector.TextSelector(
+                        selector.TextSelectorConfig(
+                            type=selector.TextSelectorType.PASSWORD,
+                            multiple=True,
+                        ),
+                    ),
+                },
+            ),
+            errors=_errors,
+        )
+
+    async def _test_extra_api_keys(self, api_keys: list[str]) -> None:
+        """Validate the extra API keys that weren't checked before."""
+        checked = {
+            self.config_entry.data[CONF_API_KEY],
+            *self.config_entry.options.get(CONF_EXTRA_API_KEYS, []),
+        }
+        for api_key in api_keys:
+            if not (api_key := api_key.strip()) or api_key in checked:
+                continue
+            client = Bay511ApiClient(
+                api_key=api_key,
+                session=async_create_clientsession(self.hass),
+            )
+            try:
+                await client.async_get_operators()
+            except Bay511ApiClientRateLimitError:
+                # Only keys that 511 accepted are rate limited
+                continue
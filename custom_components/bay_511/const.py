@@ -9,8 +9,144 @@ ATTRIBUTION = "Data provided by 511.org"
 
 API_BASE_URL = "https://api.511.org/transit"
 DEFAULT_UPDATE_INTERVAL = 60  # seconds
+DEFAULT_MIN_UPDATE_INTERVAL = 30  # seconds
+DEFAULT_MAX_UPDATE_INTERVAL = 900  # seconds
+POLL_NEAR_ARRIVAL = 2  # minutes away below which polling runs at its fastest
+POLL_ARRIVAL_FRACTION = 0.25  # share of the time to the next arrival to wait
+COUNTDOWN_INTERVAL = 15  # seconds between local minutes_away updates
+DEPARTED_GRACE = 60  # seconds past expected arrival before a vehicle is dropped
+
+# 511 allows 60 requests per hour per API key unless a higher limit was granted
+DEFAULT_RATE_LIMIT = 60  # requests per window
+RATE_LIMIT_WINDOW = 3600  # seconds
+RATE_LIMIT_SAFETY = 0.9  # share of the quota polling may use
+RATE_LIMIT_RESERVE = 0.2  # share of the quota below which polling slows down
+API_KEY_COOLDOWN = 900  # seconds a key rejected as invalid is out of rotation
+BUDGET_SENSOR_COOLDOWN = 30  # seconds between writes of the budget sensor
+
+# Seconds each endpoint's responses are reused for
+CACHE_TTL = {
+    "StopMonitoring": 15,
+    "operators": 6 * 3600,
+    "stops": 6 * 3600,
+    "TripUpdates": 15,
+    "VehicleMonitoring": 15,
+    "servicealerts": 300,
+}
+CACHE_MAX_ENTRIES = 64
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Circuit breaker for endpoints that time out or fail on the server side
+BREAKER_FAILURE_THRESHOLD = 2  # consecutive failures that open the breaker
+BREAKER_BASE_DELAY = 30  # seconds the breaker first stays open
+BREAKER_MAX_DELAY = 900  # seconds the breaker stays open at most
+STALE_MAX_AGE = 900  # seconds a snapshot is still shown while 511 is failing
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)
 
 CONF_API_KEY = "api_key"
+# More keys whose quotas are pooled with the entry's own
+CONF_EXTRA_API_KEYS = "extra_api_keys"
 CONF_STOPS = "stops"
 CONF_AGENCY = "agency"
 CONF_STOP_CODE = "stop_code"
+CONF_UPDATE_INTERVAL = "update_interval"
+CONF_MIN_UPDATE_INTERVAL = "min_update_interval"
+CONF_MAX_UPDATE_INTERVAL = "max_update_interval"
+CONF_FETCH_MODE = "fetch_mode"
+
+# How StopMonitoring is requested: once per stop, once per agency, or once per
+# agency only when more than one of its stops is monitored.
+FETCH_MODE_AUTO = "auto"
+FETCH_MODE_STOP = "stop"
+FETCH_MODE_AGENCY = "agency"
+FETCH_MODES = [FETCH_MODE_AUTO, FETCH_MODE_STOP, FETCH_MODE_AGENCY]
+DEFAULT_FETCH_MODE = FETCH_MODE_AUTO
+
+# Agencies whose arrivals come from the GTFS-Realtime TripUpdates feed, a
+# compact protobuf fetched once per agency, instead of StopMonitoring
+CONF_TRIP_UPDATE_AGENCIES = "trip_update_agencies"
+
+CONF_STARTUP_CONCURRENCY = "startup_concurrency"
+DEFAULT_STARTUP_CONCURRENCY = 4
+
+# One sensor per stop listing its next departures, optionally only of some
+# lines or directions; a size of 0 disables it
+CONF_BOARD_SIZE = "departure_board_size"
+CONF_BOARD_LINES = "departure_board_lines"
+CONF_BOARD_DIRECTIONS = "departure_board_directions"
+DEFAULT_BOARD_SIZE = 5
+MAX_BOARD_SIZE = 30
+BOARD_DIRECTIONS = ["IB", "OB", "N", "S", "E", "W"]
+
+# One sensor per line and direction seen at a stop, optionally only for some
+CONF_LINE_SENSORS = "line_sensors"
+CONF_LINE_SENSOR_LINES = "line_sensor_lines"
+CONF_LINE_SENSOR_DIRECTIONS = "line_sensor_directions"
+DEFAULT_LINE_SENSORS = False
+LINE_SENSOR_ARRIVALS = 3  # arrivals of the line listed by its sensor
+
+# Live positions of the vehicles of the lines seen at the monitored stops,
+# fetched once per agency
+CONF_VEHICLES = "vehicles"
+DEFAULT_VEHICLES = False
+VEHICLE_MAX_AGE = 300  # seconds without a report before a vehicle is dropped
+LINE_SENSOR_VEHICLES = 5  # approaching vehicles listed by a line sensor
+
+# Service alerts of the monitored agencies, fetched once per agency on their
+# own slow interval and shown by a sensor per stop
+CONF_SERVICE_ALERTS = "service_alerts"
+DEFAULT_SERVICE_ALERTS = False
+ALERTS_UPDATE_INTERVAL = 600  # seconds
+
+# Register entities right away and let the first fetch finish in the background
+CONF_BACKGROUND_STARTUP = "background_startup"
+DEFAULT_BACKGROUND_STARTUP = False
+
+# Last known arrivals per stop, restored on startup
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 60  # seconds between writes
+SNAPSHOT_MAX_AGE = 900  # seconds a stored snapshot stays usable
+
+# Accuracy of the predicted arrival times per stop and line, from the last
+# arrivals seen at the stop
+ACCURACY_BUFFER_SIZE = 100  # arrivals kept per stop and line
+ACCURACY_LEAD = 300  # seconds ahead of arrival of the prediction judged
+ACCURACY_PERCENTILES = (10, 50, 90)
+ACCURACY_STORAGE_VERSION = 1
+ACCURACY_SAVE_DELAY = 300  # seconds between writes
+
+# Profiling of coordinator update cycles with the profile service
+SERVICE_PROFILE = "profile"
+ATTR_CYCLES = "cycles"
+ATTR_TIMEOUT = "timeout"
+DEFAULT_PROFILE_CYCLES = 5
+DEFAULT_PROFILE_TIMEOUT = 600  # seconds before a profile is written anyway
+PROFILE_TOP_FUNCTIONS = 30
+
+# Operator and stop catalogs, kept on disk for the config flow
+CATALOG_STORAGE_VERSION = 1
+CATALOG_TTL = 7 * 24 * 3600  # seconds before a catalog is refreshed
+CATALOG_SEARCH_LIMIT = 50  # stops offered for a search
+CATALOG_RETRY_DELAY = 3600  # seconds before a failed catalog fetch is retried
+
+# Nearby stops around the home zone, offered by the config flow
+SPATIAL_CELL_SIZE = 500  # meters
+CONF_AGENCIES = "agencies"
+CONF_RADIUS = "radius"
+DEFAULT_NEARBY_AGENCIES = ["SF"]
+DEFAULT_NEARBY_RADIUS = 400  # meters
+MAX_NEARBY_RADIUS = 5000  # meters
+NEARBY_FALLBACK_STOPS = 5  # nearest stops offered when none is within the radius
+
+# Scheduled departures from the agencies' GTFS feeds, shown while 511's
+# StopMonitoring fails
+CONF_SCHEDULE_FALLBACK = "schedule_fallback"
+DEFAULT_SCHEDULE_FALLBACK = False
+GTFS_TTL = 7 * 24 * 3600  # seconds before a downloaded feed is replaced
+GTFS_DOWNLOAD_TIMEOUT = 300  # seconds
+SCHEDULE_CHECK_INTERVAL = 24 * 3600  # seconds between checks for a newer feed
+SCHEDULE_HORIZON = 3 * 3600  # seconds of scheduled departures looked up
+SCHEDULE_DEPARTURES = 20  # scheduled departures shown at most
+SCHEDULE_BATCH_SIZE = 10_000  # rows inserted at a time while indexing a feed
@@ -2,27 +2,73 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any
+import time
+from dataclasses import replace
+from datetime import timedelta
+from typing import TYPE_CHECKING
 
+from homeassistant.core import CALLBACK_TYPE, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
+from .alerts import Bay511AlertChange, Bay511AlertIndex
 from .api import (
     Bay511ApiClientAuthenticationError,
+    Bay511ApiClientCommunicationError,
     Bay511ApiClientError,
+    Bay511ApiClientRateLimitError,
 )
-from .const import LOGGER
+from .catalog import async_get_catalog
+from .const import (
+    ALERTS_UPDATE_INTERVAL,
+    CATALOG_RETRY_DELAY,
+    COUNTDOWN_INTERVAL,
+    LOGGER,
+    STALE_MAX_AGE,
+)
+from .vehicles import Bay511VehicleIndex
 
 if TYPE_CHECKING:
-    from datetime import timedelta
+    from datetime import datetime
 
     from homeassistant.core import HomeAssistant
 
+    from .accuracy import Bay511StopAccuracy
     from .api import Bay511ApiClient
+    from .models import StopSnapshot
+    from .polling import Bay511PollingPolicy
+    from .profiler import Bay511Profiler
+    from .schedule import Bay511Schedule
+    from .vehicles import ApproachKey
+
+
+def _stale_snapshot(snapshot: StopSnapshot | None) -> StopSnapshot | None:
+    """Return a snapshot to keep showing while 511 fails, if recent enough."""
+    if snapshot is None:
+        return None
+    age = snapshot.age()
+    if age is None or age > STALE_MAX_AGE:
+        return None
+    return snapshot.counted_down()
 
 
 class Bay511DataUpdateCoordinator(DataUpdateCoordinator):
-    """Class to manage fetching data from the 511 API."""
+    """
+    Class to manage fetching data from the 511 API.
+
+    Without a polling policy the coordinator does not poll on its own and is
+    fed by a `Bay511AgencyDataUpdateCoordinator` instead. A polling
+    coordinator picks each interval with its policy and lets the client's
+    request budget stretch it to stay inside the API quota.
+
+    Between polls a local countdown recomputes `minutes_away` from the
+    expected arrival times and drops departed vehicles. When 511 times out or
+    fails, the last good snapshot keeps being shown and marked stale for up
+    to `STALE_MAX_AGE` seconds. After that, or when there is no snapshot, the
+    stop shows the departures of the agency's schedule if one is indexed,
+    and becomes unavailable otherwise.
+    """
 
     def __init__(
         self,
@@ -30,27 +76,442 @@ class Bay511DataUpdateCoordinator(DataUpdateCoordinator):
         client: Bay511ApiClient,
         agency: str,
         stop_code: str,
-        update_interval: timedelta,
+        polling: Bay511PollingPolicy | None,
     ) -> None:
         """Initialize the coordinator."""
         super().__init__(
             hass,
             LOGGER,
             name=f"Bay 511 Stop {stop_code}",
-            update_interval=update_interval,
+            update_interval=polling.base_interval if polling else None,
         )
         self.client = client
         self.agency = agency
         self.stop_code = stop_code
+        self.polling = polling
+        self.agency_coordinator: Bay511AgencyDataUpdateCoordinator | None = None
+        self.vehicles: Bay511VehicleDataUpdateCoordinator | None = None
+        self.alerts: Bay511AlertsDataUpdateCoordinator | None = None
+        self.accuracy: Bay511StopAccuracy | None = None
+        self.stale = False
+        self.schedule: Bay511Schedule | None = None
+        self.scheduled = False
+        self.profiler: Bay511Profiler | None = None
+
+    @property
+    def poll_policy(self) -> Bay511PollingPolicy | None:
+        """Return the policy of the coordinator polling for this stop."""
+        if self.agency_coordinator is not None:
+            return self.agency_coordinator.polling
+        return self.polling
 
-    async def _async_update_data(self) -> dict[str, Any]:
+    async def _async_update_data(self) -> StopSnapshot:
         """Update data via library."""
+        if self.agency_coordinator is not None:
+            return await self._async_refresh_agency()
+        data = self.data
         try:
-            return await self.client.async_get_stop_monitoring(
+            data = await self.client.async_get_stop_monitoring(
                 self.agency, self.stop_code
             )
+        except Bay511ApiClientRateLimitError as exception:
+            if self.data is None or self.scheduled:
+                if (data := await self.async_fallback(stale=False)) is None:
+                    raise UpdateFailed(exception) from exception
+                return data
+            LOGGER.debug("%s: %s, keeping previous data", self.name, exception)
+            return self.data
+        except Bay511ApiClientAuthenticationError as exception:
+            raise ConfigEntryAuthFailed(exception) from exception
+        except Bay511ApiClientCommunicationError as exception:
+            if (data := await self.async_fallback(stale=True)) is None:
+                raise UpdateFailed(exception) from exception
+            LOGGER.debug("%s: %s, showing older arrivals", self.name, exception)
+            return data
+        except Bay511ApiClientError as exception:
+            if (data := await self.async_fallback(stale=False)) is None:
+                raise UpdateFailed(exception) from exception
+            return data
+        finally:
+            self.schedule_next_poll([data] if data else [])
+            if self.profiler is not None:
+                self.profiler.async_cycle_done()
+
+        self.stale = self.scheduled = False
+        return data
+
+    async def _async_refresh_agency(self) -> StopSnapshot:
+        """Refresh a fed stop through its agency's fetch, as when updated manually."""
+        agency_coordinator = self.agency_coordinator
+        await agency_coordinator.async_request_refresh()
+        if not agency_coordinator.last_update_success or self.data is None:
+            raise UpdateFailed(agency_coordinator.last_exception)
+        return self.data
+
+    async def async_fallback(self, *, stale: bool) -> StopSnapshot | None:
+        """
+        Return what to show while 511 fails, or None to become unavailable.
+
+        That is the last live snapshot while recent enough if `stale` is
+        set, and otherwise the scheduled departures.
+        """
+        if (
+            stale
+            and not self.scheduled
+            and (snapshot := _stale_snapshot(self.data)) is not None
+        ):
+            self.stale = True
+            return snapshot
+        if self.schedule is not None:
+            snapshot = await self.schedule.async_departures(self.stop_code)
+            if snapshot is not None:
+                self.stale = False
+                self.scheduled = True
+                return snapshot
+        return None
+
+    def schedule_next_poll(self, snapshots: list[StopSnapshot]) -> None:
+        """Set the interval until the next poll from the latest snapshots."""
+        if self.polling is not None:
+            self.update_interval = self.client.budget.next_interval(
+                self, self.polling.next_interval(snapshots)
+            )
+
+    @callback
+    def async_start_countdown(self) -> CALLBACK_TYPE:
+        """Start the local countdown and return a callback to stop it."""
+        return async_track_time_interval(
+            self.hass,
+            self._async_count_down,
+            timedelta(seconds=COUNTDOWN_INTERVAL),
+            name=f"{self.name} countdown",
+        )
+
+    @callback
+    def _async_count_down(self, _now: datetime) -> None:
+        """Recompute minutes until arrival without a network request."""
+        if self.data is None:
+            return
+
+        snapshot = self.data.counted_down()
+        if snapshot is self.data:
+            return
+
+        self.data = snapshot
+        self.async_update_listeners()
+
+
+class Bay511AgencyDataUpdateCoordinator(DataUpdateCoordinator):
+    """
+    Class to fetch arrivals once for all stops of an agency.
+
+    Arrivals come from an agency-wide StopMonitoring request, or with
+    `trip_updates` set, from the agency's GTFS-Realtime TripUpdates feed.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: Bay511ApiClient,
+        agency: str,
+        polling: Bay511PollingPolicy,
+        *,
+        trip_updates: bool = False,
+    ) -> None:
+        """Initialize the coordinator."""
+        super().__init__(
+            hass,
+            LOGGER,
+            name=f"Bay 511 Agency {agency}",
+            update_interval=polling.base_interval,
+        )
+        self.client = client
+        self.agency = agency
+        self.stop_coordinators: dict[str, Bay511DataUpdateCoordinator] = {}
+        self.polling = polling
+        self.trip_updates = trip_updates
+        # Gives the stop codes of the TripUpdates feed's stop_ids
+        self.schedule: Bay511Schedule | None = None
+        self._stop_names: dict[str, str | None] | None = None
+        # Monotonic time before which a failed stop catalog isn't fetched again
+        self._stop_names_retry_at = 0.0
+        self.profiler: Bay511Profiler | None = None
+
+    def add_stop(self, coordinator: Bay511DataUpdateCoordinator) -> None:
+        """Feed a per-stop coordinator from this agency's responses."""
+        self.stop_coordinators[coordinator.stop_code] = coordinator
+        coordinator.agency_coordinator = self
+
+    def restore_from_stops(self) -> None:
+        """Adopt the stops' restored snapshots if every stop has one."""
+        if all(c.data is not None for c in self.stop_coordinators.values()):
+            self.data = {
+                stop_code: coordinator.data
+                for stop_code, coordinator in self.stop_coordinators.items()
+            }
+
+    async def _async_update_data(self) -> dict[str, StopSnapshot]:
+        """Fetch the agency once and hand each stop its own snapshot."""
+        data = self.data
+        try:
+            if self.trip_updates:
+                data = await self.client.async_get_agency_trip_updates(
+                    self.agency,
+                    self.stop_coordinators,
+                    await self.schedule.async_stop_id_codes()
+                    if self.schedule is not None
+                    else None,
+                )
+                stop_names = await self._async_stop_names()
+                data = {
+                    stop_code: replace(snapshot, stop_name=stop_names.get(stop_code))
+                    for stop_code, snapshot in data.items()
+                }
+            else:
+                data = await self.client.async_get_agency_stop_monitoring(
+                    self.agency, self.stop_coordinators
+                )
+        except Bay511ApiClientRateLimitError as exception:
+            if self.data is None or any(
+                coordinator.scheduled for coordinator in self.stop_coordinators.values()
+            ):
+                # Kept in `data` for scheduling the next poll
+                data = await self._async_fallback(exception, stale=False)
+                return data  # noqa: RET504
+            LOGGER.debug("%s: %s, keeping previous data", self.name, exception)
+            return self.data
+        except Bay511ApiClientAuthenticationError as exception:
+            self._async_set_stop_errors(exception)
+            raise ConfigEntryAuthFailed(exception) from exception
+        except Bay511ApiClientCommunicationError as exception:
+            data = await self._async_fallback(exception, stale=True)
+            LOGGER.debug("%s: %s, showing older arrivals", self.name, exception)
+            return data
+        except Bay511ApiClientError as exception:
+            data = await self._async_fallback(exception, stale=False)
+            return data  # noqa: RET504
+        finally:
+            self.schedule_next_poll(list(data.values()) if data else [])
+            if self.profiler is not None:
+                self.profiler.async_cycle_done()
+
+        for coordinator in self.stop_coordinators.values():
+            coordinator.stale = coordinator.scheduled = False
+        self._async_feed_stops(data)
+        return data
+
+    async def _async_stop_names(self) -> dict[str, str | None]:
+        """Return the names of the fed stops from the agency's stop catalog."""
+        if self._stop_names is None:
+            # Retrying on every poll would spend the quota on the catalog
+            if time.monotonic() < self._stop_names_retry_at:
+                return {}
+            # TripUpdates feeds don't name their stops
+            try:
+                index = await async_get_catalog(self.hass).async_stop_index(
+                    self.client, self.agency
+                )
+            except Bay511ApiClientError as exception:
+                LOGGER.debug("%s: no stop names: %s", self.name, exception)
+                self._stop_names_retry_at = time.monotonic() + CATALOG_RETRY_DELAY
+                return {}
+            self._stop_names = {
+                stop_code: stop.name if (stop := index.get(stop_code)) else None
+                for stop_code in self.stop_coordinators
+            }
+        return self._stop_names
+
+    async def _async_fallback(
+        self, exception: Exception, *, stale: bool
+    ) -> dict[str, StopSnapshot]:
+        """Feed the stops what to show while 511 fails, or fail all of them."""
+        fallback = {}
+        for stop_code, coordinator in self.stop_coordinators.items():
+            if (snapshot := await coordinator.async_fallback(stale=stale)) is None:
+                self._async_set_stop_errors(exception)
+                raise UpdateFailed(exception) from exception
+            fallback[stop_code] = snapshot
+        self._async_feed_stops(fallback)
+        return fallback
+
+    def schedule_next_poll(self, snapshots: list[StopSnapshot]) -> None:
+        """Set the interval until the next poll from the latest snapshots."""
+        self.update_interval = self.client.budget.next_interval(
+            self, self.polling.next_interval(snapshots)
+        )
+
+    def _async_feed_stops(self, data: dict[str, StopSnapshot]) -> None:
+        """Hand every fed stop its snapshot."""
+        for stop_code, coordinator in self.stop_coordinators.items():
+            coordinator.async_set_updated_data(data[stop_code])
+
+    def _async_set_stop_errors(self, exception: Exception) -> None:
+        """Mark every fed stop as failed."""
+        for coordinator in self.stop_coordinators.values():
+            coordinator.async_set_update_error(exception)
+
+
+class Bay511VehicleDataUpdateCoordinator(DataUpdateCoordinator):
+    """
+    Class to track the vehicles of the lines serving an agency's stops.
+
+    Each update fetches the agency's VehicleMonitoring feed once, for the
+    lines seen in the arrivals of its stops, and merges it into a
+    `Bay511VehicleIndex`. `changed` holds the (stop, line) pairs whose
+    approaching vehicles changed in the last update, so entities only write
+    their state when their own vehicles moved.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: Bay511ApiClient,
+        agency: str,
+        polling: Bay511PollingPolicy,
+    ) -> None:
+        """Initialize the coordinator."""
+        super().__init__(
+            hass,
+            LOGGER,
+            name=f"Bay 511 Vehicles {agency}",
+            update_interval=polling.base_interval,
+        )
+        self.client = client
+        self.agency = agency
+        self.polling = polling
+        self.stop_coordinators: list[Bay511DataUpdateCoordinator] = []
+        self.index = Bay511VehicleIndex()
+        self.changed: set[ApproachKey] = set()
+        self.profiler: Bay511Profiler | None = None
+
+    def add_stop(self, coordinator: Bay511DataUpdateCoordinator) -> None:
+        """Track the vehicles of the lines serving a stop."""
+        self.stop_coordinators.append(coordinator)
+        coordinator.vehicles = self
+
+    async def _async_update_data(self) -> Bay511VehicleIndex:
+        """Fetch the agency's vehicles and update the index in place."""
+        snapshots = [c.data for c in self.stop_coordinators if c.data is not None]
+        line_refs = {
+            arrival.line_ref
+            for snapshot in snapshots
+            for arrival in snapshot.arrivals
+            if arrival.line_ref is not None
+        }
+        try:
+            if not line_refs:
+                # No service at the stops; no need to ask where vehicles are
+                self.changed = self.index.clear()
+                return self.index
+            activities = await self.client.async_get_agency_vehicle_activities(
+                self.agency, line_refs
+            )
+        except Bay511ApiClientRateLimitError as exception:
+            LOGGER.debug("%s: %s, keeping previous vehicles", self.name, exception)
+            self.changed = set()
+            return self.index
+        except Bay511ApiClientAuthenticationError as exception:
+            raise ConfigEntryAuthFailed(exception) from exception
+        except Bay511ApiClientError as exception:
+            raise UpdateFailed(exception) from exception
+        finally:
+            self.schedule_next_poll(snapshots)
+            if self.profiler is not None:
+                self.profiler.async_cycle_done()
+
+        start = time.perf_counter()
+        self.changed = self.index.update(activities)
+        metrics = self.client.metrics
+        metrics.endpoint("VehicleMonitoring").record_parse(time.perf_counter() - start)
+        metrics.notify()
+        return self.index
+
+    def schedule_next_poll(self, snapshots: list[StopSnapshot]) -> None:
+        """Poll as often as the arrivals of the stops are polled."""
+        self.update_interval = self.client.budget.next_interval(
+            self, self.polling.next_interval(snapshots)
+        )
+
+
+class Bay511AlertsDataUpdateCoordinator(DataUpdateCoordinator):
+    """
+    Class to fetch the service alerts of an agency for all of its stops.
+
+    Alerts are fetched once per agency every `ALERTS_UPDATE_INTERVAL`
+    seconds and diffed against the previous response by alert ID. Only the
+    stops named by a changed alert, served by one of its lines, or all of
+    them for agency-wide alerts, get their listeners called, and all of them
+    when the alerts become available or unavailable.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: Bay511ApiClient,
+        agency: str,
+    ) -> None:
+        """Initialize the coordinator."""
+        super().__init__(
+            hass,
+            LOGGER,
+            name=f"Bay 511 Alerts {agency}",
+            update_interval=timedelta(seconds=ALERTS_UPDATE_INTERVAL),
+        )
+        self.client = client
+        self.agency = agency
+        # Polled on a fixed interval rather than by arrivals
+        self.polling = None
+        self.stop_coordinators: list[Bay511DataUpdateCoordinator] = []
+        self.index = Bay511AlertIndex()
+        # Scope of the alerts changed since the stops were last notified
+        self.change = Bay511AlertChange()
+        self._available = False
+
+    def add_stop(self, coordinator: Bay511DataUpdateCoordinator) -> None:
+        """Show the agency's alerts at a stop."""
+        self.stop_coordinators.append(coordinator)
+        coordinator.alerts = self
+
+    async def _async_update_data(self) -> Bay511AlertIndex:
+        """Fetch the agency's alerts and notify the stops they changed for."""
+        try:
+            alerts = await self.client.async_get_agency_service_alerts(self.agency)
+        except Bay511ApiClientRateLimitError as exception:
+            LOGGER.debug("%s: %s, keeping previous alerts", self.name, exception)
+            return self.index
         except Bay511ApiClientAuthenticationError as exception:
             raise ConfigEntryAuthFailed(exception) from exception
         except Bay511ApiClientError as exception:
             raise UpdateFailed(exception) from exception
+        finally:
+            self.update_interval = self.client.budget.next_interval(
+                self, timedelta(seconds=ALERTS_UPDATE_INTERVAL)
+            )
+
+        self.change = self.index.update(alerts)
+        return self.index
 
+    @callback
+    def async_update_listeners(self) -> None:
+        """Call the listeners of the stops the last update changed alerts for."""
+        super().async_update_listeners()
+        available = self.last_update_success and self.data is not None
+        if available != self._available:
+            # Alert sensors of every stop become available or unavailable
+            self._available = available
+            stops = self.stop_coordinators
+        elif self.change:
+            stops = [
+                coordinator
+                for coordinator in self.stop_coordinators
+                if coordinator.data is not None
+                and self.change.affects(
+                    coordinator.stop_code,
+                    {arrival.line_ref for arrival in coordinator.data.arrivals},
+                )
+            ]
+        else:
+            return
+        self.change = Bay511AlertChange()
+        for coordinator in stops:
+            coordinator.async_update_listeners()
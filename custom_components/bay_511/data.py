@@ -2,24 +2,52 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from homeassistant.config_entries import ConfigEntry
     from homeassistant.loader import Integration
 
+    from .accuracy import Bay511AccuracyStore
     from .api import Bay511ApiClient
-    from .coordinator import Bay511DataUpdateCoordinator
+    from .coordinator import (
+        Bay511AgencyDataUpdateCoordinator,
+        Bay511AlertsDataUpdateCoordinator,
+        Bay511DataUpdateCoordinator,
+        Bay511VehicleDataUpdateCoordinator,
+    )
+    from .storage import Bay511SnapshotStore
 
 
 type Bay511ConfigEntry = ConfigEntry[Bay511Data]
 
 
+@dataclass(slots=True)
+class Bay511StateWriteStats:
+    """Arrival sensor state writes, and those skipped as unchanged."""
+
+    written: int = 0
+    skipped: int = 0
+
+
 @dataclass
 class Bay511Data:
     """Data for the Bay Area 511 integration."""
 
     client: Bay511ApiClient
     coordinators: dict[str, Bay511DataUpdateCoordinator]  # One coordinator per stop
+    # Agencies whose stops share one StopMonitoring fetch
+    agency_coordinators: dict[str, Bay511AgencyDataUpdateCoordinator]
+    snapshot_store: Bay511SnapshotStore
+    accuracy_store: Bay511AccuracyStore
     integration: Integration
+    # Agencies whose vehicles are tracked, when enabled in the options
+    vehicle_coordinators: dict[str, Bay511VehicleDataUpdateCoordinator] = field(
+        default_factory=dict
+    )
+    # Agencies whose service alerts are shown, when enabled in the options
+    alert_coordinators: dict[str, Bay511AlertsDataUpdateCoordinator] = field(
+        default_factory=dict
+    )
+    write_stats: Bay511StateWriteStats = field(default_factory=Bay511StateWriteStats)
@@ -0,0 +1,119 @@
+"""Diagnostics support for Bay Area 511 Transit."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.diagnostics import async_redact_data
+
+from .const import CONF_API_KEY, CONF_EXTRA_API_KEYS
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+    from .data import Bay511ConfigEntry
+
+TO_REDACT = {CONF_API_KEY, CONF_EXTRA_API_KEYS}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant,  # noqa: ARG001
+    entry: Bay511ConfigEntry,
+) -> dict[str, Any]:
+    """Return request metrics and polling state of a config entry."""
+    runtime_data = entry.runtime_data
+    client = runtime_data.client
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "requests": client.metrics.as_dict(),
+        "budget": {
+            "limit": client.budget.limit,
+            "remaining": client.budget.remaining,
+            "pollers": client.budget.poller_count,
+            "keys": client.budget.report(),
+        },
+        "cache": client.cache.stats,
+        "state_writes": {
+            "written": runtime_data.write_stats.written,
+            "skipped": runtime_data.write_stats.skipped,
+        },
+        "circuit_breakers": {
+            endpoint: {
+                "state": breaker.state,
+                "failures": breaker.failures,
+                "opened": breaker.opened,
+                "retry_in": round(breaker.retry_in),
+            }
+            for endpoint, breaker in client.breakers.items()
+        },
+        "agencies": {
+            agency: {
+                **_coordinator_diagnostics(coordinator),
+                "source": "TripUpdates"
+                if coordinator.trip_updates
+                else "StopMonitoring",
+            }
+            for agency, coordinator in runtime_data.agency_coordinators.items()
+        },
+        "vehicles": {
+            agency: {
+                **_coordinator_diagnostics(coordinator),
+                "vehicles": len(coordinator.index.vehicles),
+                "updates": coordinator.index.updates,
+                "moved": coordinator.index.moved,
+                "evicted": coordinator.index.evicted,
+            }
+            for agency, coordinator in runtime_data.vehicle_coordinators.items()
+        },
+        "alerts": {
+            agency: {
+                **_coordinator_diagnostics(coordinator),
+                "alerts": len(coordinator.index.alerts),
+                "updates": coordinator.index.updates,
+                "changed": coordinator.index.changed,
+            }
+            for agency, coordinator in runtime_data.alert_coordinators.items()
+        },
+        "schedules": {
+            coordinator.agency: {
+                "available": coordinator.schedule.available,
+                "path": str(coordinator.schedule.path),
+            }
+            for coordinator in runtime_data.coordinators.values()
+            if coordinator.schedule is not None
+        },
+        "stops": {
+            stop_key: {
+                **_coordinator_diagnostics(coordinator),
+                "stale": coordinator.stale,
+                "scheduled": coordinator.scheduled,
+                "arrivals": len(coordinator.data.arrivals)
+                if coordinator.data is not None
+                else None,
+                "accuracy_samples": {
+                    line_ref: len(buffer)
+                    for line_ref, buffer in coordinator.accuracy.buffers.items()
+                }
+                if coordinator.accuracy is not None
+                else None,
+            }
+            for stop_key, coordinator in runtime_data.coordinators.items()
+        },
+    }
+
+
+def _coordinator_diagnostics(coordinator: DataUpdateCoordinator) -> dict[str, Any]:
+    """Return the polling state of a coordinator."""
+    policy = coordinator.polling
+    return {
+        "last_update_success": coordinator.last_update_success,
+        "update_interval": coordinator.update_interval.total_seconds()
+        if coordinator.update_interval is not None
+        else None,
+        "polls": policy.polls if policy is not None else None,
+        "polls_saved": policy.polls_saved if policy is not None else None,
+    }
@@ -0,0 +1,346 @@
+"""Decoding of GTFS-Realtime TripUpdates feeds straight from protobuf bytes."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from operator import itemgetter
+from typing import TYPE_CHECKING
+
+from .const import DEPARTED_GRACE
+from .models import Arrival, StopSnapshot, intern_string, minutes_until
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping
+
+    import aiohttp
+
+# Protobuf wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH_DELIMITED = 2
+_FIXED32 = 5
+
+# Field numbers of the gtfs-realtime.proto messages that are read
+_FEED_HEADER = 1
+_FEED_ENTITY = 2
+_HEADER_TIMESTAMP = 3
+_ENTITY_IS_DELETED = 2
+_ENTITY_TRIP_UPDATE = 3
+_TRIP_UPDATE_TRIP = 1
+_TRIP_UPDATE_STOP_TIME_UPDATE = 2
+_TRIP_ROUTE_ID = 5
+_TRIP_SCHEDULE_RELATIONSHIP = 4
+
+# Keys (field number << 3 | wire type) of the StopTimeUpdate and
+# StopTimeEvent fields, which all fit in one byte
+_STOP_TIME_ARRIVAL_KEY = 2 << 3 | _LENGTH_DELIMITED
+_STOP_TIME_DEPARTURE_KEY = 3 << 3 | _LENGTH_DELIMITED
+_STOP_TIME_STOP_ID_KEY = 4 << 3 | _LENGTH_DELIMITED
+_STOP_TIME_SCHEDULE_RELATIONSHIP_KEY = 5 << 3 | _VARINT
+_EVENT_DELAY_KEY = 1 << 3 | _VARINT
+_EVENT_TIME_KEY = 2 << 3 | _VARINT
+
+_TRIP_CANCELED = 3
+_STOP_TIME_SCHEDULED = 0
+
+_INT64_SIGN = 1 << 63
+_UINT64 = 1 << 64
+
+
+def _varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Read a varint and return it with the position after it."""
+    byte = data[pos]
+    if byte < 0x80:  # noqa: PLR2004
+        return byte, pos + 1
+    result = byte & 0x7F
+    shift = 7
+    while True:
+        pos += 1
+        byte = data[pos]
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:  # noqa: PLR2004
+            return result, pos + 1
+        shift += 7
+
+
+def _signed(value: int) -> int:
+    """Return an int32 or int64 varint as a signed number."""
+    return value - _UINT64 if value >= _INT64_SIGN else value
+
+
+def _fields(data: bytes, pos: int, end: int) -> Iterator[tuple[int, int, int]]:
+    """
+    Yield (field number, value, end) for every field of a message.
+
+    Length-delimited fields yield the start and end of their bytes, which
+    are only decoded if needed; other fields yield their value and -1.
+    """
+    while pos < end:
+        key, pos = _varint(data, pos)
+        wire_type = key & 7
+        if wire_type == _VARINT:
+            value, pos = _varint(data, pos)
+            yield key >> 3, value, -1
+        elif wire_type == _LENGTH_DELIMITED:
+            length, pos = _varint(data, pos)
+            if pos + length > end:
+                msg = "Truncated protobuf message"
+                raise ValueError(msg)
+            yield key >> 3, pos, pos + length
+            pos += length
+        elif wire_type == _FIXED64:
+            yield key >> 3, int.from_bytes(data[pos : pos + 8], "little"), -1
+            pos += 8
+        elif wire_type == _FIXED32:
+            yield key >> 3, int.from_bytes(data[pos : pos + 4], "little"), -1
+            pos += 4
+        else:
+            msg = f"Unsupported protobuf wire type {wire_type}"
+            raise ValueError(msg)
+    if pos != end:
+        msg = "Truncated protobuf message"
+        raise ValueError(msg)
+
+
+def _field_end(data: bytes, pos: int, end: int) -> int:
+    """Return the position after the field starting at `pos`."""
+    key, pos = _varint(data, pos)
+    wire_type = key & 7
+    if wire_type == _VARINT:
+        return _varint(data, pos)[1]
+    if wire_type == _LENGTH_DELIMITED:
+        length, pos = _varint(data, pos)
+        pos += length
+    elif wire_type == _FIXED64:
+        pos += 8
+    elif wire_type == _FIXED32:
+        pos += 4
+    else:
+        msg = f"Unsupported protobuf wire type {wire_type}"
+        raise ValueError(msg)
+    if pos > end:
+        msg = "Truncated protobuf message"
+        raise ValueError(msg)
+    return pos
+
+
+def _stop_time_event(data: bytes, pos: int, end: int) -> tuple[int | None, int]:
+    """Return the time and delay of a StopTimeEvent."""
+    event_time = None
+    delay = 0
+    while pos < end:
+        key = data[pos]
+        if key == _EVENT_TIME_KEY:
+            event_time, pos = _varint(data, pos + 1)
+        elif key == _EVENT_DELAY_KEY:
+            delay, pos = _varint(data, pos + 1)
+        else:
+            pos = _field_end(data, pos, end)
+    if pos != end:
+        msg = "Truncated protobuf message"
+        raise ValueError(msg)
+    return (
+        _signed(event_time) if event_time is not None else None,
+        _signed(delay),
+    )
+
+
+@dataclass(slots=True)
+class Bay511TripUpdateIndex:
+    """
+    Stop time updates of an agency's TripUpdates feed, by stop.
+
+    Indexing only reads each update's stop, translated from its GTFS
+    stop_id to the stop code 511 monitors it by; the index keeps the feed's
+    bytes with the position of every update and its trip's route. Times are
+    decoded and `Arrival` objects created only for the stops monitored,
+    when their snapshot is asked for.
+    """
+
+    data: bytes = b""
+    timestamp: int | None = None
+    stop_times: dict[str, list[tuple[int, int, str | None]]] = field(
+        default_factory=dict
+    )
+    trips: int = 0
+
+    def snapshot(self, stop_code: str, now: datetime | None = None) -> StopSnapshot:
+        """Return the predicted arrivals at a stop, soonest first."""
+        now = now or datetime.now(UTC)
+        current = now.timestamp()
+        times = []
+        for pos, end, route in self.stop_times.get(stop_code, ()):
+            try:
+                stop_time = _stop_time(self.data, pos, end)
+            except (IndexError, ValueError):
+                continue
+            if stop_time is not None and stop_time[0] >= current - DEPARTED_GRACE:
+                times.append((*stop_time, route))
+        times.sort(key=itemgetter(0))
+
+        arrivals = []
+        for expected, departure, delay, route in times:
+            expected_at = datetime.fromtimestamp(expected, UTC)
+            # Positional arguments, as in Arrival.from_visit
+            arrivals.append(
+                Arrival(
+                    route,
+                    # The feed has no direction refs like IB or OB, nor
+                    # destination names
+                    None,
+                    None,
+                    datetime.fromtimestamp(expected - delay, UTC).isoformat(),
+                    expected_at.isoformat(),
+                    departure is not None and expected <= current <= departure,
+                    expected_at,
+                    minutes_until(expected_at, now),
+                )
+            )
+        # The feed doesn't name its stops; coordinators add catalog names
+        return StopSnapshot(None, stop_code, tuple(arrivals), now)
+
+    def add_trip_update(
+        self, pos: int, end: int, stop_id_codes: Mapping[str, str]
+    ) -> None:
+        """Index the stop time updates of one TripUpdate by stop code."""
+        data = self.data
+        route = None
+        stop_time_updates = []
+        for number, value, value_end in _fields(data, pos, end):
+            if number == _TRIP_UPDATE_STOP_TIME_UPDATE:
+                stop_time_updates.append((value, value_end))
+            elif number == _TRIP_UPDATE_TRIP:
+                route, canceled = _trip_route(data, value, value_end)
+                if canceled:
+                    return
+        self.trips += 1
+
+        stop_times = self.stop_times
+        for update_pos, update_end in stop_time_updates:
+            if (stop_id := _stop_id(data, update_pos, update_end)) is None:
+                continue
+            stop_code = stop_id_codes.get(stop_id, stop_id)
+            if (times := stop_times.get(stop_code)) is None:
+                stop_times[stop_code] = [(update_pos, update_end, route)]
+            else:
+                times.append((update_pos, update_end, route))
+
+
+def _trip_route(data: bytes, pos: int, end: int) -> tuple[str | None, bool]:
+    """Return the route of a TripDescriptor and whether the trip is canceled."""
+    route = None
+    for number, value, value_end in _fields(data, pos, end):
+        if number == _TRIP_ROUTE_ID:
+            route = intern_string(data[value:value_end].decode())
+        elif number == _TRIP_SCHEDULE_RELATIONSHIP and value == _TRIP_CANCELED:
+            return route, True
+    return route, False
+
+
+def _stop_id(data: bytes, pos: int, end: int) -> str | None:
+    """Return the stop of a StopTimeUpdate."""
+    # Stop time updates make up most of a feed, so their one-byte keys are
+    # matched directly and the other fields skipped without decoding them
+    while pos < end:
+        key = data[pos]
+        if key == _STOP_TIME_STOP_ID_KEY:
+            length, pos = _varint(data, pos + 1)
+            if pos + length > end:
+                break
+            return data[pos : pos + length].decode()
+        if key in (_STOP_TIME_ARRIVAL_KEY, _STOP_TIME_DEPARTURE_KEY):
+            length, pos = _varint(data, pos + 1)
+            pos += length
+        else:
+            pos = _field_end(data, pos, end)
+    return None
+
+
+def _stop_time(data: bytes, pos: int, end: int) -> tuple[int, int | None, int] | None:
+    """
+    Return the expected time, departure and delay of a StopTimeUpdate.
+
+    Skipped stops and stops without a prediction return None.
+    """
+    arrival = departure = None
+    delay = departure_delay = 0
+    while pos < end:
+        key = data[pos]
+        if key in (_STOP_TIME_ARRIVAL_KEY, _STOP_TIME_DEPARTURE_KEY):
+            length, start = _varint(data, pos + 1)
+            pos = start + length
+            if pos > end:
+                break
+            if key == _STOP_TIME_ARRIVAL_KEY:
+                arrival, delay = _stop_time_event(data, start, pos)
+            else:
+                departure, departure_delay = _stop_time_event(data, start, pos)
+        elif key == _STOP_TIME_SCHEDULE_RELATIONSHIP_KEY:
+            relationship, pos = _varint(data, pos + 1)
+            if relationship != _STOP_TIME_SCHEDULED:
+                return None
+        else:
+            pos = _field_end(data, pos, end)
+    if pos != end:
+        msg = "Truncated protobuf message"
+        raise ValueError(msg)
+    if arrival is None:
+        # Only the departure is predicted, as at the first stop of a trip
+        arrival, delay = departure, departure_delay
+    if arrival is None:
+        return None
+    return arrival, departure, delay
+
+
+def parse_trip_updates(
+    body: bytes, stop_id_codes: Mapping[str, str] | None = None
+) -> Bay511TripUpdateIndex:
+    """
+    Index a TripUpdates FeedMessage by stop code.
+
+    Fields are read straight from the protobuf bytes, and of each stop time
+    update only its stop, so no generated classes or intermediate objects
+    are needed. `stop_id_codes` gives the stop codes of the stop_ids that
+    differ from them.
+    """
+    stop_id_codes = stop_id_codes or {}
+    index = Bay511TripUpdateIndex(body)
+    try:
+        for number, value, end in _fields(body, 0, len(body)):
+            if number == _FEED_ENTITY and end >= 0:
+                trip_update = None
+                for entity_number, entity_value, entity_end in _fields(
+                    body, value, end
+                ):
+                    if entity_number == _ENTITY_TRIP_UPDATE and entity_end >= 0:
+                        trip_update = (entity_value, entity_end)
+                    elif entity_number == _ENTITY_IS_DELETED and entity_value:
+                        trip_update = None
+                        break
+                if trip_update is not None:
+                    index.add_trip_update(*trip_update, stop_id_codes)
+            elif number == _FEED_HEADER and end >= 0:
+                for header_number, header_value, _ in _fields(body, value, end):
+                    if header_number == _HEADER_TIMESTAMP:
+                        index.timestamp = header_value
+    except IndexError as exception:
+        msg = "Truncated protobuf message"
+        raise ValueError(msg) from exception
+    except UnicodeDecodeError as exception:
+        msg = f"Invalid string in protobuf message - {exception}"
+        raise ValueError(msg) from exception
+    return index
+
+
+async def async_read_trip_updates(
+    response: aiohttp.ClientResponse,
+    stop_id_codes: Mapping[str, str] | None = None,
+) -> Bay511TripUpdateIndex:
+    """Read a TripUpdates response and index it by stop code."""
+    body = await response.read()
+    # Large agencies send a few hundred kilobytes; index them off the loop
+    return await asyncio.get_running_loop().run_in_executor(
+        None, parse_trip_updates, body, stop_id_codes
+    )
@@ -0,0 +1,158 @@
+"""Request instrumentation for the Bay Area 511 API client."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any
+
+from .const import LATENCY_BUCKETS
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping
+
+_RATE_LIMIT_HEADERS = (
+    "RateLimit-Limit",
+    "RateLimit-Remaining",
+    "RateLimit-Reset",
+    "X-RateLimit-Limit",
+    "X-RateLimit-Remaining",
+    "Retry-After",
+)
+
+
+def to_milliseconds(seconds: float | None) -> float | None:
+    """Convert seconds to rounded milliseconds."""
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _bucket_label(upper: float) -> str:
+    """Return the label of a latency bucket."""
+    return f"<={upper * 1000:g}ms"
+
+
+class Bay511EndpointMetrics:
+    """Latency, size, parse time and error counters of one endpoint."""
+
+    def __init__(self) -> None:
+        """Initialize empty counters."""
+        self.requests = 0
+        self.errors: dict[str, int] = {}
+        # One count per bucket of LATENCY_BUCKETS, plus one for slower ones
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_last: float | None = None
+        self.bytes_total = 0
+        self.bytes_max = 0
+        self.bytes_last: int | None = None
+        self.parse_total = 0.0
+        self.parse_max = 0.0
+        self.parse_last: float | None = None
+        self.parses = 0
+
+    def record_response(self, latency: float, size: int) -> None:
+        """Count a response that took `latency` seconds and `size` bytes."""
+        self.requests += 1
+        self.latency_histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.latency_last = latency
+        self.bytes_total += size
+        self.bytes_max = max(self.bytes_max, size)
+        self.bytes_last = size
+
+    def record_parse(self, seconds: float) -> None:
+        """Count the time spent turning a response into snapshots."""
+        self.parses += 1
+        self.parse_total += seconds
+        self.parse_max = max(self.parse_max, seconds)
+        self.parse_last = seconds
+
+    def record_error(self, exception: Exception) -> None:
+        """Count a failed request by exception class."""
+        name = type(exception).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    @property
+    def histogram(self) -> dict[str, int]:
+        """Return the latency histogram keyed by bucket label."""
+        labels = [_bucket_label(upper) for upper in LATENCY_BUCKETS]
+        labels.append(f">{LATENCY_BUCKETS[-1] * 1000:g}ms")
+        return dict(zip(labels, self.latency_histogram, strict=True))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters, with times in milliseconds."""
+        return {
+            "requests": self.requests,
+            "errors": dict(self.errors),
+            "latency_ms": {
+                "last": to_milliseconds(self.latency_last),
+                "mean": to_milliseconds(self.latency_total / self.requests)
+                if self.requests
+                else None,
+                "max": to_milliseconds(self.latency_max),
+                "histogram": self.histogram,
+            },
+            "bytes": {
+                "last": self.bytes_last,
+                "mean": round(self.bytes_total / self.requests)
+                if self.requests
+                else None,
+                "max": self.bytes_max,
+            },
+            "parse_ms": {
+                "last": to_milliseconds(self.parse_last),
+                "mean": to_milliseconds(self.parse_total / self.parses)
+                if self.parses
+                else None,
+                "max": to_milliseconds(self.parse_max),
+            },
+        }
+
+
+class Bay511ClientMetrics:
+    """Per-endpoint request metrics of one API client."""
+
+    def __init__(self) -> None:
+        """Initialize without any recorded requests."""
+        self.endpoints: dict[str, Bay511EndpointMetrics] = {}
+        self.rate_limit_headers: dict[str, str] = {}
+        self._listeners: list[Callable[[], None]] = []
+
+    def endpoint(self, name: str) -> Bay511EndpointMetrics:
+        """Return the metrics of an endpoint, creating them on first use."""
+        metrics = self.endpoints.get(name)
+        if metrics is None:
+            metrics = self.endpoints[name] = Bay511EndpointMetrics()
+        return metrics
+
+    def record_headers(self, headers: Mapping[str, str]) -> None:
+        """Keep the last rate-limit headers sent by 511."""
+        for name in _RATE_LIMIT_HEADERS:
+            if (value := headers.get(name)) is not None:
+                self.rate_limit_headers[name] = value
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return every endpoint's metrics and the last rate-limit headers."""
+        return {
+            "endpoints": {
+                name: metrics.as_dict() for name, metrics in self.endpoints.items()
+            },
+            "rate_limit_headers": dict(self.rate_limit_headers),
+        }
+
+    def async_add_listener(
+        self, update_callback: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Listen for newly recorded metrics."""
+        self._listeners.append(update_callback)
+
+        def _remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return _remove_listener
+
+    def notify(self) -> None:
+        """Tell listeners that metrics were recorded."""
+        for update_callback in list(self._listeners):
+            update_callback()
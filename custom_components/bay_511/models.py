@@ -0,0 +1,423 @@
+"""Arrival, stop snapshot, vehicle and alert models for Bay Area 511 Transit."""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field, replace
+from datetime import UTC, datetime
+from itertools import islice
+from typing import TYPE_CHECKING, Any
+
+from .const import DEPARTED_GRACE, LOGGER
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+def intern_string(value: str | None) -> str | None:
+    """Return a shared copy of a string that repeats across arrivals."""
+    return sys.intern(value) if value else value
+
+
+def parse_arrival_time(arrival_time: str | None) -> datetime | None:
+    """Parse an ISO 8601 arrival time."""
+    if not arrival_time:
+        return None
+    try:
+        parsed = datetime.fromisoformat(arrival_time)
+    except (TypeError, ValueError) as e:
+        LOGGER.debug("Could not calculate minutes away: %s", e)
+        return None
+    # Times without an offset are local; make them comparable with UTC
+    return parsed if parsed.tzinfo is not None else parsed.astimezone()
+
+
+def minutes_until(expected: datetime | None, now: datetime | None = None) -> int | None:
+    """Return the whole minutes from now until an arrival, never negative."""
+    if expected is None:
+        return None
+    seconds = (expected - (now or datetime.now(UTC))).total_seconds()
+    # Don't show negative times
+    return max(0, int(seconds / 60))
+
+
+# Not frozen, as that makes creating thousands of them noticeably slower;
+# treat instances as immutable and use `dataclasses.replace` instead
+@dataclass(slots=True)
+class Arrival:
+    """A predicted arrival of a vehicle at a stop."""
+
+    line_ref: str | None
+    direction: str | None
+    destination: str | None
+    aimed_arrival_time: str | None
+    expected_arrival_time: str | None
+    vehicle_at_stop: bool
+    # Parsed once so minutes can be recomputed between polls
+    expected_at: datetime | None
+    minutes_away: int | None
+
+    @classmethod
+    def from_visit(cls, visit: dict[str, Any]) -> Arrival:
+        """Parse a single MonitoredStopVisit into an arrival."""
+        monitored_vehicle = visit.get("MonitoredVehicleJourney", {})
+        monitored_call = monitored_vehicle.get("MonitoredCall", {})
+        expected_arrival_time = monitored_call.get("ExpectedArrivalTime")
+        expected_at = parse_arrival_time(expected_arrival_time)
+        # Positional arguments, as keywords double the cost of creating one
+        return cls(
+            intern_string(monitored_vehicle.get("LineRef")),
+            intern_string(monitored_vehicle.get("DirectionRef")),
+            intern_string(monitored_vehicle.get("DestinationName")),
+            monitored_call.get("AimedArrivalTime"),
+            expected_arrival_time,
+            # 511 sends "true" or an empty value
+            monitored_call.get("VehicleAtStop") in (True, "true"),
+            expected_at,
+            minutes_until(expected_at),
+        )
+
+
+@dataclass(slots=True)
+class StopSnapshot:
+    """The arrivals predicted at a stop by the latest update."""
+
+    stop_name: str | None
+    stop_code: str | None
+    arrivals: tuple[Arrival, ...] = ()
+    # When 511 reported these arrivals; countdowns keep it
+    fetched_at: datetime | None = None
+    # Arrivals grouped by (line ref, direction ref), built on first use
+    _lines: dict[tuple[str | None, str | None], tuple[Arrival, ...]] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @classmethod
+    def empty(cls, stop_code: str | None = None) -> StopSnapshot:
+        """Return a snapshot without any arrivals."""
+        return cls(stop_name=None, stop_code=stop_code)
+
+    def age(self, now: datetime | None = None) -> float | None:
+        """Return the seconds since the arrivals were fetched."""
+        if self.fetched_at is None:
+            return None
+        return ((now or datetime.now(UTC)) - self.fetched_at).total_seconds()
+
+    def arrival(self, index: int) -> Arrival | None:
+        """Return the arrival at a position, or None if there are fewer."""
+        if index < len(self.arrivals):
+            return self.arrivals[index]
+        return None
+
+    @property
+    def lines(self) -> dict[tuple[str | None, str | None], tuple[Arrival, ...]]:
+        """
+        Return the arrivals grouped by line and direction.
+
+        The index is built once per snapshot, so per-line sensors don't scan
+        every arrival, and only for stops that have such sensors.
+        """
+        if self._lines is None:
+            lines: dict[tuple[str | None, str | None], list[Arrival]] = {}
+            for arrival in self.arrivals:
+                key = (arrival.line_ref, arrival.direction)
+                if (grouped := lines.get(key)) is None:
+                    lines[key] = [arrival]
+                else:
+                    grouped.append(arrival)
+            self._lines = {key: tuple(grouped) for key, grouped in lines.items()}
+        return self._lines
+
+    def line_arrivals(
+        self, line_ref: str | None, direction: str | None
+    ) -> tuple[Arrival, ...]:
+        """Return the arrivals of one line in one direction."""
+        return self.lines.get((line_ref, direction), ())
+
+    def departures(
+        self,
+        limit: int,
+        lines: frozenset[str] = frozenset(),
+        directions: frozenset[str] = frozenset(),
+    ) -> tuple[Arrival, ...]:
+        """
+        Return the first `limit` arrivals, optionally of some lines only.
+
+        `lines` and `directions` hold upper-case line and direction refs; an
+        empty set matches every arrival.
+        """
+        if not lines and not directions:
+            return self.arrivals[:limit]
+        matching = (
+            arrival
+            for arrival in self.arrivals
+            if (not lines or (arrival.line_ref or "").upper() in lines)
+            and (not directions or (arrival.direction or "").upper() in directions)
+        )
+        return tuple(islice(matching, limit))
+
+    def counted_down(self, now: datetime | None = None) -> StopSnapshot:
+        """
+        Return the snapshot with minutes recomputed and departures dropped.
+
+        The snapshot itself is returned when nothing changed, so callers can
+        skip state writes with an identity check.
+        """
+        now = now or datetime.now(UTC)
+        arrivals: list[Arrival] = []
+        changed = False
+        for arrival in self.arrivals:
+            if arrival.expected_at is not None:
+                seconds = (arrival.expected_at - now).total_seconds()
+                if seconds < -DEPARTED_GRACE:
+                    changed = True
+                    continue
+            minutes = minutes_until(arrival.expected_at, now)
+            if minutes != arrival.minutes_away:
+                arrival = replace(arrival, minutes_away=minutes)  # noqa: PLW2901
+                changed = True
+            arrivals.append(arrival)
+
+        if not changed:
+            return self
+        return replace(self, arrivals=tuple(arrivals))
+
+
+@dataclass(slots=True)
+class Vehicle:
+    """The latest reported position of a vehicle."""
+
+    vehicle_ref: str
+    line_ref: str | None
+    direction: str | None
+    destination: str | None
+    latitude: float | None
+    longitude: float | None
+    bearing: float | None
+    occupancy: str | None
+    # The stop the vehicle heads to next, then its onward stops
+    stop_codes: tuple[str, ...]
+    expected_arrival_time: str | None
+    # Updated in place when the vehicle reports again from the same place
+    recorded_at: str | None
+    # POSIX time of `recorded_at`, used to evict vehicles that stop reporting
+    recorded_ts: float | None
+
+    @classmethod
+    def from_activity(cls, activity: dict[str, Any]) -> Vehicle:
+        """Parse a single VehicleActivity of a VehicleMonitoring response."""
+        journey = activity.get("MonitoredVehicleJourney") or {}
+        location = journey.get("VehicleLocation") or {}
+        monitored_call = journey.get("MonitoredCall") or {}
+        stop_codes = [monitored_call.get("StopPointRef")]
+        onward_calls = (journey.get("OnwardCalls") or {}).get("OnwardCall") or []
+        if not isinstance(onward_calls, list):
+            onward_calls = [onward_calls]
+        stop_codes.extend(call.get("StopPointRef") for call in onward_calls)
+        recorded_at = activity.get("RecordedAtTime")
+        recorded = parse_arrival_time(recorded_at)
+        return cls(
+            str(journey.get("VehicleRef")),
+            intern_string(normalize_ref(journey.get("LineRef"))),
+            intern_string(journey.get("DirectionRef")),
+            intern_string(journey.get("DestinationName")),
+            _coordinate(location.get("Latitude")),
+            _coordinate(location.get("Longitude")),
+            _coordinate(journey.get("Bearing")),
+            journey.get("Occupancy"),
+            tuple(dict.fromkeys(str(code) for code in stop_codes if code)),
+            monitored_call.get("ExpectedArrivalTime"),
+            recorded_at,
+            recorded.timestamp() if recorded is not None else None,
+        )
+
+    def moved_from(self, other: Vehicle) -> bool:
+        """Return whether the vehicle is somewhere else than `other` says."""
+        return (
+            self.latitude != other.latitude
+            or self.longitude != other.longitude
+            or self.stop_codes != other.stop_codes
+            or self.line_ref != other.line_ref
+            or self.direction != other.direction
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the vehicle for a sensor attribute."""
+        return {
+            "vehicle": self.vehicle_ref,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "bearing": self.bearing,
+            "occupancy": self.occupancy,
+            "next_stop": self.stop_codes[0] if self.stop_codes else None,
+            "expected_time": self.expected_arrival_time,
+            "recorded_at": self.recorded_at,
+        }
+
+
+@dataclass(slots=True)
+class ServiceAlert:
+    """
+    An alert of the servicealerts feed, and the stops and lines it affects.
+
+    Alerts naming a stop affect that stop, alerts naming only a line affect
+    every stop the line serves, and alerts naming neither affect the whole
+    agency.
+    """
+
+    alert_id: str
+    header: str | None
+    description: str | None
+    cause: str | None
+    effect: str | None
+    url: str | None
+    # (start, end) POSIX times, either of which may be open
+    active_periods: tuple[tuple[int | None, int | None], ...]
+    stop_codes: frozenset[str]
+    line_refs: frozenset[str]
+    agency_wide: bool
+
+    @classmethod
+    def from_entity(cls, entity: dict[str, Any]) -> ServiceAlert:
+        """Parse a FeedEntity of a servicealerts response."""
+        alert = _field(entity, "Alert", "alert") or {}
+        stop_codes = set()
+        line_refs = set()
+        agency_wide = False
+        for informed in _list(_field(alert, "InformedEntities", "informed_entity")):
+            stop_code = normalize_ref(_field(informed, "StopId", "stop_id"))
+            line_ref = normalize_ref(_field(informed, "RouteId", "route_id"))
+            if stop_code is not None:
+                stop_codes.add(stop_code)
+            elif line_ref is not None:
+                line_refs.add(line_ref)
+            else:
+                agency_wide = True
+        return cls(
+            str(_field(entity, "Id", "id")),
+            _translation(_field(alert, "HeaderText", "header_text")),
+            _translation(_field(alert, "DescriptionText", "description_text")),
+            _field(alert, "Cause", "cause"),
+            _field(alert, "Effect", "effect"),
+            _translation(_field(alert, "Url", "url")),
+            tuple(
+                (
+                    _timestamp(_field(period, "Start", "start")),
+                    _timestamp(_field(period, "End", "end")),
+                )
+                for period in _list(_field(alert, "ActivePeriods", "active_period"))
+            ),
+            frozenset(stop_codes),
+            frozenset(line_refs),
+            agency_wide,
+        )
+
+    def active(self, now: float) -> bool:
+        """Return whether the alert is in effect at a POSIX time."""
+        if not self.active_periods:
+            return True
+        return any(
+            (start is None or start <= now) and (end is None or now < end)
+            for start, end in self.active_periods
+        )
+
+    def affects(self, stop_code: str, line_refs: Iterable[str | None]) -> bool:
+        """Return whether the alert applies to a stop served by some lines."""
+        return (
+            self.agency_wide
+            or stop_code in self.stop_codes
+            or not self.line_refs.isdisjoint(line_refs)
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the alert for a sensor attribute."""
+        start, end = self.active_periods[0] if self.active_periods else (None, None)
+        return {
+            "id": self.alert_id,
+            "header": self.header,
+            "description": self.description,
+            "cause": self.cause,
+            "effect": self.effect,
+            "lines": sorted(self.line_refs),
+            "start": _isoformat(start),
+            "end": _isoformat(end),
+            "url": self.url,
+        }
+
+
+@dataclass(slots=True)
+class TransitStop:
+    """A stop of an agency's catalog."""
+
+    code: str
+    name: str | None
+    longitude: float | None
+    latitude: float | None
+
+    @classmethod
+    def from_stop_point(cls, stop_point: dict[str, Any]) -> TransitStop:
+        """Parse a ScheduledStopPoint of the stops catalog."""
+        location = stop_point.get("Location") or {}
+        return cls(
+            code=str(stop_point.get("id")),
+            name=stop_point.get("Name"),
+            longitude=_coordinate(location.get("Longitude")),
+            latitude=_coordinate(location.get("Latitude")),
+        )
+
+    @property
+    def label(self) -> str:
+        """Return the stop's name and code for display."""
+        return f"{self.name} ({self.code})" if self.name else self.code
+
+
+def _field(data: dict[str, Any], name: str, proto_name: str) -> Any:
+    """Return a field 511 may name as in its JSON or as in the proto file."""
+    value = data.get(name)
+    return value if value is not None else data.get(proto_name)
+
+
+def _list(value: Any) -> list[Any]:
+    """Return a repeated field, which may hold a single item or nothing."""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _translation(value: Any) -> str | None:
+    """Return the English text of a TranslatedString, or its first text."""
+    if value is None or isinstance(value, str):
+        return value
+    translations = _list(_field(value, "Translations", "translation"))
+    for translation in translations:
+        if _field(translation, "Language", "language") in (None, "", "en"):
+            return _field(translation, "Text", "text")
+    return _field(translations[0], "Text", "text") if translations else None
+
+
+def _timestamp(value: Any) -> int | None:
+    """Parse a POSIX time that may be missing or sent as a string."""
+    try:
+        return int(value) or None
+    except (TypeError, ValueError):
+        return None
+
+
+def _isoformat(timestamp: int | None) -> str | None:
+    """Format a POSIX time for an attribute."""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, UTC).isoformat()
+
+
+def normalize_ref(value: Any) -> str | None:
+    """Return a ref that 511 may send as a number as a string."""
+    return str(value) if value is not None and value != "" else None
+
+
+def _coordinate(value: Any) -> float | None:
+    """Parse a longitude, latitude or bearing sent as a string."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,74 @@
+"""Adaptive polling policy for Bay Area 511 Transit."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from .const import POLL_ARRIVAL_FRACTION, POLL_NEAR_ARRIVAL
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .models import StopSnapshot
+
+
+class Bay511PollingPolicy:
+    """
+    Pick the next poll interval from how soon the next vehicle arrives.
+
+    Polls run at the minimum interval while a vehicle is at the stop or about
+    to arrive, stretch proportionally as the next arrival gets further away,
+    and back off exponentially from the base interval while no service is
+    reported, never leaving the configured bounds. The policy counts the
+    polls it makes and how many it saved compared to polling at the base
+    interval throughout.
+    """
+
+    def __init__(
+        self,
+        base_interval: timedelta,
+        min_interval: timedelta,
+        max_interval: timedelta,
+    ) -> None:
+        """Initialize the policy."""
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.polls = 0
+        self.idle_polls = 0
+        self._saved = 0.0
+
+    @property
+    def polls_saved(self) -> int:
+        """Return the number of polls avoided compared to the base interval."""
+        return round(self._saved)
+
+    def next_interval(self, snapshots: Iterable[StopSnapshot]) -> timedelta:
+        """Return the interval until the next poll after one just completed."""
+        arrivals = [arrival for snapshot in snapshots for arrival in snapshot.arrivals]
+        minutes = [
+            arrival.minutes_away
+            for arrival in arrivals
+            if arrival.minutes_away is not None
+        ]
+
+        if not arrivals:
+            # Nothing running: back off exponentially for as long as that lasts
+            self.idle_polls += 1
+            interval = self.base_interval * 2 ** min(self.idle_polls, 16)
+        else:
+            self.idle_polls = 0
+            if any(arrival.vehicle_at_stop for arrival in arrivals):
+                interval = self.min_interval
+            elif not minutes:
+                interval = self.base_interval
+            elif min(minutes) <= POLL_NEAR_ARRIVAL:
+                interval = self.min_interval
+            else:
+                interval = timedelta(minutes=min(minutes) * POLL_ARRIVAL_FRACTION)
+
+        interval = max(self.min_interval, min(interval, self.max_interval))
+        self.polls += 1
+        self._saved += interval / self.base_interval - 1
+        return interval
@@ -0,0 +1,110 @@
+"""Opt-in profiling of the Bay Area 511 coordinator update cycles."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import cProfile
+import io
+import pstats
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, LOGGER, PROFILE_TOP_FUNCTIONS
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+
+class Bay511Profiler:
+    """
+    Run cProfile until the integration's pollers complete some update cycles.
+
+    Profiling starts right away and covers everything running on the event
+    loop, so the requests, JSON parsing and the state writes of the sensors
+    are all included. Pollers only hold a reference to the profiler while it
+    runs; otherwise their update cycles pay a single `None` check.
+    """
+
+    def __init__(self, hass: HomeAssistant, cycles: int, timeout: float) -> None:
+        """Initialize a profiler stopping after `cycles` cycles or `timeout` s."""
+        self.hass = hass
+        self.cycles = cycles
+        self.timeout = timeout
+        self.completed = 0
+        self._profile = cProfile.Profile()
+        self._finished = asyncio.Event()
+
+    @callback
+    def async_cycle_done(self) -> None:
+        """Count a finished update cycle of any profiled poller."""
+        self.completed += 1
+        if self.completed == self.cycles:
+            # Stop once the cycle's listeners have written their states
+            self.hass.loop.call_soon(self._finished.set)
+
+    async def async_run(self, pollers: list[DataUpdateCoordinator]) -> dict[str, Any]:
+        """Profile the next update cycles and write the results."""
+        try:
+            self._profile.enable()
+        except ValueError as exception:
+            # Python allows a single active profiler
+            msg = f"Cannot start profiling: {exception}"
+            raise HomeAssistantError(msg) from exception
+
+        started = dt_util.utcnow()
+        for poller in pollers:
+            poller.profiler = self
+        try:
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(self.timeout):
+                    await self._finished.wait()
+        finally:
+            self._profile.disable()
+            for poller in pollers:
+                poller.profiler = None
+
+        if self.completed < self.cycles:
+            LOGGER.warning(
+                "Only %s of %s update cycles finished within %s seconds",
+                self.completed,
+                self.cycles,
+                self.timeout,
+            )
+
+        base = Path(self.hass.config.path(f"{DOMAIN}_profile_{started:%Y%m%d_%H%M%S}"))
+        profile_path = base.with_suffix(".prof")
+        summary_path = base.with_suffix(".txt")
+        seconds = (dt_util.utcnow() - started).total_seconds()
+        await self.hass.async_add_executor_job(
+            self._write, profile_path, summary_path, seconds
+        )
+        LOGGER.info("Wrote profile to %s and summary to %s", profile_path, summary_path)
+        return {
+            "profile": str(profile_path),
+            "summary": str(summary_path),
+            "cycles": self.completed,
+            "seconds": round(seconds, 1),
+        }
+
+    def _write(self, profile_path: Path, summary_path: Path, seconds: float) -> None:
+        """Write the raw profile and a summary of the top functions."""
+        self._profile.dump_stats(profile_path)
+
+        stream = io.StringIO()
+        stream.write(
+            f"{self.completed} update cycles profiled over {seconds:.1f} seconds\n"
+        )
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE)
+        stream.write(f"\nTop {PROFILE_TOP_FUNCTIONS} functions of {DOMAIN}:\n")
+        stats.print_stats(DOMAIN, PROFILE_TOP_FUNCTIONS)
+        stream.write(f"\nTop {PROFILE_TOP_FUNCTIONS} functions overall:\n")
+        stats.sort_stats(pstats.SortKey.TIME)
+        stats.print_stats(PROFILE_TOP_FUNCTIONS)
+        summary_path.write_text(stream.getvalue())
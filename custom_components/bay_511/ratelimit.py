@@ -0,0 +1,341 @@
+"""Request budgets of the 511 API keys and the pool that spreads requests over them."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any
+
+from .const import (
+    API_KEY_COOLDOWN,
+    DEFAULT_RATE_LIMIT,
+    DOMAIN,
+    LOGGER,
+    RATE_LIMIT_RESERVE,
+    RATE_LIMIT_SAFETY,
+    RATE_LIMIT_WINDOW,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Container, Hashable, Mapping, Sequence
+
+    from homeassistant.core import HomeAssistant
+
+# Fractional part of the golden ratio, used to give each poller a phase offset
+# that stays evenly spread however many pollers end up registered.
+_PHASE_STEP = 0.6180339887498949
+
+_LIMIT_HEADERS = ("RateLimit-Limit", "X-RateLimit-Limit")
+_REMAINING_HEADERS = ("RateLimit-Remaining", "X-RateLimit-Remaining")
+_AUTH_STATUSES = (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN)
+
+
+def _header_int(headers: Mapping[str, str], names: tuple[str, ...]) -> int | None:
+    """Return the first of the given headers that holds an integer."""
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return int(value)
+        except ValueError:
+            LOGGER.debug("Ignoring malformed %s header: %s", name, value)
+    return None
+
+
+class Bay511RequestBudget:
+    """
+    Token bucket for the hourly request quota of one 511 API key.
+
+    Tokens refill continuously at ``limit / window`` per second. Rate-limit
+    response headers override the local estimate when 511 sends them.
+    """
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_RATE_LIMIT,
+        window: float = RATE_LIMIT_WINDOW,
+    ) -> None:
+        """Initialize the budget with a full bucket."""
+        self.limit = limit
+        self.window = window
+        self._tokens = float(limit)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._pollers: set[Hashable] = set()
+
+    @property
+    def remaining(self) -> int:
+        """Return the number of requests currently available."""
+        self._refill()
+        if time.monotonic() < self._blocked_until:
+            return 0
+        return int(self._tokens)
+
+    @property
+    def poller_count(self) -> int:
+        """Return the number of pollers, of any config entry, using the key."""
+        return len(self._pollers)
+
+    @property
+    def poller_rate(self) -> float:
+        """Return the requests per second each poller of the key may make."""
+        return self.limit * RATE_LIMIT_SAFETY / self.window / max(self.poller_count, 1)
+
+    def register(self, poller: Hashable) -> Callable[[], None]:
+        """Register a poller using the key and return a callback to remove it."""
+        self._pollers.add(poller)
+        return lambda: self._pollers.discard(poller)
+
+    def try_acquire(self) -> bool:
+        """Take one request from the budget, returning False when exhausted."""
+        self._refill()
+        if time.monotonic() < self._blocked_until or self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Adopt the quota reported by 511 in the response headers."""
+        limit = _header_int(headers, _LIMIT_HEADERS)
+        remaining = _header_int(headers, _REMAINING_HEADERS)
+        if limit is None and remaining is None:
+            return
+
+        self._refill()
+        if limit is not None and limit > 0:
+            self.limit = limit
+        if remaining is not None:
+            self._tokens = float(max(0, min(remaining, self.limit)))
+
+    def block(self, retry_after: float | None = None) -> float:
+        """Stop handing out tokens after a 429 and return for how long."""
+        delay = retry_after if retry_after is not None else self.window / self.limit
+        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        self._tokens = 0.0
+        return delay
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update."""
+        now = time.monotonic()
+        earned = (now - self._updated) * self.limit / self.window
+        self._tokens = min(float(self.limit), self._tokens + earned)
+        self._updated = now
+
+
+@dataclass(slots=True)
+class Bay511ApiKeyUsage:
+    """Requests sent with one API key and the rejections they met."""
+
+    requests: int = 0
+    rejected: int = 0
+    last_status: int | None = None
+    cooldown_until: float = 0.0
+
+    def cooling_down(self, now: float) -> bool:
+        """Return whether the key is out of rotation."""
+        return now < self.cooldown_until
+
+
+class Bay511ApiKeyPool:
+    """
+    The API keys of a config entry and their combined request budget.
+
+    Every request goes out with the key that has the most requests left.
+    A key that 511 rejects with 401, 403 or 429 is taken out of rotation
+    until its cooldown ends. Polling coordinators register with the pool,
+    which registers them with each of its keys, and ask it for their next
+    interval. Each key splits its quota evenly between the pollers of every
+    config entry using it, and a poller gets the sum of its keys' shares,
+    so the polling rate on each key stays inside its quota however the
+    keys are combined, and slows down gradually as more stops are added.
+    """
+
+    def __init__(self, budgets: Mapping[str, Bay511RequestBudget]) -> None:
+        """Initialize the pool with each key's budget."""
+        self.budgets = dict(budgets)
+        self.usage = {api_key: Bay511ApiKeyUsage() for api_key in self.budgets}
+        self.window = RATE_LIMIT_WINDOW
+        self._pollers: dict[Hashable, tuple[int, list[Callable[[], None]]]] = {}
+        self._phased: set[Hashable] = set()
+        self._next_slot = 0
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def limit(self) -> int:
+        """Return the combined quota of the keys in rotation."""
+        budgets = self._in_rotation() or self.budgets.values()
+        return sum(budget.limit for budget in budgets)
+
+    @property
+    def remaining(self) -> int:
+        """Return the number of requests currently available."""
+        return sum(budget.remaining for budget in self._in_rotation())
+
+    @property
+    def poller_count(self) -> int:
+        """Return the number of registered polling coordinators."""
+        return len(self._pollers)
+
+    @property
+    def unauthorized(self) -> bool:
+        """Return whether 511 rejected every key as invalid."""
+        now = time.monotonic()
+        return all(
+            usage.cooling_down(now) and usage.last_status in _AUTH_STATUSES
+            for usage in self.usage.values()
+        )
+
+    def acquire(self, exclude: Container[str] = ()) -> str | None:
+        """Take a request from the key with the most left, if any has one."""
+        now = time.monotonic()
+        best = None
+        best_remaining = 0
+        for api_key, budget in self.budgets.items():
+            if api_key in exclude or self.usage[api_key].cooling_down(now):
+                continue
+            remaining = budget.remaining
+            if remaining > best_remaining:
+                best, best_remaining = api_key, remaining
+        if best is None or not self.budgets[best].try_acquire():
+            return None
+        self.usage[best].requests += 1
+        self._notify()
+        return best
+
+    def update_from_headers(self, api_key: str, headers: Mapping[str, str]) -> None:
+        """Adopt the quota of a key reported by 511 in the response headers."""
+        self.budgets[api_key].update_from_headers(headers)
+        self._notify()
+
+    def reject(
+        self, api_key: str, status: int, retry_after: float | None = None
+    ) -> None:
+        """Take a key out of rotation after 511 rejected a request sent with it."""
+        if status == HTTPStatus.TOO_MANY_REQUESTS:
+            cooldown = self.budgets[api_key].block(retry_after)
+        else:
+            cooldown = API_KEY_COOLDOWN
+        usage = self.usage[api_key]
+        usage.rejected += 1
+        usage.last_status = status
+        usage.cooldown_until = max(usage.cooldown_until, time.monotonic() + cooldown)
+        LOGGER.warning(
+            "511 rejected API key %s with status %s, pausing it for %.0f s",
+            _label(api_key),
+            status,
+            cooldown,
+        )
+        self._notify()
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        """Return the usage of every key, labeled by its last characters."""
+        now = time.monotonic()
+        return {
+            _label(api_key): {
+                "requests": usage.requests,
+                "rejected": usage.rejected,
+                "last_status": usage.last_status,
+                "limit": self.budgets[api_key].limit,
+                "remaining": self.budgets[api_key].remaining,
+                "cooldown": round(max(0.0, usage.cooldown_until - now)),
+            }
+            for api_key, usage in self.usage.items()
+        }
+
+    def register(self, poller: Hashable) -> Callable[[], None]:
+        """Register a polling coordinator and return a callback to remove it."""
+        self._pollers[poller] = (
+            self._next_slot,
+            [budget.register(poller) for budget in self.budgets.values()],
+        )
+        self._next_slot += 1
+
+        def _unregister() -> None:
+            if (registered := self._pollers.pop(poller, None)) is not None:
+                for unregister in registered[1]:
+                    unregister()
+            self._phased.discard(poller)
+
+        return _unregister
+
+    def next_interval(self, poller: Hashable, base_interval: timedelta) -> timedelta:
+        """
+        Return how long a poller should wait before its next request.
+
+        The poller's share of each key in rotation is added up and the
+        interval stretches further while the budget is running low. The
+        first interval handed to each poller is shifted by a per-poller
+        phase so their requests spread over time instead of firing together.
+        """
+        budgets = self._in_rotation() or list(self.budgets.values())
+        rate = sum(budget.poller_rate for budget in budgets)
+        seconds = max(base_interval.total_seconds(), 1 / rate)
+
+        reserve = self.limit * RATE_LIMIT_RESERVE
+        remaining = self.remaining
+        if remaining < reserve:
+            seconds *= reserve / max(remaining, 1)
+
+        if poller in self._pollers and poller not in self._phased:
+            self._phased.add(poller)
+            seconds += (self._pollers[poller][0] * _PHASE_STEP % 1) * seconds
+
+        return timedelta(seconds=min(seconds, self.window))
+
+    def async_add_listener(
+        self, update_callback: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Listen for changes of the remaining budget."""
+        self._listeners.append(update_callback)
+
+        def _remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return _remove_listener
+
+    def _in_rotation(self) -> list[Bay511RequestBudget]:
+        """Return the budgets of the keys not cooling down."""
+        now = time.monotonic()
+        return [
+            budget
+            for api_key, budget in self.budgets.items()
+            if not self.usage[api_key].cooling_down(now)
+        ]
+
+    def _notify(self) -> None:
+        """Tell listeners that the budget changed."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+
+def _label(api_key: str) -> str:
+    """Return the last characters of a key, to tell keys apart in reports."""
+    return f"...{api_key[-4:]}"
+
+
+def async_get_request_budget(hass: HomeAssistant, api_key: str) -> Bay511RequestBudget:
+    """Return the budget shared by all config entries using an API key."""
+    budgets: dict[str, Bay511RequestBudget] = hass.data.setdefault(
+        DOMAIN, {}
+    ).setdefault("budgets", {})
+    if api_key not in budgets:
+        budgets[api_key] = Bay511RequestBudget()
+    return budgets[api_key]
+
+
+def async_get_api_key_pool(
+    hass: HomeAssistant, api_keys: Sequence[str]
+) -> Bay511ApiKeyPool:
+    """Return the pool shared by all config entries using the same keys."""
+    pools: dict[frozenset[str], Bay511ApiKeyPool] = hass.data.setdefault(
+        DOMAIN, {}
+    ).setdefault("key_pools", {})
+    pool_key = frozenset(api_keys)
+    if pool_key not in pools:
+        pools[pool_key] = Bay511ApiKeyPool(
+            {api_key: async_get_request_budget(hass, api_key) for api_key in api_keys}
+        )
+    return pools[pool_key]
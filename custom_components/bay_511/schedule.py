@@ -0,0 +1,480 @@
+"""Scheduled departures from 511 GTFS feeds, indexed on disk in SQLite."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import csv
+import io
+import sqlite3
+import threading
+import time as time_module
+import zipfile
+from datetime import UTC, date, datetime, time, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util import dt as dt_util
+
+from .api import Bay511ApiClientError
+from .const import (
+    DOMAIN,
+    GTFS_TTL,
+    LOGGER,
+    SCHEDULE_BATCH_SIZE,
+    SCHEDULE_DEPARTURES,
+    SCHEDULE_HORIZON,
+)
+from .models import Arrival, StopSnapshot, intern_string, minutes_until
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from homeassistant.core import HomeAssistant
+
+    from .api import Bay511ApiClient
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE stops (code TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE stop_ids (id TEXT PRIMARY KEY, code TEXT);
+CREATE TABLE trips (
+    id INTEGER PRIMARY KEY, service TEXT, line TEXT, direction TEXT, headsign TEXT
+);
+CREATE TABLE calendar (
+    service TEXT, weekdays TEXT, start_date INTEGER, end_date INTEGER
+);
+CREATE TABLE calendar_dates (service TEXT, date INTEGER, exception INTEGER);
+CREATE TABLE stop_times (stop TEXT, departure INTEGER, trip INTEGER);
+"""
+
+# Layout of the tables above, recorded in the index's meta table
+_SCHEMA_VERSION = "1"
+
+# Built after the rows are in, which is several times faster than keeping
+# them up to date while inserting
+_INDEXES = """
+CREATE INDEX stop_times_stop ON stop_times (stop, departure);
+CREATE INDEX calendar_dates_date ON calendar_dates (date);
+"""
+
+# Filled in with a placeholder per running service
+_DEPARTURES_QUERY = """
+SELECT departure, line, direction, headsign
+FROM stop_times JOIN trips ON trips.id = stop_times.trip
+WHERE stop = ? AND departure >= ? AND departure < ? AND service IN ({})
+ORDER BY departure LIMIT ?
+"""
+
+_WEEKDAYS = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+
+
+def _rows(feed: zipfile.ZipFile, name: str) -> Iterator[dict[str, str]]:
+    """Stream the rows of a feed file, or nothing if the feed lacks it."""
+    try:
+        member = feed.open(name)
+    except KeyError:
+        return
+    with io.TextIOWrapper(member, encoding="utf-8-sig", newline="") as text:
+        yield from csv.DictReader(text)
+
+
+def _seconds(value: str) -> int | None:
+    """Parse a GTFS time, which can run past 24:00:00, into seconds."""
+    try:
+        hours, minutes, seconds = value.split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    except ValueError:
+        return None
+
+
+def _stop_times(
+    feed: zipfile.ZipFile, stop_codes: dict[str, str], trip_ids: dict[str, int]
+) -> Iterator[tuple[str, int, int]]:
+    """Stream (stop code, departure, trip) rows out of stop_times.txt."""
+    with (
+        feed.open("stop_times.txt") as member,
+        io.TextIOWrapper(member, encoding="utf-8-sig", newline="") as text,
+    ):
+        # Plain rows and column positions, as this file has millions of rows
+        reader = csv.reader(text)
+        header = [column.strip() for column in next(reader)]
+        trip_column = header.index("trip_id")
+        stop_column = header.index("stop_id")
+        departure_column = header.index("departure_time")
+        arrival_column = header.index("arrival_time")
+        for row in reader:
+            # Stops between timepoints may have no time at all
+            value = row[departure_column] or row[arrival_column]
+            if not value:
+                continue
+            departure = _seconds(value)
+            trip = trip_ids.get(row[trip_column])
+            if departure is None or trip is None:
+                continue
+            stop = row[stop_column]
+            yield stop_codes.get(stop, stop), departure, trip
+
+
+def build_schedule_index(feed_path: Path, database: Path) -> int:
+    """
+    Index a GTFS feed by stop and departure time and return its stop times.
+
+    Files are read from the zip one row at a time, so memory only grows with
+    the feed's stops and trips, not with its millions of stop times. The
+    index is written next to `database` and replaces it when complete.
+    """
+    building = database.with_suffix(".building")
+    building.parent.mkdir(parents=True, exist_ok=True)
+    building.unlink(missing_ok=True)
+    connection = sqlite3.connect(building)
+    try:
+        # Nothing to protect until the file replaces the current index
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(_SCHEMA)
+
+        with zipfile.ZipFile(feed_path) as feed:
+            timezone = next(
+                (row.get("agency_timezone") for row in _rows(feed, "agency.txt")),
+                None,
+            )
+            connection.execute(
+                "INSERT INTO meta VALUES ('timezone', ?), ('built', ?), ('version', ?)",
+                (timezone, str(time_module.time()), _SCHEMA_VERSION),
+            )
+
+            # 511 monitors stops by their stop_code where a feed has one
+            stop_codes: dict[str, str] = {}
+            stops: dict[str, str | None] = {}
+            for row in _rows(feed, "stops.txt"):
+                code = row.get("stop_code") or row["stop_id"]
+                stop_codes[row["stop_id"]] = code
+                stops.setdefault(code, row.get("stop_name"))
+            connection.executemany("INSERT INTO stops VALUES (?, ?)", stops.items())
+            # GTFS-Realtime feeds refer to stops by stop_id
+            connection.executemany(
+                "INSERT INTO stop_ids VALUES (?, ?)",
+                (item for item in stop_codes.items() if item[0] != item[1]),
+            )
+
+            # Direction refs like IB and OB come from 511's directions.txt
+            directions = {
+                (row["route_id"], row["direction_id"]): row.get("direction")
+                for row in _rows(feed, "directions.txt")
+            }
+            trip_ids: dict[str, int] = {}
+            trips = []
+            for row in _rows(feed, "trips.txt"):
+                trip = trip_ids[row["trip_id"]] = len(trip_ids)
+                direction_id = row.get("direction_id", "")
+                trips.append(
+                    (
+                        trip,
+                        row["service_id"],
+                        row["route_id"],
+                        directions.get((row["route_id"], direction_id)),
+                        row.get("trip_headsign"),
+                    )
+                )
+            connection.executemany("INSERT INTO trips VALUES (?, ?, ?, ?, ?)", trips)
+            del trips
+
+            connection.executemany(
+                "INSERT INTO calendar VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        row["service_id"],
+                        "".join(row.get(day, "0").strip() for day in _WEEKDAYS),
+                        int(row["start_date"]),
+                        int(row["end_date"]),
+                    )
+                    for row in _rows(feed, "calendar.txt")
+                ),
+            )
+            connection.executemany(
+                "INSERT INTO calendar_dates VALUES (?, ?, ?)",
+                (
+                    (row["service_id"], int(row["date"]), int(row["exception_type"]))
+                    for row in _rows(feed, "calendar_dates.txt")
+                ),
+            )
+
+            count = 0
+            rows = _stop_times(feed, stop_codes, trip_ids)
+            while batch := list(islice(rows, SCHEDULE_BATCH_SIZE)):
+                connection.executemany("INSERT INTO stop_times VALUES (?, ?, ?)", batch)
+                count += len(batch)
+
+        connection.executescript(_INDEXES)
+        connection.commit()
+    except BaseException:
+        connection.close()
+        building.unlink(missing_ok=True)
+        raise
+    connection.close()
+    building.replace(database)
+    return count
+
+
+class Bay511Schedule:
+    """
+    Scheduled departures of an agency, for when StopMonitoring fails.
+
+    The agency's GTFS feed is downloaded from 511, or read from
+    `<config>/bay_511/gtfs/<agency>.zip` when that file exists, and indexed
+    in an SQLite database by stop and departure time. A lookup reads the few
+    rows of one stop from disk, so the feed is never loaded into memory.
+    The index also gives the stop codes of the feed's stop_ids, by which
+    GTFS-Realtime feeds refer to stops.
+    """
+
+    def __init__(self, hass: HomeAssistant, agency: str) -> None:
+        """Initialize the schedule of an agency."""
+        self.hass = hass
+        self.agency = agency
+        self.path = Path(hass.config.path(STORAGE_DIR, f"{DOMAIN}.gtfs_{agency}.db"))
+        self.local_feed = Path(hass.config.path(DOMAIN, "gtfs", f"{agency}.zip"))
+        self.available = False
+        self._lock = asyncio.Lock()
+        self._timezone: ZoneInfo | None = None
+        self._stop_id_codes: dict[str, str] | None = None
+        # Services running on each service day, looked up once per day
+        self._services: dict[date, list[str]] = {}
+        # Departures of several stops are looked up at once in executor threads
+        self._lookup_lock = threading.Lock()
+
+    async def async_update(self, client: Bay511ApiClient) -> None:
+        """Index the feed if there is no index yet or a newer feed."""
+        async with self._lock:
+            try:
+                await self._async_update(client)
+            except Bay511ApiClientError as exception:
+                LOGGER.warning(
+                    "Could not download the GTFS feed of %s: %s", self.agency, exception
+                )
+            except (OSError, KeyError, ValueError, sqlite3.Error, zipfile.BadZipFile):
+                LOGGER.exception("Could not index the GTFS feed of %s", self.agency)
+            self.available = await self.hass.async_add_executor_job(self.path.exists)
+
+    async def _async_update(self, client: Bay511ApiClient) -> None:
+        """Download the feed when needed and index it."""
+        built, local = await self.hass.async_add_executor_job(self._mtimes)
+        if built is not None and not await self.hass.async_add_executor_job(
+            self._current_schema
+        ):
+            built = None
+        if local is not None:
+            # A local feed replaces downloads, to test without the network
+            if built is not None and built >= local:
+                return
+            await self._async_index(self.local_feed)
+            return
+        if built is not None and time_module.time() - built < GTFS_TTL:
+            return
+
+        download = self.path.with_suffix(".zip")
+        try:
+            size = await client.async_download_gtfs_feed(self.agency, download)
+            LOGGER.debug("Downloaded %s bytes of %s GTFS", size, self.agency)
+            await self._async_index(download)
+        finally:
+            await self.hass.async_add_executor_job(download.unlink, True)  # noqa: FBT003
+
+    async def _async_index(self, feed: Path) -> None:
+        """Index a feed in the executor."""
+        start = time_module.perf_counter()
+        count = await self.hass.async_add_executor_job(
+            build_schedule_index, feed, self.path
+        )
+        self._timezone = None
+        self._stop_id_codes = None
+        self._services = {}
+        LOGGER.info(
+            "Indexed %s stop times of %s in %.1f s",
+            count,
+            self.agency,
+            time_module.perf_counter() - start,
+        )
+
+    def _mtimes(self) -> tuple[float | None, float | None]:
+        """Return when the index was built and the local feed changed."""
+        mtimes = []
+        for path in (self.path, self.local_feed):
+            try:
+                mtimes.append(path.stat().st_mtime)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return mtimes[0], mtimes[1]
+
+    def _current_schema(self) -> bool:
+        """Return whether the index was built with the current schema."""
+        connection = sqlite3.connect(f"{self.path.as_uri()}?mode=ro", uri=True)
+        with contextlib.closing(connection):
+            try:
+                row = connection.execute(
+                    "SELECT value FROM meta WHERE key = 'version'"
+                ).fetchone()
+            except sqlite3.Error:
+                return False
+        return row is not None and row[0] == _SCHEMA_VERSION
+
+    async def async_stop_id_codes(self) -> dict[str, str]:
+        """Return the stop codes of the feed's stop_ids that differ from them."""
+        if self._stop_id_codes is None:
+            if not self.available:
+                return {}
+            try:
+                self._stop_id_codes = await self.hass.async_add_executor_job(
+                    self._read_stop_id_codes
+                )
+            except sqlite3.Error as exception:
+                LOGGER.debug(
+                    "Could not read the %s schedule: %s", self.agency, exception
+                )
+                return {}
+        return self._stop_id_codes
+
+    def _read_stop_id_codes(self) -> dict[str, str]:
+        """Read the stop codes by stop_id from the index."""
+        connection = sqlite3.connect(f"{self.path.as_uri()}?mode=ro", uri=True)
+        with contextlib.closing(connection):
+            return dict(connection.execute("SELECT id, code FROM stop_ids"))
+
+    async def async_departures(self, stop_code: str) -> StopSnapshot | None:
+        """Return the next scheduled departures at a stop, if indexed."""
+        if not self.available:
+            return None
+        try:
+            return await self.hass.async_add_executor_job(
+                self._departures, stop_code, datetime.now(UTC)
+            )
+        except sqlite3.Error as exception:
+            LOGGER.debug("Could not read the %s schedule: %s", self.agency, exception)
+            return None
+
+    def _departures(self, stop_code: str, now: datetime) -> StopSnapshot | None:
+        """Look up the departures of a stop in the index."""
+        connection = sqlite3.connect(f"{self.path.as_uri()}?mode=ro", uri=True)
+        with contextlib.closing(connection):
+            stop = connection.execute(
+                "SELECT name FROM stops WHERE code = ?", (stop_code,)
+            ).fetchone()
+            if stop is None:
+                return None
+
+            timezone = self._feed_timezone(connection)
+            local_now = now.astimezone(timezone)
+            departures: list[tuple[datetime, Any, Any, Any]] = []
+            # Trips after midnight belong to the previous day's service
+            for day in (local_now.date() - timedelta(days=1), local_now.date()):
+                services = self._active_services(connection, day)
+                if not services:
+                    continue
+                # GTFS times count from noon minus 12 hours, which is midnight
+                # except on days when the clocks change
+                base = datetime.combine(day, time(12), timezone) - timedelta(hours=12)
+                start = int((now - base).total_seconds())
+                placeholders = ",".join("?" * len(services))
+                rows = connection.execute(
+                    _DEPARTURES_QUERY.format(placeholders),
+                    (
+                        stop_code,
+                        start,
+                        start + SCHEDULE_HORIZON,
+                        *services,
+                        SCHEDULE_DEPARTURES,
+                    ),
+                )
+                departures.extend(
+                    (base + timedelta(seconds=departure), line, direction, headsign)
+                    for departure, line, direction, headsign in rows
+                )
+
+        departures.sort(key=lambda departure: departure[0])
+        arrivals = []
+        for departure_at, line, direction, headsign in departures[:SCHEDULE_DEPARTURES]:
+            scheduled = departure_at.isoformat()
+            arrivals.append(
+                Arrival(
+                    intern_string(line),
+                    intern_string(direction),
+                    intern_string(headsign),
+                    scheduled,
+                    # Counted down like a prediction until 511 is back
+                    scheduled,
+                    False,  # noqa: FBT003
+                    departure_at,
+                    minutes_until(departure_at, now),
+                )
+            )
+        return StopSnapshot(intern_string(stop[0]), stop_code, tuple(arrivals), now)
+
+    def _feed_timezone(self, connection: sqlite3.Connection) -> ZoneInfo:
+        """Return the timezone of the feed's times."""
+        with self._lookup_lock:
+            if (timezone := self._timezone) is None:
+                row = connection.execute(
+                    "SELECT value FROM meta WHERE key = 'timezone'"
+                ).fetchone()
+                try:
+                    timezone = ZoneInfo(row[0])
+                except (TypeError, ValueError, ZoneInfoNotFoundError):
+                    timezone = dt_util.get_default_time_zone()
+                self._timezone = timezone
+            return timezone
+
+    def _active_services(self, connection: sqlite3.Connection, day: date) -> list[str]:
+        """Return the services running on a day."""
+        with self._lookup_lock:
+            # Indexing a new feed replaces the dict, not the one being filled
+            cache = self._services
+            if (services := cache.get(day)) is None:
+                cache[day] = services = self._read_services(connection, day)
+                # Only the previous and current service days are looked up
+                stale = [cached for cached in cache if cached < day - timedelta(days=1)]
+                for cached in stale:
+                    del cache[cached]
+            return services
+
+    @staticmethod
+    def _read_services(connection: sqlite3.Connection, day: date) -> list[str]:
+        """Read the services running on a day from the index."""
+        number = int(day.strftime("%Y%m%d"))
+        running = {
+            service
+            for service, weekdays in connection.execute(
+                "SELECT service, weekdays FROM calendar"
+                " WHERE start_date <= ? AND end_date >= ?",
+                (number, number),
+            )
+            if weekdays[day.weekday()] == "1"
+        }
+        for service, exception in connection.execute(
+            "SELECT service, exception FROM calendar_dates WHERE date = ?", (number,)
+        ):
+            # 1 adds the service on that day, 2 removes it
+            if exception == 1:
+                running.add(service)
+            else:
+                running.discard(service)
+        return sorted(running)
+
+
+def async_get_schedule(hass: HomeAssistant, agency: str) -> Bay511Schedule:
+    """Return the schedule of an agency shared by all config entries."""
+    schedules = hass.data.setdefault(DOMAIN, {}).setdefault("schedules", {})
+    if agency not in schedules:
+        schedules[agency] = Bay511Schedule(hass, agency)
+    return schedules[agency]
@@ -2,19 +2,112 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.core import callback
+from homeassistant.helpers.debounce import Debouncer
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import slugify
 
-from .const import ATTRIBUTION, CONF_AGENCY, CONF_STOP_CODE, CONF_STOPS, DOMAIN
+from .const import (
+    ATTRIBUTION,
+    BUDGET_SENSOR_COOLDOWN,
+    CONF_AGENCY,
+    CONF_BOARD_DIRECTIONS,
+    CONF_BOARD_LINES,
+    CONF_BOARD_SIZE,
+    CONF_LINE_SENSOR_DIRECTIONS,
+    CONF_LINE_SENSOR_LINES,
+    CONF_LINE_SENSORS,
+    CONF_SERVICE_ALERTS,
+    CONF_STOP_CODE,
+    CONF_STOPS,
+    DEFAULT_BOARD_SIZE,
+    DEFAULT_LINE_SENSORS,
+    DEFAULT_SERVICE_ALERTS,
+    DOMAIN,
+    LINE_SENSOR_ARRIVALS,
+    LINE_SENSOR_VEHICLES,
+    LOGGER,
+)
+from .metrics import to_milliseconds
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
     from homeassistant.core import HomeAssistant
     from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
+    from .api import Bay511ApiClient
     from .coordinator import Bay511DataUpdateCoordinator
-    from .data import Bay511ConfigEntry
+    from .data import Bay511ConfigEntry, Bay511Data, Bay511StateWriteStats
+    from .metrics import Bay511EndpointMetrics
+    from .models import Arrival, ServiceAlert, Vehicle
+
+
+@dataclass(frozen=True, kw_only=True)
+class Bay511RequestMetricsSensorDescription(SensorEntityDescription):
+    """Describes a sensor showing request metrics of an endpoint."""
+
+    value_fn: Callable[[Bay511EndpointMetrics], float | int | None]
+    attributes_fn: Callable[[Bay511EndpointMetrics], dict[str, Any]]
+
+
+REQUEST_METRICS_SENSORS = (
+    Bay511RequestMetricsSensorDescription(
+        key="latency",
+        name="API latency",
+        icon="mdi:timer-outline",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: to_milliseconds(metrics.latency_last),
+        attributes_fn=lambda metrics: {
+            "mean": to_milliseconds(metrics.latency_total / metrics.requests)
+            if metrics.requests
+            else None,
+            "max": to_milliseconds(metrics.latency_max),
+            "histogram": metrics.histogram,
+        },
+    ),
+    Bay511RequestMetricsSensorDescription(
+        key="response_size",
+        name="API response size",
+        icon="mdi:download-network",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: metrics.bytes_last,
+        attributes_fn=lambda metrics: {"max": metrics.bytes_max},
+    ),
+    Bay511RequestMetricsSensorDescription(
+        key="parse_time",
+        name="API parse time",
+        icon="mdi:code-json",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: to_milliseconds(metrics.parse_last),
+        attributes_fn=lambda metrics: {"max": to_milliseconds(metrics.parse_max)},
+    ),
+    Bay511RequestMetricsSensorDescription(
+        key="errors",
+        name="API errors",
+        icon="mdi:alert-circle-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="errors",
+        value_fn=lambda metrics: sum(metrics.errors.values()),
+        attributes_fn=lambda metrics: {"by_type": dict(metrics.errors)},
+    ),
+)
 
 
 async def async_setup_entry(
@@ -24,6 +117,11 @@ async def async_setup_entry(
 ) -> None:
     """Set up the sensor platform."""
     entities = []
+    board_size = int(entry.options.get(CONF_BOARD_SIZE, DEFAULT_BOARD_SIZE))
+    board_lines = entry.options.get(CONF_BOARD_LINES, [])
+    board_directions = entry.options.get(CONF_BOARD_DIRECTIONS, [])
+    line_sensors = entry.options.get(CONF_LINE_SENSORS, DEFAULT_LINE_SENSORS)
+    service_alerts = entry.options.get(CONF_SERVICE_ALERTS, DEFAULT_SERVICE_ALERTS)
 
     for stop in entry.data[CONF_STOPS]:
         stop_key = f"{stop[CONF_AGENCY]}_{stop[CONF_STOP_CODE]}"
@@ -37,6 +135,7 @@ async def async_setup_entry(
                 stop_code=stop[CONF_STOP_CODE],
                 arrival_index=0,  # First/next arrival
                 description="next",
+                write_stats=entry.runtime_data.write_stats,
             )
         )
 
@@ -48,14 +147,138 @@ async def async_setup_entry(
                 stop_code=stop[CONF_STOP_CODE],
                 arrival_index=1,  # Second arrival
                 description="subsequent",
+                write_stats=entry.runtime_data.write_stats,
+            )
+        )
+
+        if board_size:
+            entities.append(
+                Bay511DepartureBoardSensor(
+                    coordinator=coordinator,
+                    agency=stop[CONF_AGENCY],
+                    stop_code=stop[CONF_STOP_CODE],
+                    write_stats=entry.runtime_data.write_stats,
+                    size=board_size,
+                    lines=board_lines,
+                    directions=board_directions,
+                )
+            )
+
+        if service_alerts:
+            entities.append(
+                Bay511ServiceAlertSensor(
+                    coordinator=coordinator,
+                    agency=stop[CONF_AGENCY],
+                    stop_code=stop[CONF_STOP_CODE],
+                    write_stats=entry.runtime_data.write_stats,
+                )
+            )
+
+        if line_sensors:
+            _async_add_line_sensors(
+                entry,
+                coordinator,
+                async_add_entities,
+                frozenset(_upper(entry.options.get(CONF_LINE_SENSOR_LINES, []))),
+                frozenset(_upper(entry.options.get(CONF_LINE_SENSOR_DIRECTIONS, []))),
             )
+
+    entities.append(
+        Bay511RequestBudgetSensor(
+            client=entry.runtime_data.client,
+            entry_id=entry.entry_id,
+        )
+    )
+
+    entities.extend(
+        Bay511RequestMetricsSensor(
+            client=entry.runtime_data.client,
+            entry_id=entry.entry_id,
+            endpoint=endpoint,
+            description=description,
         )
+        for endpoint in _polled_endpoints(entry.runtime_data)
+        for description in REQUEST_METRICS_SENSORS
+    )
 
     async_add_entities(entities)
 
 
-class Bay511ArrivalSensor(CoordinatorEntity, SensorEntity):
-    """Bay Area 511 Arrival Sensor."""
+def _polled_endpoints(data: Bay511Data) -> list[str]:
+    """Return the 511 endpoints that the entry's coordinators poll."""
+    endpoints = []
+    if any(
+        coordinator.agency_coordinator is None
+        or not coordinator.agency_coordinator.trip_updates
+        for coordinator in data.coordinators.values()
+    ):
+        endpoints.append("StopMonitoring")
+    if any(
+        coordinator.trip_updates for coordinator in data.agency_coordinators.values()
+    ):
+        endpoints.append("TripUpdates")
+    if data.vehicle_coordinators:
+        endpoints.append("VehicleMonitoring")
+    if data.alert_coordinators:
+        endpoints.append("servicealerts")
+    return endpoints
+
+
+def _upper(refs: list[str]) -> list[str]:
+    """Normalize line or direction refs entered in the options."""
+    return [ref.strip().upper() for ref in refs]
+
+
+def _async_add_line_sensors(
+    entry: Bay511ConfigEntry,
+    coordinator: Bay511DataUpdateCoordinator,
+    async_add_entities: AddEntitiesCallback,
+    lines: frozenset[str],
+    directions: frozenset[str],
+) -> None:
+    """Add a sensor for every wanted line and direction once it shows up."""
+    seen: set[tuple[str | None, str | None]] = set()
+
+    @callback
+    def _async_check_lines() -> None:
+        if coordinator.data is None:
+            return
+        new_keys = []
+        for key in coordinator.data.lines:
+            if key in seen:
+                continue
+            # Lines filtered out are only looked at once
+            seen.add(key)
+            line_ref, direction = key
+            if (not lines or (line_ref or "").upper() in lines) and (
+                not directions or (direction or "").upper() in directions
+            ):
+                new_keys.append(key)
+        if new_keys:
+            async_add_entities(
+                Bay511LineSensor(
+                    coordinator=coordinator,
+                    agency=coordinator.agency,
+                    stop_code=coordinator.stop_code,
+                    write_stats=entry.runtime_data.write_stats,
+                    line_ref=line_ref,
+                    direction=direction,
+                )
+                for line_ref, direction in new_keys
+            )
+
+    _async_check_lines()
+    entry.async_on_unload(coordinator.async_add_listener(_async_check_lines))
+
+
+class Bay511StopSensor(CoordinatorEntity, SensorEntity):
+    """
+    Base class of the sensors showing arrivals at a stop.
+
+    Coordinator updates that change neither the arrivals nor the stop name,
+    staleness or use of the schedule shown by the sensor don't write its
+    state. The polling counters are refreshed with the next write.
+    """
 
     _attr_attribution = ATTRIBUTION
     _attr_has_entity_name = True
@@ -65,13 +288,112 @@ class Bay511ArrivalSensor(CoordinatorEntity, SensorEntity):
         coordinator: Bay511DataUpdateCoordinator,
         agency: str,
         stop_code: str,
-        arrival_index: int,
-        description: str,
+        write_stats: Bay511StateWriteStats,
     ) -> None:
         """Initialize the sensor."""
         super().__init__(coordinator)
         self._agency = agency
         self._stop_code = stop_code
+        self._write_stats = write_stats
+        self._fingerprint: tuple | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Remember what the first state written shows."""
+        await super().async_added_to_hass()
+        self._fingerprint = self._state_fingerprint()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only if the update changed what the sensor shows."""
+        fingerprint = self._state_fingerprint()
+        if fingerprint == self._fingerprint:
+            self._write_stats.skipped += 1
+            return
+        self._fingerprint = fingerprint
+        self._write_stats.written += 1
+        self.async_write_ha_state()
+
+    def _state_fingerprint(self) -> tuple:
+        """Return what the state and attributes are computed from."""
+        snapshot = self.coordinator.data
+        stale = self.coordinator.stale
+        return (
+            self.coordinator.last_update_success,
+            # Arrivals are replaced rather than changed, so comparing them
+            # compares their minutes, times and vehicle status
+            self._shown_arrivals(),
+            snapshot.stop_name,
+            stale,
+            snapshot.fetched_at if stale else None,
+            self.coordinator.scheduled,
+            self._shown_accuracy(),
+        )
+
+    def _shown_arrivals(self) -> Any:
+        """Return the arrivals the sensor shows, by default all of the stop's."""
+        return self.coordinator.data.arrivals
+
+    def _shown_accuracy(self) -> dict[str, Any] | None:
+        """Return the prediction accuracy the sensor shows, if any."""
+        return None
+
+    def _line_accuracy(self, line_ref: str | None) -> dict[str, Any] | None:
+        """Return how accurate the predictions of a line at the stop were."""
+        accuracy = self.coordinator.accuracy
+        return accuracy.percentiles(line_ref) if accuracy is not None else None
+
+    @property
+    def _stop_name(self) -> str:
+        """Return the name of the stop."""
+        return self.coordinator.data.stop_name or f"Stop {self._stop_code}"
+
+    def _stop_attributes(self) -> dict[str, Any]:
+        """Return the attributes describing the stop and its polling."""
+        attributes: dict[str, Any] = {}
+        if self.coordinator.stale:
+            # Only while stale, so fresh updates don't all change an attribute
+            attributes["fetched_at"] = self.coordinator.data.fetched_at
+
+        return {
+            **attributes,
+            "stop_name": self.coordinator.data.stop_name,
+            "stop_code": self._stop_code,
+            "agency": self._agency,
+            "stale": self.coordinator.stale,
+            "scheduled": self.coordinator.scheduled,
+            **self._polling_attributes(),
+        }
+
+    def _polling_attributes(self) -> dict[str, Any]:
+        """Return how often the stop is polled and how many polls were saved."""
+        policy = self.coordinator.poll_policy
+        if policy is None:
+            return {}
+        return {
+            "polls": policy.polls,
+            "polls_saved": policy.polls_saved,
+        }
+
+
+class Bay511ArrivalSensor(Bay511StopSensor):
+    """Bay Area 511 Arrival Sensor."""
+
+    # Change with every update without changing what the sensor shows
+    _unrecorded_attributes = frozenset(
+        {"expected_time", "aimed_time", "fetched_at", "polls", "polls_saved"}
+    )
+
+    def __init__(  # noqa: PLR0913
+        self,
+        coordinator: Bay511DataUpdateCoordinator,
+        agency: str,
+        stop_code: str,
+        arrival_index: int,
+        description: str,
+        write_stats: Bay511StateWriteStats,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, agency, stop_code, write_stats)
         self._arrival_index = arrival_index
         self._description = description
 
@@ -81,19 +403,30 @@ class Bay511ArrivalSensor(CoordinatorEntity, SensorEntity):
         # Set entity ID
         self.entity_id = f"sensor.bay_511_{agency}_{stop_code}_{description}"
 
+    def _shown_arrivals(self) -> Arrival | None:
+        """Return the arrival this sensor shows."""
+        return self._arrival
+
+    @property
+    def _arrival(self) -> Arrival | None:
+        """Return the arrival this sensor shows, if there is one."""
+        return self.coordinator.data.arrival(self._arrival_index)
+
+    def _shown_accuracy(self) -> dict[str, Any] | None:
+        """Return the prediction accuracy of the arrival's line."""
+        arrival = self._arrival
+        return self._line_accuracy(arrival.line_ref) if arrival is not None else None
+
     @property
     def name(self) -> str:
         """Return the name of the sensor."""
-        stop_name = self.coordinator.data.get("stop_name", f"Stop {self._stop_code}")
-        return f"{stop_name} - {self._description.capitalize()} Arrival"
+        return f"{self._stop_name} - {self._description.capitalize()} Arrival"
 
     @property
     def native_value(self) -> int | None:
         """Return minutes until arrival."""
-        arrivals = self.coordinator.data.get("arrivals", [])
-        if len(arrivals) > self._arrival_index:
-            return arrivals[self._arrival_index].get("minutes_away")
-        return None
+        arrival = self._arrival
+        return arrival.minutes_away if arrival is not None else None
 
     @property
     def native_unit_of_measurement(self) -> str:
@@ -108,24 +441,296 @@ class Bay511ArrivalSensor(CoordinatorEntity, SensorEntity):
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return extra state attributes."""
-        arrivals = self.coordinator.data.get("arrivals", [])
-
-        if len(arrivals) > self._arrival_index:
-            arrival = arrivals[self._arrival_index]
-            return {
-                "line": arrival.get("line_ref"),
-                "destination": arrival.get("destination"),
-                "direction": arrival.get("direction"),
-                "expected_time": arrival.get("expected_arrival_time"),
-                "aimed_time": arrival.get("aimed_arrival_time"),
-                "vehicle_at_stop": arrival.get("vehicle_at_stop", False),
-                "stop_name": self.coordinator.data.get("stop_name"),
-                "stop_code": self._stop_code,
-                "agency": self._agency,
+        attributes: dict[str, Any] = {}
+        if (arrival := self._arrival) is not None:
+            attributes = {
+                "line": arrival.line_ref,
+                "destination": arrival.destination,
+                "direction": arrival.direction,
+                "expected_time": arrival.expected_arrival_time,
+                "aimed_time": arrival.aimed_arrival_time,
+                "vehicle_at_stop": arrival.vehicle_at_stop,
             }
+            if (accuracy := self._shown_accuracy()) is not None:
+                attributes["accuracy"] = accuracy
+        return {**attributes, **self._stop_attributes()}
 
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return self.coordinator.last_update_success and self.native_value is not None
+
+
+class Bay511LineSensor(Bay511StopSensor):
+    """
+    Arrivals of one line in one direction at a stop.
+
+    When the agency's vehicles are tracked, the vehicles of the line heading
+    to the stop are listed too, and vehicle updates only write the state if
+    one of those moved.
+    """
+
+    _attr_native_unit_of_measurement = "min"
+    _attr_icon = "mdi:bus-clock"
+    # Change with every update without changing what the sensor shows
+    _unrecorded_attributes = frozenset(
+        {
+            "expected_time",
+            "upcoming",
+            "vehicles",
+            "fetched_at",
+            "polls",
+            "polls_saved",
+        }
+    )
+
+    def __init__(  # noqa: PLR0913
+        self,
+        coordinator: Bay511DataUpdateCoordinator,
+        agency: str,
+        stop_code: str,
+        write_stats: Bay511StateWriteStats,
+        line_ref: str | None,
+        direction: str | None,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, agency, stop_code, write_stats)
+        self._line_ref = line_ref
+        self._direction = direction
+        self._attr_unique_id = (
+            f"{DOMAIN}_{agency}_{stop_code}_{line_ref}_{direction}_line"
+        )
+        self.entity_id = "sensor." + slugify(
+            f"bay_511_{agency}_{stop_code}_{line_ref}_{direction or ''}"
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Also follow the vehicles of the line when they are tracked."""
+        await super().async_added_to_hass()
+        if (vehicles := self.coordinator.vehicles) is not None:
+            self.async_on_remove(
+                vehicles.async_add_listener(self._handle_vehicles_update)
+            )
+
+    @callback
+    def _handle_vehicles_update(self) -> None:
+        """Check the state only if the line's vehicles near the stop changed."""
+        vehicles = self.coordinator.vehicles
+        if (self._stop_code, self._line_ref) in vehicles.changed:
+            self._handle_coordinator_update()
+
+    def _state_fingerprint(self) -> tuple:
+        """Return what the state and attributes are computed from."""
+        # Vehicles are updated in place, so compare what is shown of them
+        vehicles = tuple(
+            (
+                vehicle.vehicle_ref,
+                vehicle.latitude,
+                vehicle.longitude,
+                vehicle.stop_codes[0],
+            )
+            for vehicle in self._vehicles()
+        )
+        return (*super()._state_fingerprint(), vehicles)
+
+    def _shown_arrivals(self) -> tuple[Arrival, ...]:
+        """Return the next arrivals of the line."""
+        arrivals = self.coordinator.data.line_arrivals(self._line_ref, self._direction)
+        return arrivals[:LINE_SENSOR_ARRIVALS]
+
+    def _shown_accuracy(self) -> dict[str, Any] | None:
+        """Return the prediction accuracy of the line."""
+        return self._line_accuracy(self._line_ref)
+
+    def _vehicles(self) -> list[Vehicle]:
+        """Return the line's vehicles heading to the stop, nearest first."""
+        if (vehicles := self.coordinator.vehicles) is None:
+            return []
+        approaching = vehicles.index.approaching(
+            self._stop_code, self._line_ref, self._direction
+        )
+        return approaching[:LINE_SENSOR_VEHICLES]
+
+    @property
+    def name(self) -> str:
+        """Return the name of the sensor."""
+        line = " ".join(filter(None, (self._line_ref, self._direction)))
+        return f"{self._stop_name} - {line or 'Unknown line'}"
+
+    @property
+    def native_value(self) -> int | None:
+        """Return minutes until the line's next arrival."""
+        arrivals = self._shown_arrivals()
+        return arrivals[0].minutes_away if arrivals else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return extra state attributes."""
+        attributes: dict[str, Any] = {
+            "line": self._line_ref,
+            "direction": self._direction,
+        }
+        arrivals = self._shown_arrivals()
+        if arrivals:
+            attributes.update(
+                {
+                    "destination": arrivals[0].destination,
+                    "expected_time": arrivals[0].expected_arrival_time,
+                    "vehicle_at_stop": arrivals[0].vehicle_at_stop,
+                    "upcoming": [arrival.minutes_away for arrival in arrivals[1:]],
+                }
+            )
+        if (accuracy := self._shown_accuracy()) is not None:
+            attributes["accuracy"] = accuracy
+        if self.coordinator.vehicles is not None:
+            attributes["vehicles"] = [vehicle.as_dict() for vehicle in self._vehicles()]
+        return {**attributes, **self._stop_attributes()}
+
+
+class Bay511DepartureBoardSensor(Bay511StopSensor):
+    """
+    The next departures from a stop in a single sensor.
+
+    The state is the minutes until the first listed departure and the
+    `departures` attribute lists up to `size` of them, optionally only of
+    some lines and directions.
+    """
+
+    _attr_native_unit_of_measurement = "min"
+    _attr_icon = "mdi:bus-multiple"
+    # The whole board changes with every minute counted down
+    _unrecorded_attributes = frozenset(
+        {"departures", "fetched_at", "polls", "polls_saved"}
+    )
+
+    def __init__(  # noqa: PLR0913
+        self,
+        coordinator: Bay511DataUpdateCoordinator,
+        agency: str,
+        stop_code: str,
+        write_stats: Bay511StateWriteStats,
+        size: int,
+        lines: list[str],
+        directions: list[str],
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, agency, stop_code, write_stats)
+        self._size = size
+        self._lines = frozenset(line.strip().upper() for line in lines)
+        self._directions = frozenset(
+            direction.strip().upper() for direction in directions
+        )
+        self._attr_unique_id = f"{DOMAIN}_{agency}_{stop_code}_departure_board"
+        self.entity_id = f"sensor.bay_511_{agency}_{stop_code}_departures"
+
+    def _shown_arrivals(self) -> tuple[Arrival, ...]:
+        """Return the departures on the board."""
+        return self.coordinator.data.departures(
+            self._size, self._lines, self._directions
+        )
+
+    @property
+    def name(self) -> str:
+        """Return the name of the sensor."""
+        return f"{self._stop_name} - Departures"
+
+    @property
+    def native_value(self) -> int | None:
+        """Return minutes until the first departure."""
+        departures = self._shown_arrivals()
+        return departures[0].minutes_away if departures else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return extra state attributes."""
+        attributes: dict[str, Any] = {
+            "departures": [
+                {
+                    "line": arrival.line_ref,
+                    "direction": arrival.direction,
+                    "destination": arrival.destination,
+                    "minutes": arrival.minutes_away,
+                    "expected_time": arrival.expected_arrival_time,
+                    "vehicle_at_stop": arrival.vehicle_at_stop,
+                }
+                for arrival in self._shown_arrivals()
+            ],
+        }
+        if self._lines:
+            attributes["lines"] = sorted(self._lines)
+        if self._directions:
+            attributes["directions"] = sorted(self._directions)
+        return {**attributes, **self._stop_attributes()}
+
+
+class Bay511ServiceAlertSensor(Bay511StopSensor):
+    """
+    The service alerts in effect at a stop.
+
+    The state is the number of alerts naming the stop, one of the lines
+    seen in its arrivals, or the whole agency, and the `alerts` attribute
+    lists them. The agency's alerts coordinator only calls the listeners of
+    the stops a changed alert affects.
+    """
+
+    _attr_icon = "mdi:alert-outline"
+    _attr_native_unit_of_measurement = "alerts"
+    _unrecorded_attributes = frozenset({"alerts"})
+
+    def __init__(
+        self,
+        coordinator: Bay511DataUpdateCoordinator,
+        agency: str,
+        stop_code: str,
+        write_stats: Bay511StateWriteStats,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, agency, stop_code, write_stats)
+        self._attr_unique_id = f"{DOMAIN}_{agency}_{stop_code}_service_alerts"
+        self.entity_id = f"sensor.bay_511_{agency}_{stop_code}_alerts"
+
+    def _state_fingerprint(self) -> tuple:
+        """Return what the state and attributes are computed from."""
+        # Alerts are replaced rather than changed when 511 updates them
+        return (
+            self.coordinator.data.stop_name,
+            tuple(self._alerts()),
+            self._alerts_available(),
+        )
+
+    def _alerts(self) -> list[ServiceAlert]:
+        """Return the alerts in effect at the stop."""
+        alerts = self.coordinator.alerts
+        if alerts is None:
+            return []
+        line_refs = {arrival.line_ref for arrival in self.coordinator.data.arrivals}
+        return alerts.index.for_stop(self._stop_code, line_refs)
+
+    def _alerts_available(self) -> bool:
+        """Return whether the agency's alerts were fetched."""
+        alerts = self.coordinator.alerts
+        return (
+            alerts is not None
+            and alerts.data is not None
+            and alerts.last_update_success
+        )
+
+    @property
+    def name(self) -> str:
+        """Return the name of the sensor."""
+        return f"{self._stop_name} - Service Alerts"
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of alerts in effect at the stop."""
+        return len(self._alerts())
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return extra state attributes."""
         return {
-            "stop_name": self.coordinator.data.get("stop_name"),
+            "alerts": [alert.as_dict() for alert in self._alerts()],
+            "stop_name": self.coordinator.data.stop_name,
             "stop_code": self._stop_code,
             "agency": self._agency,
         }
@@ -133,4 +738,120 @@ class Bay511ArrivalSensor(CoordinatorEntity, SensorEntity):
     @property
     def available(self) -> bool:
         """Return if entity is available."""
-        return self.coordinator.last_update_success and self.native_value is not None
+        return self._alerts_available()
+
+
+class Bay511RequestBudgetSensor(SensorEntity):
+    """Requests left in the hourly quota of the API keys."""
+
+    _attr_attribution = ATTRIBUTION
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "requests"
+    _attr_icon = "mdi:speedometer"
+    _attr_name = "API requests remaining"
+    _attr_should_poll = False
+    # The counters change with every request
+    _unrecorded_attributes = frozenset(
+        {
+            "limit",
+            "pollers",
+            "api_keys",
+            "cache_hits",
+            "cache_misses",
+            "cache_coalesced",
+            "cache_evictions",
+            "cache_size",
+            "circuit_breakers",
+        }
+    )
+
+    def __init__(self, client: Bay511ApiClient, entry_id: str) -> None:
+        """Initialize the sensor."""
+        self._budget = client.budget
+        self._cache = client.cache
+        self._breakers = client.breakers
+        self._attr_unique_id = f"{DOMAIN}_{entry_id}_requests_remaining"
+
+    async def async_added_to_hass(self) -> None:
+        """Update when the budget changes, at most once per cooldown."""
+        await super().async_added_to_hass()
+        # The budget changes twice per request, on acquire and on the response
+        debouncer = Debouncer(
+            self.hass,
+            LOGGER,
+            cooldown=BUDGET_SENSOR_COOLDOWN,
+            immediate=True,
+            function=self.async_write_ha_state,
+        )
+        self.async_on_remove(debouncer.async_shutdown)
+        self.async_on_remove(
+            self._budget.async_add_listener(debouncer.async_schedule_call)
+        )
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of requests left."""
+        return self._budget.remaining
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return extra state attributes."""
+        return {
+            "limit": self._budget.limit,
+            "pollers": self._budget.poller_count,
+            "api_keys": self._budget.report(),
+            **{f"cache_{name}": value for name, value in self._cache.stats.items()},
+            "circuit_breakers": {
+                endpoint: breaker.state for endpoint, breaker in self._breakers.items()
+            },
+        }
+
+
+class Bay511RequestMetricsSensor(SensorEntity):
+    """Latency, size, parse time or errors of the requests to an endpoint."""
+
+    entity_description: Bay511RequestMetricsSensorDescription
+
+    _attr_attribution = ATTRIBUTION
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        client: Bay511ApiClient,
+        entry_id: str,
+        endpoint: str,
+        description: Bay511RequestMetricsSensorDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._client_metrics = client.metrics
+        self._metrics = client.metrics.endpoint(endpoint)
+        self._attr_name = f"{endpoint} {description.name}"
+        self._attr_unique_id = (
+            f"{DOMAIN}_{entry_id}_{slugify(endpoint)}_{description.key}"
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Update whenever a request is recorded."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._client_metrics.async_add_listener(self.async_write_ha_state)
+        )
+
+    @property
+    def native_value(self) -> float | int | None:
+        """Return the metric of the last request."""
+        return self.entity_description.value_fn(self._metrics)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return extra state attributes."""
+        return {
+            "requests": self._metrics.requests,
+            **self.entity_description.attributes_fn(self._metrics),
+        }
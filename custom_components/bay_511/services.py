@@ -0,0 +1,80 @@
+"""Services for Bay Area 511 Transit."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import voluptuous as vol
+from homeassistant.core import ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+
+from .const import (
+    ATTR_CYCLES,
+    ATTR_TIMEOUT,
+    DEFAULT_PROFILE_CYCLES,
+    DEFAULT_PROFILE_TIMEOUT,
+    DOMAIN,
+    SERVICE_PROFILE,
+)
+from .profiler import Bay511Profiler
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+    from .data import Bay511ConfigEntry
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CYCLES, default=DEFAULT_PROFILE_CYCLES): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=1000)
+        ),
+        vol.Optional(ATTR_TIMEOUT, default=DEFAULT_PROFILE_TIMEOUT): vol.All(
+            vol.Coerce(int), vol.Range(min=10, max=3600)
+        ),
+    }
+)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration's services."""
+
+    async def _async_profile(call: ServiceCall) -> ServiceResponse:
+        """Profile the next update cycles of every loaded entry."""
+        entries: list[Bay511ConfigEntry] = hass.config_entries.async_loaded_entries(
+            DOMAIN
+        )
+        pollers: list[DataUpdateCoordinator] = [
+            poller
+            for entry in entries
+            for poller in (
+                *entry.runtime_data.agency_coordinators.values(),
+                *entry.runtime_data.vehicle_coordinators.values(),
+                *entry.runtime_data.coordinators.values(),
+            )
+            if poller.polling is not None
+        ]
+        if not pollers:
+            msg = "No Bay Area 511 stops are being polled"
+            raise ServiceValidationError(msg)
+
+        domain_data = hass.data.setdefault(DOMAIN, {})
+        if domain_data.get("profiler") is not None:
+            msg = "A profile is already running"
+            raise HomeAssistantError(msg)
+
+        profiler = domain_data["profiler"] = Bay511Profiler(
+            hass, call.data[ATTR_CYCLES], call.data[ATTR_TIMEOUT]
+        )
+        try:
+            return await profiler.async_run(pollers)
+        finally:
+            domain_data["profiler"] = None
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        _async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
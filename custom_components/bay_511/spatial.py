@@ -0,0 +1,169 @@
+"""Spatial index of transit stops for nearby-stop lookups."""
+
+from __future__ import annotations
+
+import math
+from array import array
+from typing import TYPE_CHECKING
+
+from .const import SPATIAL_CELL_SIZE
+
+if TYPE_CHECKING:
+    from .models import TransitStop
+
+EARTH_RADIUS = 6_371_000  # meters
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+
+def distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Return the great-circle distance between two points in meters."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(lon2 - lon1) / 2
+    a = (
+        math.sin(half_dphi) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+class Bay511StopGrid:
+    """
+    Find the stops near a point.
+
+    Stops are bucketed into square cells of `cell_size` meters, so a lookup
+    only measures the distance to stops in the few cells around the point.
+    Coordinates live in flat arrays and every cell holds an array of stop
+    positions, which keeps tens of thousands of stops compact.
+    """
+
+    def __init__(
+        self,
+        stops: list[tuple[str, TransitStop]],
+        cell_size: float = SPATIAL_CELL_SIZE,
+    ) -> None:
+        """Index the agency and stop pairs that have a location."""
+        self.stops = [
+            (agency, stop)
+            for agency, stop in stops
+            if stop.latitude is not None and stop.longitude is not None
+        ]
+        self._latitudes = array("d", (stop.latitude for _, stop in self.stops))
+        self._longitudes = array("d", (stop.longitude for _, stop in self.stops))
+        self.cell_size = cell_size
+
+        # Cells are square at the stops' mean latitude; the Bay Area is small
+        # enough for that to hold everywhere within a few percent
+        mean_latitude = (
+            sum(self._latitudes) / len(self._latitudes) if self.stops else 0.0
+        )
+        self._lat_step = cell_size / METERS_PER_DEGREE
+        self._lon_step = cell_size / (
+            METERS_PER_DEGREE * math.cos(math.radians(mean_latitude))
+        )
+        self._cells: dict[tuple[int, int], array] = {}
+        for position, (latitude, longitude) in enumerate(
+            zip(self._latitudes, self._longitudes, strict=True)
+        ):
+            cell = self._cell(latitude, longitude)
+            if (positions := self._cells.get(cell)) is None:
+                positions = self._cells[cell] = array("I")
+            positions.append(position)
+
+        rows = [row for row, _ in self._cells] or [0]
+        columns = [column for _, column in self._cells] or [0]
+        self._bounds = (min(rows), max(rows), min(columns), max(columns))
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        """Return the cell containing a point."""
+        return (
+            math.floor(latitude / self._lat_step),
+            math.floor(longitude / self._lon_step),
+        )
+
+    def _ring(self, row: int, column: int, reach: int) -> list[int]:
+        """Return the stops in the cells exactly `reach` cells from a cell."""
+        positions: list[int] = []
+        for cell_row in range(row - reach, row + reach + 1):
+            edge = cell_row in (row - reach, row + reach)
+            step = 1 if edge else 2 * reach
+            for cell_column in range(column - reach, column + reach + 1, step):
+                if (cell := self._cells.get((cell_row, cell_column))) is not None:
+                    positions.extend(cell)
+        return positions
+
+    def _measure(
+        self, latitude: float, longitude: float, positions: list[int]
+    ) -> list[tuple[float, int]]:
+        """Return the distance to each of the stops at `positions`."""
+        return [
+            (
+                distance(
+                    latitude,
+                    longitude,
+                    self._latitudes[position],
+                    self._longitudes[position],
+                ),
+                position,
+            )
+            for position in positions
+        ]
+
+    def within(
+        self, latitude: float, longitude: float, radius: float
+    ) -> list[tuple[float, str, TransitStop]]:
+        """Return the stops within `radius` meters, nearest first."""
+        if not self.stops:
+            return []
+        row, column = self._cell(latitude, longitude)
+        # Cells narrow towards the poles, so reach further east and west
+        lon_cell_meters = (
+            self._lon_step * METERS_PER_DEGREE * math.cos(math.radians(latitude))
+        )
+        rows = math.ceil(radius / self.cell_size)
+        columns = math.ceil(radius / lon_cell_meters)
+        positions: list[int] = []
+        for cell_row in range(row - rows, row + rows + 1):
+            for cell_column in range(column - columns, column + columns + 1):
+                if (cell := self._cells.get((cell_row, cell_column))) is not None:
+                    positions.extend(cell)
+        found = [
+            (meters, position)
+            for meters, position in self._measure(latitude, longitude, positions)
+            if meters <= radius
+        ]
+        found.sort()
+        return [(meters, *self.stops[position]) for meters, position in found]
+
+    def nearest(
+        self, latitude: float, longitude: float, count: int = 1
+    ) -> list[tuple[float, str, TransitStop]]:
+        """Return the `count` stops nearest to a point, nearest first."""
+        if not self.stops:
+            return []
+        row, column = self._cell(latitude, longitude)
+        lon_cell_meters = (
+            self._lon_step * METERS_PER_DEGREE * math.cos(math.radians(latitude))
+        )
+        cell_meters = min(self.cell_size, lon_cell_meters)
+        min_row, max_row, min_column, max_column = self._bounds
+        last_reach = max(
+            abs(row - min_row),
+            abs(row - max_row),
+            abs(column - min_column),
+            abs(column - max_column),
+        )
+
+        found: list[tuple[float, int]] = []
+        for reach in range(last_reach + 1):
+            found.extend(
+                self._measure(latitude, longitude, self._ring(row, column, reach))
+            )
+            # Every stop closer than the scanned square's edge has been seen
+            if len(found) >= count:
+                found.sort()
+                if found[count - 1][0] <= reach * cell_meters:
+                    break
+        found.sort()
+        return [(meters, *self.stops[position]) for meters, position in found[:count]]
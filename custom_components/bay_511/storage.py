@@ -0,0 +1,141 @@
+"""Persistence of the last stop snapshots for Bay Area 511 Transit."""
+
+from __future__ import annotations
+
+import time
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    SNAPSHOT_MAX_AGE,
+    SNAPSHOT_SAVE_DELAY,
+    SNAPSHOT_STORAGE_VERSION,
+)
+from .models import Arrival, StopSnapshot, intern_string, parse_arrival_time
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from homeassistant.core import HomeAssistant
+
+    from .coordinator import Bay511DataUpdateCoordinator
+
+
+def _compact_snapshot(snapshot: StopSnapshot) -> list[Any]:
+    """Pack a stop snapshot into positional lists for storage."""
+    fetched_at = snapshot.fetched_at
+    return [
+        fetched_at.timestamp() if fetched_at is not None else time.time(),
+        snapshot.stop_name,
+        snapshot.stop_code,
+        [
+            [
+                arrival.line_ref,
+                arrival.direction,
+                arrival.destination,
+                arrival.aimed_arrival_time,
+                arrival.expected_arrival_time,
+                arrival.vehicle_at_stop,
+            ]
+            for arrival in snapshot.arrivals
+        ],
+    ]
+
+
+def _expand_snapshot(compact: list[Any]) -> StopSnapshot:
+    """Unpack a stored snapshot, recomputing minutes and dropping departures."""
+    fetched_at, stop_name, stop_code, arrivals = compact
+    expanded = tuple(
+        Arrival(
+            line_ref=intern_string(line_ref),
+            direction=intern_string(direction),
+            destination=intern_string(destination),
+            aimed_arrival_time=aimed,
+            expected_arrival_time=expected,
+            vehicle_at_stop=at_stop,
+            expected_at=parse_arrival_time(expected),
+            minutes_away=None,
+        )
+        for line_ref, direction, destination, aimed, expected, at_stop in arrivals
+    )
+    return StopSnapshot(
+        intern_string(stop_name),
+        stop_code,
+        expanded,
+        datetime.fromtimestamp(fetched_at, UTC),
+    ).counted_down()
+
+
+class Bay511SnapshotStore:
+    """
+    Keep the last snapshot of every stop on disk.
+
+    Snapshots are stored as positional lists and written at most once per
+    `SNAPSHOT_SAVE_DELAY`, so frequent refreshes cost a single small write.
+    Only live predictions are stored, never stale or scheduled data, so
+    every stored snapshot can be restored as live.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the store for a config entry."""
+        self._store: Store[dict[str, list[Any]]] = Store(
+            hass,
+            SNAPSHOT_STORAGE_VERSION,
+            f"{DOMAIN}.{entry_id}.snapshots",
+        )
+        self._snapshots: dict[str, list[Any]] = {}
+        self._save_pending = False
+
+    async def async_load(self) -> dict[str, StopSnapshot]:
+        """Return the stored snapshots that are recent enough to show."""
+        self._snapshots = await self._store.async_load() or {}
+        now = time.time()
+        return {
+            stop_key: _expand_snapshot(compact)
+            for stop_key, compact in self._snapshots.items()
+            if now - compact[0] <= SNAPSHOT_MAX_AGE
+        }
+
+    @callback
+    def async_track(
+        self, stop_key: str, coordinator: Bay511DataUpdateCoordinator
+    ) -> Callable[[], None]:
+        """Save a coordinator's live data whenever it refreshes successfully."""
+
+        @callback
+        def _async_save_snapshot() -> None:
+            # Stale and scheduled data would be restored as live predictions
+            if (
+                coordinator.last_update_success
+                and coordinator.data is not None
+                and not coordinator.stale
+                and not coordinator.scheduled
+            ):
+                self._snapshots[stop_key] = _compact_snapshot(coordinator.data)
+                # Rescheduling would postpone the write for as long as updates
+                # keep coming, so only schedule one when none is pending
+                if not self._save_pending:
+                    self._save_pending = True
+                    self._store.async_delay_save(
+                        self._data_to_save, SNAPSHOT_SAVE_DELAY
+                    )
+
+        return coordinator.async_add_listener(_async_save_snapshot)
+
+    async def async_flush(self) -> None:
+        """Write pending snapshots right away."""
+        await self._store.async_save(self._data_to_save())
+
+    async def async_remove(self) -> None:
+        """Delete the stored snapshots."""
+        await self._store.async_remove()
+
+    @callback
+    def _data_to_save(self) -> dict[str, list[Any]]:
+        """Return the data to write."""
+        self._save_pending = False
+        return self._snapshots
@@ -0,0 +1,188 @@
+"""Incremental parsing of large StopMonitoring and VehicleMonitoring responses."""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import json
+import re
+from typing import TYPE_CHECKING, Any
+
+from .const import STREAM_CHUNK_SIZE
+from .models import normalize_ref
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    import aiohttp
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Parser states
+_SEEK = 0  # looking for the array's key
+_COLON = 1  # key found, expecting ':'
+_VALUE = 2  # expecting the array, or a single visit object
+_ARRAY = 3  # inside the array, between visits
+_SINGLE = 4  # a single visit object instead of an array
+_DONE = 5  # everything after the visits is ignored
+
+
+class Bay511StopVisitFilter:
+    """
+    Pull matching MonitoredStopVisit entries out of a response as it arrives.
+
+    Chunks are decoded and scanned for the MonitoredStopVisit array, whose
+    visits are then decoded one at a time. Only visits for the wanted stops
+    and lines are kept, so memory grows with the monitored stops rather than
+    with the size of the response. With `array_key` set to VehicleActivity,
+    it filters the vehicles of a VehicleMonitoring response the same way.
+    """
+
+    def __init__(
+        self,
+        stop_codes: Iterable[str] | None = None,
+        line_refs: Iterable[str] | None = None,
+        array_key: str = "MonitoredStopVisit",
+    ) -> None:
+        """Initialize the filter; `None` keeps every stop or line."""
+        self._stop_codes = set(stop_codes) if stop_codes is not None else None
+        self._line_refs = set(line_refs) if line_refs is not None else None
+        self._key = f'"{array_key}"'
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._state = _SEEK
+        self.visits: list[dict[str, Any]] = []
+        self.visits_seen = 0
+
+    def feed(self, chunk: bytes) -> None:
+        """Consume the next chunk of the response body."""
+        if self._state == _DONE:
+            return
+        self._buffer += self._text_decoder.decode(chunk)
+        self._consume(final=False)
+
+    def close(self) -> list[dict[str, Any]]:
+        """Finish parsing and return the kept visits."""
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        self._consume(final=True)
+        if self._state not in (_SEEK, _DONE):
+            msg = f"Truncated {self._key} array"
+            raise json.JSONDecodeError(msg, self._buffer, len(self._buffer))
+        return self.visits
+
+    def _consume(self, *, final: bool) -> None:  # noqa: PLR0912
+        """Parse as much of the buffer as possible."""
+        buffer = self._buffer
+        key = self._key
+        pos = 0
+        while self._state != _DONE:
+            if self._state == _SEEK:
+                index = buffer.find(key, pos)
+                if index < 0:
+                    # Keep enough of the tail to find a key split across chunks
+                    pos = max(pos, len(buffer) - len(key) + 1)
+                    break
+                pos = index + len(key)
+                self._state = _COLON
+
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+
+            if self._state == _COLON:
+                if char != ":":
+                    # The key was a string value, not the array we want
+                    self._state = _SEEK
+                    continue
+                pos += 1
+                self._state = _VALUE
+                continue
+
+            if self._state == _VALUE:
+                if char == "[":
+                    pos += 1
+                    self._state = _ARRAY
+                    continue
+                self._state = _SINGLE
+            elif char == "]":
+                self._state = _DONE
+                break
+            elif char == ",":
+                pos += 1
+                continue
+
+            try:
+                visit, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                # The visit continues in the next chunk
+                break
+            self._keep(visit)
+            if self._state == _SINGLE:
+                self._state = _DONE
+
+        self._buffer = "" if self._state == _DONE else buffer[pos:]
+
+    def _keep(self, visit: dict[str, Any]) -> None:
+        """Keep a visit if it is for a wanted stop and line."""
+        self.visits_seen += 1
+        journey = visit.get("MonitoredVehicleJourney", {})
+        if (
+            self._stop_codes is not None
+            and journey.get("MonitoredCall", {}).get("StopPointRef")
+            not in self._stop_codes
+        ):
+            return
+        # Compared as a string, the way the vehicle models keep it
+        if (
+            self._line_refs is not None
+            and normalize_ref(journey.get("LineRef")) not in self._line_refs
+        ):
+            return
+        self.visits.append(visit)
+
+
+async def async_read_stop_visits(
+    response: aiohttp.ClientResponse,
+    stop_codes: Iterable[str] | None = None,
+    line_refs: Iterable[str] | None = None,
+) -> dict[str, Any]:
+    """Stream a StopMonitoring response, keeping only the wanted visits."""
+    visit_filter = Bay511StopVisitFilter(stop_codes, line_refs)
+    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+        visit_filter.feed(chunk)
+
+    # Same shape as the full response, with only the kept visits
+    return {
+        "ServiceDelivery": {
+            "StopMonitoringDelivery": {"MonitoredStopVisit": visit_filter.close()}
+        }
+    }
+
+
+async def async_read_vehicle_activities(
+    response: aiohttp.ClientResponse, line_refs: Iterable[str] | None = None
+) -> list[dict[str, Any]]:
+    """Stream a VehicleMonitoring response, keeping only the wanted lines."""
+    activity_filter = Bay511StopVisitFilter(None, line_refs, "VehicleActivity")
+    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+        activity_filter.feed(chunk)
+    return activity_filter.close()
+
+
+async def async_save_stream(response: aiohttp.ClientResponse, path: Path) -> int:
+    """Write a response body to a file as it arrives and return its size."""
+    loop = asyncio.get_running_loop()
+    size = 0
+    file = await loop.run_in_executor(None, path.open, "wb")
+    try:
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            await loop.run_in_executor(None, file.write, chunk)
+            size += len(chunk)
+    finally:
+        await loop.run_in_executor(None, file.close)
+    return size
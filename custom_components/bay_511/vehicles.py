@@ -0,0 +1,136 @@
+"""Live vehicle positions of an agency, indexed by vehicle, line and stop."""
+
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any
+
+from .const import VEHICLE_MAX_AGE
+from .models import Vehicle
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# A stop code and the ref of a line whose vehicles head to it
+ApproachKey = tuple[str, str | None]
+
+
+class Bay511VehicleIndex:
+    """
+    Vehicles of an agency's watched lines, updated in place.
+
+    Each VehicleMonitoring response is merged into the index: vehicles whose
+    report didn't change are skipped, moved vehicles are re-indexed under
+    the stops they now approach, and vehicles missing from the response or
+    silent for `VEHICLE_MAX_AGE` seconds are evicted. Looking up the
+    vehicles approaching a stop on a line is a dictionary lookup.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self.vehicles: dict[str, Vehicle] = {}
+        self._by_line: dict[str | None, dict[str, Vehicle]] = {}
+        self._approaching: dict[ApproachKey, dict[str, Vehicle]] = {}
+        self.updates = 0
+        self.moved = 0
+        self.evicted = 0
+
+    def approaching(
+        self, stop_code: str, line_ref: str | None, direction: str | None = None
+    ) -> list[Vehicle]:
+        """Return the vehicles of a line heading to a stop, nearest first."""
+        vehicles = self._approaching.get((stop_code, line_ref))
+        if not vehicles:
+            return []
+        matching = [
+            vehicle
+            for vehicle in vehicles.values()
+            if direction is None or vehicle.direction == direction
+        ]
+        # Vehicles for which the stop is next come first
+        matching.sort(key=lambda vehicle: vehicle.stop_codes.index(stop_code))
+        return matching
+
+    def line_vehicles(self, line_ref: str | None) -> list[Vehicle]:
+        """Return the vehicles of a line."""
+        return list(self._by_line.get(line_ref, {}).values())
+
+    def update(
+        self, activities: Iterable[dict[str, Any]], now: float | None = None
+    ) -> set[ApproachKey]:
+        """
+        Merge the vehicles of a response and return the pairs that changed.
+
+        Vehicles not in `activities` are evicted, so pass every vehicle of
+        the watched lines.
+        """
+        now = now if now is not None else time.time()
+        oldest = now - VEHICLE_MAX_AGE
+        changed: set[ApproachKey] = set()
+        seen = set()
+        self.updates += 1
+        for activity in activities:
+            journey = activity.get("MonitoredVehicleJourney") or {}
+            vehicle_ref = journey.get("VehicleRef")
+            if vehicle_ref is None:
+                continue
+            vehicle_ref = str(vehicle_ref)
+            current = self.vehicles.get(vehicle_ref)
+            if current is not None and current.recorded_at == activity.get(
+                "RecordedAtTime"
+            ):
+                # Not reported again since the last response
+                if current.recorded_ts is None or current.recorded_ts >= oldest:
+                    seen.add(vehicle_ref)
+                continue
+
+            vehicle = Vehicle.from_activity(activity)
+            if vehicle.recorded_ts is not None and vehicle.recorded_ts < oldest:
+                continue
+            seen.add(vehicle_ref)
+            if current is not None and not vehicle.moved_from(current):
+                # Reported again from the same place; keep it from aging out
+                current.recorded_at = vehicle.recorded_at
+                current.recorded_ts = vehicle.recorded_ts
+                continue
+            if current is not None:
+                changed.update(self._remove(current))
+            changed.update(self._add(vehicle))
+            self.moved += 1
+
+        for vehicle_ref in self.vehicles.keys() - seen:
+            changed.update(self._remove(self.vehicles[vehicle_ref]))
+            self.evicted += 1
+        return changed
+
+    def clear(self) -> set[ApproachKey]:
+        """Evict every vehicle and return the pairs that changed."""
+        return self.update(())
+
+    def _add(self, vehicle: Vehicle) -> list[ApproachKey]:
+        """Index a vehicle and return the pairs it approaches."""
+        self.vehicles[vehicle.vehicle_ref] = vehicle
+        self._by_line.setdefault(vehicle.line_ref, {})[vehicle.vehicle_ref] = vehicle
+        keys = [(stop_code, vehicle.line_ref) for stop_code in vehicle.stop_codes]
+        for key in keys:
+            self._approaching.setdefault(key, {})[vehicle.vehicle_ref] = vehicle
+        return keys
+
+    def _remove(self, vehicle: Vehicle) -> list[ApproachKey]:
+        """Unindex a vehicle and return the pairs it approached."""
+        del self.vehicles[vehicle.vehicle_ref]
+        _discard(self._by_line, vehicle.line_ref, vehicle.vehicle_ref)
+        keys = [(stop_code, vehicle.line_ref) for stop_code in vehicle.stop_codes]
+        for key in keys:
+            _discard(self._approaching, key, vehicle.vehicle_ref)
+        return keys
+
+
+def _discard(index: dict[Any, dict[str, Vehicle]], key: Any, vehicle_ref: str) -> None:
+    """Remove a vehicle from a bucket, dropping the bucket once empty."""
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    bucket.pop(vehicle_ref, None)
+    if not bucket:
+        del index[key]
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark decoding of large 511 responses.
+
+Compares the previous text path (decode to str, strip the BOM, json.loads)
+with the bytes path used by the API client, both with orjson and with the
+stdlib fallback, and with the streaming filter used for agency-wide
+StopMonitoring, which keeps only the visits of --monitored stops. Peak
+memory is measured with tracemalloc in a separate run. Pass recorded
+responses with --payload, otherwise an agency-wide StopMonitoring and a
+stops catalog are generated with the fake 511 server's builders.
+
+    python3 scripts/benchmark_decode.py --payload recorded/StopMonitoring_SF.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import codecs
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_511_server import build_stop_monitoring, build_stops, stop_codes
+
+from custom_components.bay_511 import api
+from custom_components.bay_511.const import STREAM_CHUNK_SIZE
+from custom_components.bay_511.streaming import Bay511StopVisitFilter
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    Decoder = Callable[[bytes], Any]
+
+
+def text_path(body: bytes) -> Any:
+    """Decode the way the client did before reading raw bytes."""
+    text = body.decode("utf-8")
+    text = text.removeprefix("\ufeff")
+    return json.loads(text)
+
+
+def stdlib_bytes_path(body: bytes) -> Any:
+    """Decode bytes with the stdlib fallback."""
+    return json.loads(body)
+
+
+def streaming_path(monitored: Iterable[str]) -> Decoder:
+    """Return a decoder that streams the body, keeping `monitored` stops."""
+
+    def decode(body: bytes) -> Any:
+        visit_filter = Bay511StopVisitFilter(monitored)
+        view = memoryview(body)
+        for start in range(0, len(body), STREAM_CHUNK_SIZE):
+            visit_filter.feed(view[start : start + STREAM_CHUNK_SIZE])
+        return visit_filter.close()
+
+    return decode
+
+
+def peak_memory(func: Decoder, body: bytes) -> int:
+    """Return the peak memory allocated while decoding, in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func(body)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def best_of(func: Decoder, body: bytes, repeat: int) -> float:
+    """Return the fastest of `repeat` runs in seconds."""
+    timings = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(body)
+            timings.append(time.perf_counter() - start)
+            # Free the result outside the timed section
+            del result
+            gc.collect()
+    finally:
+        gc.enable()
+    return min(timings)
+
+
+def generated_payloads(stops: int) -> dict[str, Any]:
+    """Return generated payloads encoded like 511 sends them."""
+    codes = stop_codes(stops)
+    return {
+        f"StopMonitoring ({stops} stops)": build_stop_monitoring("SF", codes, 4),
+        f"stops ({stops} stops)": build_stops(codes),
+    }
+
+
+def main() -> None:
+    """Compare the decoders on every payload."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--payload", action="append", default=[])
+    parser.add_argument("--stops", type=int, default=5000)
+    parser.add_argument("--monitored", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bodies = {}
+    for path in map(Path, args.payload):
+        bodies[path.name] = path.read_bytes()
+    if not bodies:
+        for name, data in generated_payloads(args.stops).items():
+            text = json.dumps(data, separators=(",", ":"))
+            bodies[name] = codecs.BOM_UTF8 + text.encode()
+
+    paths: list[tuple[str, Decoder]] = [
+        ("text + json", text_path),
+        ("bytes + json", stdlib_bytes_path),
+    ]
+    if api.orjson is not None:
+        paths.append(("bytes + orjson", api._decode_json))  # noqa: SLF001
+    else:
+        print("orjson is not installed, only the stdlib paths are compared")  # noqa: T201
+    monitored = stop_codes(args.monitored)
+    streaming = ("stream + filter", streaming_path(monitored))
+
+    for name, body in bodies.items():
+        print(f"\n{name}: {len(body) / 1_000_000:.1f} MB")  # noqa: T201
+        baseline = None
+        candidates = [*paths, streaming] if b"MonitoredStopVisit" in body else paths
+        for label, func in candidates:
+            elapsed = best_of(func, body, args.repeat)
+            peak = peak_memory(func, body)
+            baseline = baseline or elapsed
+            print(  # noqa: T201
+                f"  {label:<16} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.2f}x"
+                f"  peak {peak / 1_000_000:6.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
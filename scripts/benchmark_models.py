@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Benchmark the arrival models against the previous per-arrival dicts.
+
+Parses a generated agency-wide StopMonitoring response both ways and
+reports the time to parse it, the memory kept by the parsed snapshots, the
+time of a countdown pass and the time to build the attributes of the two
+arrival sensors of every stop.
+
+    python3 scripts/benchmark_models.py --stops 500 --arrivals 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_511_server import build_stop_monitoring, stop_codes
+
+from custom_components.bay_511.api import Bay511ApiClient
+from custom_components.bay_511.models import minutes_until, parse_arrival_time
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    from custom_components.bay_511.models import StopSnapshot
+
+
+def dict_parse(data: dict) -> dict[str, dict]:
+    """Split a response into per-stop dicts the way the client used to."""
+    results = {}
+    visits = data["ServiceDelivery"]["StopMonitoringDelivery"]["MonitoredStopVisit"]
+    for visit in visits:
+        journey = visit.get("MonitoredVehicleJourney", {})
+        call = journey.get("MonitoredCall", {})
+        stop_code = call.get("StopPointRef")
+        result = results.setdefault(
+            stop_code, {"stop_name": None, "stop_code": stop_code, "arrivals": []}
+        )
+        if result["stop_name"] is None:
+            result["stop_name"] = call.get("StopPointName")
+        arrival = {
+            "line_ref": journey.get("LineRef"),
+            "direction": journey.get("DirectionRef"),
+            "destination": journey.get("DestinationName"),
+            "aimed_arrival_time": call.get("AimedArrivalTime"),
+            "expected_arrival_time": call.get("ExpectedArrivalTime"),
+            "vehicle_at_stop": call.get("VehicleAtStop", False),
+        }
+        arrival["expected_at"] = parse_arrival_time(arrival["expected_arrival_time"])
+        arrival["minutes_away"] = minutes_until(arrival["expected_at"])
+        result["arrivals"].append(arrival)
+    return results
+
+
+def model_parse(data: dict) -> dict[str, StopSnapshot]:
+    """Split a response into snapshot models."""
+    return Bay511ApiClient._parse_agency_stop_monitoring(None, data)  # noqa: SLF001
+
+
+def dict_count_down(snapshots: dict[str, dict]) -> dict[str, dict]:
+    """Recompute minutes the way the coordinator used to."""
+    return {
+        stop_code: {
+            **snapshot,
+            "arrivals": [
+                {**arrival, "minutes_away": minutes_until(arrival["expected_at"])}
+                for arrival in snapshot["arrivals"]
+            ],
+        }
+        for stop_code, snapshot in snapshots.items()
+    }
+
+
+def model_count_down(
+    snapshots: dict[str, StopSnapshot],
+) -> dict[str, StopSnapshot]:
+    """Recompute minutes with the models."""
+    return {
+        stop_code: snapshot.counted_down() for stop_code, snapshot in snapshots.items()
+    }
+
+
+def dict_attributes(snapshots: dict[str, dict]) -> list[dict]:
+    """Build both sensors' attributes from dicts."""
+    built = []
+    for snapshot in snapshots.values():
+        arrivals = snapshot.get("arrivals", [])
+        for index in (0, 1):
+            if len(arrivals) > index:
+                arrival = arrivals[index]
+                built.append(
+                    {
+                        "line": arrival.get("line_ref"),
+                        "destination": arrival.get("destination"),
+                        "direction": arrival.get("direction"),
+                        "expected_time": arrival.get("expected_arrival_time"),
+                        "aimed_time": arrival.get("aimed_arrival_time"),
+                        "vehicle_at_stop": arrival.get("vehicle_at_stop", False),
+                        "stop_name": snapshot.get("stop_name"),
+                    }
+                )
+    return built
+
+
+def model_attributes(snapshots: dict[str, StopSnapshot]) -> list[dict]:
+    """Build both sensors' attributes from the models."""
+    return [
+        {
+            "line": arrival.line_ref,
+            "destination": arrival.destination,
+            "direction": arrival.direction,
+            "expected_time": arrival.expected_arrival_time,
+            "aimed_time": arrival.aimed_arrival_time,
+            "vehicle_at_stop": arrival.vehicle_at_stop,
+            "stop_name": snapshot.stop_name,
+        }
+        for snapshot in snapshots.values()
+        for index in (0, 1)
+        if (arrival := snapshot.arrival(index)) is not None
+    ]
+
+
+def best_of(
+    calls: Sequence[tuple[Callable[[Any], Any], Any]], repeat: int
+) -> list[float]:
+    """
+    Return the fastest of `repeat` runs of each call, in seconds.
+
+    The calls take turns so that they all see the same machine load.
+    """
+    timings = [float("inf")] * len(calls)
+    for _ in range(repeat):
+        for index, (func, arg) in enumerate(calls):
+            start = time.perf_counter()
+            func(arg)
+            timings[index] = min(timings[index], time.perf_counter() - start)
+    return timings
+
+
+def retained_memory(parse: Callable[[dict], Any], data: dict) -> int:
+    """Return the memory kept by parsed snapshots, in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        snapshots = parse(data)
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del snapshots
+    return after - before
+
+
+def main() -> None:
+    """Compare the dicts with the models."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stops", type=int, default=500)
+    parser.add_argument("--arrivals", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    data = build_stop_monitoring("SF", stop_codes(args.stops), args.arrivals)
+    print(f"{args.stops} stops, {args.stops * args.arrivals} arrivals")  # noqa: T201
+
+    variants = {
+        "dicts": (dict_parse, dict_count_down, dict_attributes),
+        "models": (model_parse, model_count_down, model_attributes),
+    }
+    snapshots = {label: funcs[0](data) for label, funcs in variants.items()}
+    memory = {
+        label: retained_memory(funcs[0], data) for label, funcs in variants.items()
+    }
+    parse, count_down, attributes = (
+        best_of(
+            [
+                (funcs[step], data if step == 0 else snapshots[label])
+                for label, funcs in variants.items()
+            ],
+            args.repeat,
+        )
+        for step in range(3)
+    )
+    for index, label in enumerate(variants):
+        print(  # noqa: T201
+            f"  {label:<7}"
+            f" parse {parse[index] * 1000:7.1f} ms"
+            f"  kept {memory[label] / 1_000_000:6.2f} MB"
+            f"  countdown {count_down[index] * 1000:6.1f} ms"
+            f"  attributes {attributes[index] * 1000:5.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark integration startup against the local fake 511 API.
+
+Times the first refresh of every stop the way async_setup_entry runs it:
+one stop after another, concurrently with a limit, and as a single
+agency-wide fetch. The fake server adds a fixed latency to every request.
+
+    python3 scripts/benchmark_startup.py --stops 20 --latency 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import aiohttp
+from fake_511_server import Fake511, start_server
+
+from custom_components.bay_511 import _async_refresh_all
+from custom_components.bay_511.api import Bay511ApiClient
+from custom_components.bay_511.ratelimit import Bay511ApiKeyPool, Bay511RequestBudget
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+
+class StopFetcher:
+    """Stand-in for a per-stop coordinator's first refresh."""
+
+    def __init__(self, client: Bay511ApiClient, agency: str, stop_code: str) -> None:
+        """Fetch one stop of an agency."""
+        self.client = client
+        self.agency = agency
+        self.stop_code = stop_code
+
+    async def async_config_entry_first_refresh(self) -> None:
+        """Fetch the stop."""
+        await self.client.async_get_stop_monitoring(self.agency, self.stop_code)
+
+    async_refresh = async_config_entry_first_refresh
+
+
+class AgencyFetcher(StopFetcher):
+    """Stand-in for an agency coordinator's first refresh."""
+
+    def __init__(
+        self, client: Bay511ApiClient, agency: str, stop_codes: list[str]
+    ) -> None:
+        """Fetch the given stops of an agency."""
+        self.client = client
+        self.agency = agency
+        self.stop_codes = stop_codes
+
+    async def async_config_entry_first_refresh(self) -> None:
+        """Fetch the agency's stops at once."""
+        await self.client.async_get_agency_stop_monitoring(self.agency, self.stop_codes)
+
+
+async def timed(
+    label: str, pollers: Sequence[StopFetcher], concurrency: int, fake: Fake511
+) -> None:
+    """Run the first refreshes and print how long they took."""
+    fake.requests.clear()
+    start = time.perf_counter()
+    await _async_refresh_all(pollers, concurrency, first_refresh=True)
+    elapsed = time.perf_counter() - start
+    requests = sum(fake.requests.values())
+    print(f"{label:<32} {elapsed:8.3f} s {requests:6d} requests")  # noqa: T201
+
+
+async def main() -> None:
+    """Run every startup strategy against the fake."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stops", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    fake = Fake511(stops=args.stops, latency=args.latency)
+    runner, base_url = await start_server(fake)
+
+    print(f"Startup for {args.stops} stops, {args.latency:.2f} s latency per request")  # noqa: T201
+    print("=" * 60)  # noqa: T201
+    try:
+        async with aiohttp.ClientSession() as session:
+            client = Bay511ApiClient(
+                api_key="benchmark",
+                session=session,
+                budget=Bay511ApiKeyPool(
+                    {"benchmark": Bay511RequestBudget(limit=1_000_000)}
+                ),
+                base_url=base_url,
+            )
+            stops = [StopFetcher(client, "SF", code) for code in fake.codes]
+
+            await timed("sequential (previous behaviour)", stops, 1, fake)
+            await timed(
+                f"concurrent, limit {args.concurrency}", stops, args.concurrency, fake
+            )
+            await timed("concurrent, unlimited", stops, len(stops), fake)
+            await timed(
+                "agency-wide fetch",
+                [AgencyFetcher(client, "SF", fake.codes)],
+                args.concurrency,
+                fake,
+            )
+
+            # Entities are registered before any request with background startup
+            start = time.perf_counter()
+            task = asyncio.create_task(
+                _async_refresh_all(stops, args.concurrency, first_refresh=False)
+            )
+            elapsed = time.perf_counter() - start
+            print(f"{'background (setup returns after)':<32} {elapsed:8.3f} s")  # noqa: T201
+            await task
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark GTFS-Realtime TripUpdates against StopMonitoring JSON.
+
+Turns an agency's arrivals into snapshots of --monitored stops the three
+ways the client can: decoding the whole agency-wide StopMonitoring JSON,
+streaming it through the visit filter, and indexing the TripUpdates
+protobuf feed. Reports the response size, the time of each path and its
+peak memory, measured with tracemalloc in a separate run. Pass a directory
+recorded with scripts/record_511.py with --replay, otherwise both responses
+are generated with the fake 511 server's builders for the same stops and
+times.
+
+    python3 scripts/benchmark_trip_updates.py --replay recorded/ --monitored 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import codecs
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_511_server import build_stop_monitoring, build_trip_updates, stop_codes
+
+from custom_components.bay_511 import api
+from custom_components.bay_511.const import STREAM_CHUNK_SIZE
+from custom_components.bay_511.gtfs_rt import parse_trip_updates
+from custom_components.bay_511.streaming import Bay511StopVisitFilter
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    from custom_components.bay_511.models import StopSnapshot
+
+    ArrivalPath = Callable[[bytes], dict[str, StopSnapshot]]
+
+
+def json_path(monitored: Sequence[str]) -> ArrivalPath:
+    """Return a path decoding the whole response, keeping `monitored` stops."""
+
+    def run(body: bytes) -> dict[str, StopSnapshot]:
+        data = api._decode_json(body)  # noqa: SLF001
+        return api.Bay511ApiClient._parse_agency_stop_monitoring(  # noqa: SLF001
+            None, data, monitored
+        )
+
+    return run
+
+
+def streaming_path(monitored: Sequence[str]) -> ArrivalPath:
+    """Return a path streaming the response through the visit filter."""
+
+    def run(body: bytes) -> dict[str, StopSnapshot]:
+        visit_filter = Bay511StopVisitFilter(monitored)
+        view = memoryview(body)
+        for start in range(0, len(body), STREAM_CHUNK_SIZE):
+            visit_filter.feed(view[start : start + STREAM_CHUNK_SIZE])
+        data = {
+            "ServiceDelivery": {
+                "StopMonitoringDelivery": {"MonitoredStopVisit": visit_filter.close()}
+            }
+        }
+        return api.Bay511ApiClient._parse_agency_stop_monitoring(  # noqa: SLF001
+            None, data, monitored
+        )
+
+    return run
+
+
+def trip_updates_path(monitored: Sequence[str]) -> ArrivalPath:
+    """Return a path indexing the TripUpdates feed."""
+
+    def run(body: bytes) -> dict[str, StopSnapshot]:
+        index = parse_trip_updates(body)
+        return {stop_code: index.snapshot(stop_code) for stop_code in monitored}
+
+    return run
+
+
+def peak_memory(func: ArrivalPath, body: bytes) -> int:
+    """Return the peak memory allocated by a path, in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func(body)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def best_of(
+    func: ArrivalPath, body: bytes, repeat: int
+) -> tuple[float, dict[str, StopSnapshot]]:
+    """Return the fastest of `repeat` runs in seconds and the last result."""
+    timings = []
+    result = None
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(body)
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(timings), result
+
+
+def main() -> None:
+    """Compare the paths on the same arrivals."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replay", help="directory of recorded responses")
+    parser.add_argument("--stops", type=int, default=5000)
+    parser.add_argument("--arrivals", type=int, default=4)
+    parser.add_argument("--monitored", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.replay:
+        directory = Path(args.replay)
+        stop_monitoring = (directory / "StopMonitoring.json").read_bytes()
+        trip_updates = (directory / "TripUpdates.pb").read_bytes()
+        # The first stops that have predictions in the feed
+        monitored = sorted(parse_trip_updates(trip_updates).stop_times)
+        monitored = monitored[: args.monitored]
+    else:
+        codes = stop_codes(args.stops)
+        data = build_stop_monitoring("SF", codes, args.arrivals)
+        text = json.dumps(data, separators=(",", ":"))
+        stop_monitoring = codecs.BOM_UTF8 + text.encode()
+        trip_updates = build_trip_updates(codes, args.arrivals)
+        monitored = codes[: args.monitored]
+
+    if api.orjson is None:
+        print("orjson is not installed, JSON is decoded with the stdlib")  # noqa: T201
+    print(f"{len(monitored)} monitored stops")  # noqa: T201
+    baseline = None
+    for label, func, body in (
+        ("StopMonitoring json", json_path(monitored), stop_monitoring),
+        ("StopMonitoring stream", streaming_path(monitored), stop_monitoring),
+        ("TripUpdates protobuf", trip_updates_path(monitored), trip_updates),
+    ):
+        elapsed, snapshots = best_of(func, body, args.repeat)
+        peak = peak_memory(func, body)
+        baseline = baseline or elapsed
+        arrivals = sum(len(snapshot.arrivals) for snapshot in snapshots.values())
+        print(  # noqa: T201
+            f"  {label:<22} {len(body) / 1_000_000:6.2f} MB"
+            f" {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.2f}x"
+            f"  peak {peak / 1_000_000:6.1f} MB  {arrivals} arrivals"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+"""
+Local fake of the 511 transit API for offline testing and benchmarks.
+
+Serves StopMonitoring, VehicleMonitoring, GTFS-Realtime TripUpdates,
+service alerts, operators and stops responses shaped like the real 511 API,
+with configurable size, latency, BOM prefix and error injection.
+Responses saved by scripts/record_511.py can be replayed instead of the
+generated ones. Run it directly to point the integration or the scripts at
+it:
+
+    python3 scripts/fake_511_server.py --stops 500 --latency 0.5
+    python3 scripts/fake_511_server.py --replay recorded/
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable, Iterable, Sequence
+
+BOM = "\ufeff"
+LINES = ["1", "5", "14", "22", "38", "49", "J", "K", "L", "M", "N", "T"]
+DIRECTIONS = ["IB", "OB"]
+VARINT_CONTINUATION = 0x80
+
+
+def stop_codes(count: int, start: int = 10000) -> list[str]:
+    """Return `count` stop codes."""
+    return [str(start + index) for index in range(count)]
+
+
+def _iso(moment: datetime) -> str:
+    """Format a datetime the way 511 does."""
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def build_visit(agency: str, stop_code: str, index: int, now: datetime) -> dict:
+    """Build one MonitoredStopVisit."""
+    line = LINES[(int(stop_code) + index) % len(LINES)]
+    direction = DIRECTIONS[index % len(DIRECTIONS)]
+    aimed = now + timedelta(minutes=2 + index * 6)
+    expected = aimed + timedelta(seconds=(index * 37) % 180)
+    at_stop = index == 0 and int(stop_code) % 7 == 0
+    return {
+        "RecordedAtTime": _iso(now),
+        "MonitoringRef": stop_code,
+        "MonitoredVehicleJourney": {
+            "LineRef": line,
+            "DirectionRef": direction,
+            "FramedVehicleJourneyRef": {
+                "DataFrameRef": now.strftime("%Y-%m-%d"),
+                "DatedVehicleJourneyRef": f"{stop_code}{index:03d}",
+            },
+            "PublishedLineName": f"LINE {line}",
+            "OperatorRef": agency,
+            "OriginRef": "10001",
+            "OriginName": "Origin Terminal",
+            "DestinationRef": "19999",
+            "DestinationName": f"Terminal {line} {direction}",
+            "Monitored": True,
+            "InCongestion": None,
+            "VehicleLocation": {
+                "Longitude": f"{-122.4 + index * 0.001:.6f}",
+                "Latitude": f"{37.77 + index * 0.001:.6f}",
+            },
+            "Bearing": None,
+            "Occupancy": None,
+            "VehicleRef": f"{1000 + (int(stop_code) * 7 + index) % 9000}",
+            "MonitoredCall": {
+                "StopPointRef": stop_code,
+                "StopPointName": f"Stop {stop_code}",
+                "VehicleLocationAtStop": "",
+                "VehicleAtStop": "true" if at_stop else "",
+                "DestinationDisplay": f"Terminal {line}",
+                "AimedArrivalTime": _iso(aimed),
+                "ExpectedArrivalTime": _iso(expected),
+                "AimedDepartureTime": _iso(aimed),
+                "ExpectedDepartureTime": _iso(expected),
+            },
+        },
+    }
+
+
+def build_stop_monitoring(
+    agency: str,
+    codes: Iterable[str],
+    arrivals_per_stop: int = 3,
+    now: datetime | None = None,
+) -> dict:
+    """Build a StopMonitoring response for the given stops."""
+    now = now or datetime.now(UTC)
+    visits = [
+        build_visit(agency, code, index, now)
+        for code in codes
+        for index in range(arrivals_per_stop)
+    ]
+    return {
+        "ServiceDelivery": {
+            "ResponseTimestamp": _iso(now),
+            "ProducerRef": agency,
+            "Status": True,
+            "StopMonitoringDelivery": {
+                "version": "1.4",
+                "ResponseTimestamp": _iso(now),
+                "Status": True,
+                "MonitoredStopVisit": visits,
+            },
+        }
+    }
+
+
+def build_vehicle_monitoring(
+    agency: str,
+    codes: Sequence[str],
+    arrivals_per_stop: int = 3,
+    now: datetime | None = None,
+    stops_per_trip: int = 20,
+) -> dict:
+    """
+    Build a VehicleMonitoring response for the given stops.
+
+    There is one vehicle per trip of build_trip_updates, heading to the
+    first stop of its trip with the others as onward calls.
+    """
+    now = now or datetime.now(UTC)
+    activities = []
+    for index in range(arrivals_per_stop):
+        for first in range(0, len(codes), stops_per_trip):
+            trip_codes = codes[first : first + stops_per_trip]
+            line = LINES[(int(trip_codes[0]) + index) % len(LINES)]
+            expected = now + timedelta(minutes=2 + index * 6)
+            activities.append(
+                {
+                    "RecordedAtTime": _iso(now),
+                    "MonitoredVehicleJourney": {
+                        "LineRef": line,
+                        "DirectionRef": DIRECTIONS[index % len(DIRECTIONS)],
+                        "OperatorRef": agency,
+                        "DestinationName": f"Terminal {line}",
+                        "VehicleLocation": {
+                            "Longitude": f"{-122.4 + first * 0.001:.6f}",
+                            "Latitude": f"{37.77 + index * 0.001:.6f}",
+                        },
+                        "Bearing": f"{(first * 15) % 360}",
+                        "Occupancy": "seatsAvailable",
+                        "VehicleRef": f"{1000 + first + index}",
+                        "MonitoredCall": {
+                            "StopPointRef": trip_codes[0],
+                            "ExpectedArrivalTime": _iso(expected),
+                        },
+                        "OnwardCalls": {
+                            "OnwardCall": [
+                                {"StopPointRef": code} for code in trip_codes[1:]
+                            ]
+                        },
+                    },
+                }
+            )
+    return {
+        "Siri": {
+            "ServiceDelivery": {
+                "ResponseTimestamp": _iso(now),
+                "ProducerRef": agency,
+                "Status": True,
+                "VehicleMonitoringDelivery": {
+                    "version": "1.4",
+                    "ResponseTimestamp": _iso(now),
+                    "VehicleActivity": activities,
+                },
+            }
+        }
+    }
+
+
+def build_service_alerts(
+    agency: str, codes: Sequence[str], now: datetime | None = None
+) -> dict:
+    """
+    Build a servicealerts response for the given stops.
+
+    There is an alert for the first stop, one for a line and one for the
+    whole agency.
+    """
+    now = now or datetime.now(UTC)
+    start = int(now.timestamp()) - 3600
+    informed = [
+        [{"AgencyId": agency, "StopId": codes[0]}],
+        [{"AgencyId": agency, "RouteId": LINES[0]}],
+        [{"AgencyId": agency}],
+    ]
+    return {
+        "Header": {
+            "GtfsRealtimeVersion": "1.0",
+            "Incrementality": 0,
+            "Timestamp": int(now.timestamp()),
+        },
+        "Entities": [
+            {
+                "Id": f"{agency}-{index}",
+                "Alert": {
+                    "ActivePeriods": [{"Start": start, "End": start + 86400}],
+                    "InformedEntities": entities,
+                    "Cause": "CONSTRUCTION",
+                    "Effect": "DETOUR",
+                    "HeaderText": {
+                        "Translations": [{"Text": f"Alert {index}", "Language": "en"}]
+                    },
+                    "DescriptionText": {
+                        "Translations": [
+                            {"Text": f"Description of alert {index}", "Language": "en"}
+                        ]
+                    },
+                },
+            }
+            for index, entities in enumerate(informed)
+        ],
+    }
+
+
+def _varint(value: int) -> bytes:
+    """Encode a protobuf varint; negative numbers take ten bytes."""
+    value &= (1 << 64) - 1
+    out = bytearray()
+    while value >= VARINT_CONTINUATION:
+        out.append(value & 0x7F | VARINT_CONTINUATION)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _pb_int(number: int, value: int) -> bytes:
+    """Encode a varint field."""
+    return _varint(number << 3) + _varint(value)
+
+
+def _pb_bytes(number: int, value: str | bytes) -> bytes:
+    """Encode a string or embedded message field."""
+    if isinstance(value, str):
+        value = value.encode()
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def build_trip_updates(
+    codes: Sequence[str],
+    arrivals_per_stop: int = 3,
+    now: datetime | None = None,
+    stops_per_trip: int = 20,
+) -> bytes:
+    """
+    Build a GTFS-Realtime TripUpdates FeedMessage for the given stops.
+
+    Trips run along `stops_per_trip` consecutive stops, and every stop gets
+    as many arrivals at the same times as in build_stop_monitoring, so both
+    responses are the same size of data.
+    """
+    now = now or datetime.now(UTC)
+    header = _pb_bytes(1, "2.0") + _pb_int(2, 0) + _pb_int(3, int(now.timestamp()))
+    feed = [_pb_bytes(1, header)]
+    for index in range(arrivals_per_stop):
+        for first in range(0, len(codes), stops_per_trip):
+            trip_codes = codes[first : first + stops_per_trip]
+            line = LINES[(int(trip_codes[0]) + index) % len(LINES)]
+            trip_id = f"{trip_codes[0]}{index:03d}"
+            trip = _pb_bytes(1, trip_id) + _pb_bytes(5, line)
+            trip += _pb_int(6, index % len(DIRECTIONS))
+            update = _pb_bytes(1, trip)
+            for sequence, code in enumerate(trip_codes, 1):
+                aimed = now + timedelta(minutes=2 + index * 6)
+                delay = (index * 37) % 180
+                expected = int(aimed.timestamp()) + delay
+                arrival = _pb_int(1, delay) + _pb_int(2, expected)
+                departure = _pb_int(1, delay) + _pb_int(2, expected + 20)
+                update += _pb_bytes(
+                    2,
+                    _pb_int(1, sequence)
+                    + _pb_bytes(2, arrival)
+                    + _pb_bytes(3, departure)
+                    + _pb_bytes(4, code),
+                )
+            update += _pb_bytes(3, _pb_bytes(1, f"{1000 + first + index}"))
+            entity = _pb_bytes(1, trip_id) + _pb_bytes(3, update)
+            feed.append(_pb_bytes(2, entity))
+    return b"".join(feed)
+
+
+def build_stops(codes: Iterable[str]) -> dict:
+    """Build a stops catalog response."""
+    return {
+        "Contents": {
+            "dataObjects": {
+                "ScheduledStopPoint": [
+                    {
+                        "id": code,
+                        "Name": f"Stop {code}",
+                        "Location": {
+                            "Longitude": f"{-122.5 + (index % 100) * 0.002:.6f}",
+                            "Latitude": f"{37.7 + (index // 100) * 0.002:.6f}",
+                        },
+                        "Url": None,
+                        "StopType": "onstreetBus",
+                    }
+                    for index, code in enumerate(codes)
+                ]
+            }
+        }
+    }
+
+
+def build_operators(agencies: Iterable[str]) -> list[dict]:
+    """Build an operators response."""
+    return [
+        {
+            "Id": agency,
+            "Name": f"Operator {agency}",
+            "ShortName": agency,
+            "SiriOperatorRef": None,
+            "TimeZone": "America/Los_Angeles",
+            "DefaultLanguage": "en",
+            "ContactTelephoneNumber": None,
+            "WebSite": None,
+            "PrimaryMode": "bus",
+            "PrivateCode": agency,
+            "Monitored": True,
+            "OtherModes": "",
+        }
+        for agency in agencies
+    ]
+
+
+class Fake511:
+    """Fake 511 API state: payloads, knobs and request counters."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        stops: int = 50,
+        arrivals_per_stop: int = 3,
+        agencies: Iterable[str] = ("SF",),
+        latency: float = 0.0,
+        *,
+        bom: bool = True,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        rate_limit: int | None = None,
+        replay: str | Path | None = None,
+    ) -> None:
+        """Pre-build the payloads served by the fake."""
+        self.latency = latency
+        self.bom = bom
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.arrivals_per_stop = arrivals_per_stop
+        self.agencies = list(agencies)
+        self.codes = stop_codes(stops)
+        self.requests: dict[str, int] = {}
+        self.key_requests: dict[str | None, int] = {}
+        self._now = datetime.now(UTC)
+        self._bodies: dict[Hashable, str | bytes] = {}
+        self._recorded: dict[str, Any] = {}
+        if replay is not None:
+            self._load_recorded(Path(replay))
+
+    def _load_recorded(self, directory: Path) -> None:
+        """Load recorded responses and serve their stops."""
+        for endpoint in (
+            "StopMonitoring",
+            "VehicleMonitoring",
+            "servicealerts",
+            "operators",
+            "stops",
+        ):
+            path = directory / f"{endpoint}.json"
+            if path.exists():
+                self._recorded[endpoint] = json.loads(path.read_bytes())
+        path = directory / "TripUpdates.pb"
+        if path.exists():
+            self._recorded["TripUpdates"] = path.read_bytes()
+        visits = self._recorded_visits()
+        if visits:
+            codes = {
+                visit["MonitoredVehicleJourney"]["MonitoredCall"]["StopPointRef"]
+                for visit in visits
+            }
+            self.codes = sorted(codes)
+
+    def _recorded_visits(self, stop_code: str | None = None) -> list[dict] | None:
+        """Return the recorded visits, optionally for one stop only."""
+        data = self._recorded.get("StopMonitoring")
+        if data is None:
+            return None
+        visits = data["ServiceDelivery"]["StopMonitoringDelivery"]["MonitoredStopVisit"]
+        if stop_code is None:
+            return visits
+        return [
+            visit
+            for visit in visits
+            if visit["MonitoredVehicleJourney"]["MonitoredCall"]["StopPointRef"]
+            == stop_code
+        ]
+
+    def _recorded_stop_monitoring(self, stop_code: str | None) -> dict:
+        """Return the recorded StopMonitoring response, narrowed to a stop."""
+        data = self._recorded["StopMonitoring"]
+        if stop_code is None:
+            return data
+        delivery = data["ServiceDelivery"]["StopMonitoringDelivery"]
+        return {
+            "ServiceDelivery": {
+                **data["ServiceDelivery"],
+                "StopMonitoringDelivery": {
+                    **delivery,
+                    "MonitoredStopVisit": self._recorded_visits(stop_code),
+                },
+            }
+        }
+
+    def body(self, key: Hashable, build: Callable[[], Any]) -> str | bytes:
+        """Return a cached, encoded JSON body, or a protobuf body as is."""
+        if key not in self._bodies:
+            data = build()
+            if isinstance(data, bytes):
+                self._bodies[key] = data
+            else:
+                text = json.dumps(data, separators=(",", ":"))
+                self._bodies[key] = (BOM + text) if self.bom else text
+        return self._bodies[key]
+
+    async def _respond(
+        self, request: web.Request, key: Hashable, build: Callable[[], Any]
+    ) -> web.Response:
+        """Apply latency and error injection, then serve a body."""
+        endpoint = request.path.rsplit("/", 1)[-1]
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.query.get("api_key") == "invalid":
+            return web.Response(status=401, text="Invalid API key")
+        headers = {}
+        if self.rate_limit is not None:
+            # Each key has its own quota, as on 511
+            api_key = request.query.get("api_key")
+            self.key_requests[api_key] = self.key_requests.get(api_key, 0) + 1
+            remaining = self.rate_limit - self.key_requests[api_key]
+            headers["RateLimit-Limit"] = str(self.rate_limit)
+            headers["RateLimit-Remaining"] = str(max(0, remaining))
+            if remaining < 0:
+                return web.Response(status=429, text="Rate limit", headers=headers)
+        if self.error_rate and random.random() < self.error_rate:  # noqa: S311
+            return web.Response(status=self.error_status, text="Injected error")
+        body = self.body(key, build)
+        if isinstance(body, bytes):
+            return web.Response(
+                body=body,
+                content_type="application/x-google-protobuf",
+                headers=headers,
+            )
+        return web.Response(
+            text=body,
+            content_type="application/json",
+            headers=headers,
+        )
+
+    def stop_monitoring_payload(
+        self, agency: str = "SF", stop_code: str | None = None
+    ) -> dict:
+        """Return the StopMonitoring response for an agency or one stop."""
+        if "StopMonitoring" in self._recorded:
+            return self._recorded_stop_monitoring(stop_code)
+        codes = [stop_code] if stop_code else self.codes
+        return build_stop_monitoring(agency, codes, self.arrivals_per_stop, self._now)
+
+    async def stop_monitoring(self, request: web.Request) -> web.Response:
+        """Handle /StopMonitoring."""
+        agency = request.query.get("agency", "SF")
+        stop_code = request.query.get("stopcode")
+        return await self._respond(
+            request,
+            ("StopMonitoring", agency, stop_code),
+            lambda: self.stop_monitoring_payload(agency, stop_code),
+        )
+
+    async def vehicle_monitoring(self, request: web.Request) -> web.Response:
+        """Handle /VehicleMonitoring."""
+        agency = request.query.get("agency", "SF")
+        return await self._respond(
+            request,
+            ("VehicleMonitoring", agency),
+            lambda: self._recorded.get("VehicleMonitoring")
+            or build_vehicle_monitoring(
+                agency, self.codes, self.arrivals_per_stop, self._now
+            ),
+        )
+
+    async def service_alerts(self, request: web.Request) -> web.Response:
+        """Handle /servicealerts."""
+        agency = request.query.get("agency", "SF")
+        return await self._respond(
+            request,
+            ("servicealerts", agency),
+            lambda: self._recorded.get("servicealerts")
+            or build_service_alerts(agency, self.codes, self._now),
+        )
+
+    def trip_updates_payload(self) -> bytes:
+        """Return the TripUpdates feed of the fake's stops."""
+        if "TripUpdates" in self._recorded:
+            return self._recorded["TripUpdates"]
+        return build_trip_updates(self.codes, self.arrivals_per_stop, self._now)
+
+    async def trip_updates(self, request: web.Request) -> web.Response:
+        """Handle /TripUpdates."""
+        agency = request.query.get("agency", "SF")
+        return await self._respond(
+            request, ("TripUpdates", agency), self.trip_updates_payload
+        )
+
+    async def operators(self, request: web.Request) -> web.Response:
+        """Handle /operators."""
+        return await self._respond(
+            request,
+            ("operators",),
+            lambda: self._recorded.get("operators") or build_operators(self.agencies),
+        )
+
+    async def stops(self, request: web.Request) -> web.Response:
+        """Handle /stops."""
+        return await self._respond(
+            request,
+            ("stops", request.query.get("operator_id")),
+            lambda: self._recorded.get("stops") or build_stops(self.codes),
+        )
+
+    def app(self) -> web.Application:
+        """Return the aiohttp application serving this fake."""
+        app = web.Application()
+        app.router.add_get("/transit/StopMonitoring", self.stop_monitoring)
+        app.router.add_get("/transit/VehicleMonitoring", self.vehicle_monitoring)
+        app.router.add_get("/transit/TripUpdates", self.trip_updates)
+        app.router.add_get("/transit/servicealerts", self.service_alerts)
+        app.router.add_get("/transit/operators", self.operators)
+        app.router.add_get("/transit/stops", self.stops)
+        return app
+
+
+async def start_server(
+    fake: Fake511, host: str = "127.0.0.1", port: int = 0
+) -> tuple[web.AppRunner, str]:
+    """Start the fake and return the runner and its transit base URL."""
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    sockets = site._server.sockets  # noqa: SLF001
+    bound_port = sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}/transit"
+
+
+async def main() -> None:
+    """Serve the fake until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8511)
+    parser.add_argument("--stops", type=int, default=50)
+    parser.add_argument("--arrivals", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--no-bom", action="store_true")
+    parser.add_argument("--replay", help="directory of recorded responses")
+    args = parser.parse_args()
+
+    fake = Fake511(
+        stops=args.stops,
+        arrivals_per_stop=args.arrivals,
+        latency=args.latency,
+        bom=not args.no_bom,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        replay=args.replay,
+    )
+    runner, base_url = await start_server(fake, port=args.port)
+    print(f"Fake 511 API serving {len(fake.codes)} stops at {base_url}")  # noqa: T201
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Record live 511 responses for replay by the fake 511 server.
+
+Saves the agency-wide StopMonitoring and VehicleMonitoring responses, the
+agency's GTFS-Realtime TripUpdates feed and service alerts, the operators
+list and the agency's stops catalog byte for byte, BOM included. The API
+key is read from --api-key or the BAY511_API_KEY environment variable.
+
+    BAY511_API_KEY=... python3 scripts/record_511.py --agency SF --out recorded/
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+
+import aiohttp
+
+API_BASE_URL = "https://api.511.org/transit"
+
+
+async def record(  # noqa: PLR0913
+    session: aiohttp.ClientSession,
+    api_key: str,
+    endpoint: str,
+    params: dict[str, str],
+    out: Path,
+    suffix: str = "json",
+) -> None:
+    """Fetch one endpoint and save the raw body."""
+    if suffix == "json":
+        params = {"format": "json", **params}
+        headers = None
+    else:
+        headers = {"Accept": "application/x-google-protobuf"}
+    async with session.get(
+        f"{API_BASE_URL}/{endpoint}",
+        params={"api_key": api_key, **params},
+        headers=headers,
+    ) as response:
+        response.raise_for_status()
+        body = await response.read()
+    path = out / f"{endpoint}.{suffix}"
+    path.write_bytes(body)
+    print(f"{path}: {len(body) / 1000:.0f} kB")  # noqa: T201
+
+
+async def main() -> None:
+    """Record every endpoint of an agency."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--agency", default="SF")
+    parser.add_argument("--out", default="recorded")
+    parser.add_argument("--api-key", default=os.environ.get("BAY511_API_KEY"))
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error("pass --api-key or set BAY511_API_KEY")
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    async with aiohttp.ClientSession() as session:
+        await record(
+            session, args.api_key, "StopMonitoring", {"agency": args.agency}, out
+        )
+        await record(
+            session, args.api_key, "VehicleMonitoring", {"agency": args.agency}, out
+        )
+        await record(
+            session, args.api_key, "TripUpdates", {"agency": args.agency}, out, "pb"
+        )
+        await record(
+            session, args.api_key, "servicealerts", {"agency": args.agency}, out
+        )
+        await record(session, args.api_key, "operators", {}, out)
+        await record(session, args.api_key, "stops", {"operator_id": args.agency}, out)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -22,15 +22,15 @@ async def main():
             # Test with a known BART station (Embarcadero)
             print("Testing BART Embarcadero station (BA, EMBR)...")
             data = await client.async_get_stop_monitoring("BA", "EMBR")
-            print(f"Stop: {data.get('stop_name', 'Unknown')}")
-            arrivals = data.get("arrivals", [])
+            print(f"Stop: {data.stop_name or 'Unknown'}")
+            arrivals = data.arrivals
 
             if arrivals:
                 print(f"Found {len(arrivals)} arrivals:")
                 for i, arrival in enumerate(arrivals[:3], 1):
-                    mins = arrival.get("minutes_away", "Unknown")
-                    line = arrival.get("line_ref", "Unknown")
-                    dest = arrival.get("destination", "Unknown")
+                    mins = arrival.minutes_away
+                    line = arrival.line_ref
+                    dest = arrival.destination
                     print(f"  {i}. Line {line} to {dest}: {mins} minutes")
             else:
                 print("No arrivals found")
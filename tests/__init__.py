@@ -0,0 +1 @@
+"""Tests for the Bay Area 511 Transit integration."""
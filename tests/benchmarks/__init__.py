@@ -0,0 +1 @@
+"""Offline benchmarks of the integration against the fake 511 server."""
@@ -0,0 +1,171 @@
+"""Fixtures running the integration against the fake 511 server."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from fake_511_server import Fake511, start_server
+from homeassistant import bootstrap, loader
+from homeassistant.config_entries import ConfigEntries, ConfigEntry
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import HomeAssistant
+
+import custom_components.bay_511 as integration
+from custom_components.bay_511.api import Bay511ApiClient
+from custom_components.bay_511.cache import Bay511ResponseCache
+from custom_components.bay_511.const import CONF_FETCH_MODE, DOMAIN
+from custom_components.bay_511.ratelimit import Bay511RequestBudget
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine, Iterator
+    from pathlib import Path
+
+API_KEY = "benchmark"
+MAX_STOPS = 500
+
+
+@dataclass
+class FakeServer:
+    """The fake 511 and the URL it serves the transit API at."""
+
+    fake: Fake511
+    base_url: str
+
+
+class BenchmarkHomeAssistant:
+    """A Home Assistant core with the integration talking to the fake 511."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, config_dir: Path) -> None:
+        """Start the core in a configuration directory."""
+        self.loop = loop
+        self.stopped = False
+        self.hass: HomeAssistant = self.run(self._async_start(config_dir))
+
+    def run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Run a coroutine on the core's loop and return its result."""
+        return self.loop.run_until_complete(coro)
+
+    def add_entry(self, codes: list[str], fetch_mode: str) -> ConfigEntry:
+        """Set up a config entry monitoring `codes` and return it."""
+        return self.run(self._async_add_entry(codes, fetch_mode))
+
+    def count_state_writes(self, entry: ConfigEntry) -> Callable[[], dict[str, int]]:
+        """Return a callable counting the state writes made from now on."""
+        events: list[Any] = []
+        self.run(self._async_listen(events.append))
+        stats = entry.runtime_data.write_stats
+        skipped = stats.skipped
+        return lambda: {
+            "state_changes": len(events),
+            "writes_skipped": stats.skipped - skipped,
+        }
+
+    def stop(self) -> None:
+        """Stop the core."""
+        self.run(self.hass.async_stop(force=True))
+        self.stopped = True
+
+    @staticmethod
+    async def _async_start(config_dir: Path) -> HomeAssistant:
+        """Create the core on the running loop."""
+        hass = HomeAssistant(str(config_dir))
+        loader.async_setup(hass)
+        hass.config_entries = ConfigEntries(hass, {})
+        await bootstrap.async_load_base_functionality(hass)
+        # Don't let the quota or the response cache hide the cost of requests
+        domain_data = hass.data.setdefault(DOMAIN, {})
+        domain_data["budgets"] = {API_KEY: Bay511RequestBudget(limit=1_000_000)}
+        domain_data["cache"] = Bay511ResponseCache(max_entries=0)
+        return hass
+
+    async def _async_add_entry(self, codes: list[str], fetch_mode: str) -> ConfigEntry:
+        """Add and set up a config entry."""
+        entry = ConfigEntry(
+            data={
+                "api_key": API_KEY,
+                "stops": [{"agency": "SF", "stop_code": code} for code in codes],
+            },
+            discovery_keys=MappingProxyType({}),
+            domain=DOMAIN,
+            minor_version=1,
+            options={CONF_FETCH_MODE: fetch_mode},
+            source="user",
+            title="Benchmark",
+            unique_id=None,
+            version=1,
+        )
+        await self.hass.config_entries.async_add(entry)
+        await self.hass.async_block_till_done()
+        return entry
+
+    async def _async_listen(self, listener: Callable[[Any], None]) -> None:
+        """Listen for state changes."""
+        self.hass.bus.async_listen(EVENT_STATE_CHANGED, listener)
+
+
+@pytest.fixture(scope="session")
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    """Return the event loop shared by the fake 511 and Home Assistant."""
+    logging.basicConfig(level=logging.ERROR)
+    event_loop = asyncio.new_event_loop()
+    yield event_loop
+    event_loop.close()
+
+
+@pytest.fixture(scope="session")
+def fake_511(
+    request: pytest.FixtureRequest, loop: asyncio.AbstractEventLoop
+) -> Iterator[FakeServer]:
+    """Serve the fake 511 API for up to 500 stops."""
+    config = request.config
+    fake = Fake511(
+        stops=MAX_STOPS,
+        arrivals_per_stop=config.getoption("fake_arrivals"),
+        latency=config.getoption("fake_latency"),
+        bom=not config.getoption("fake_no_bom"),
+        error_rate=config.getoption("fake_error_rate"),
+        replay=config.getoption("fake_replay"),
+    )
+    runner, base_url = loop.run_until_complete(start_server(fake))
+    yield FakeServer(fake, base_url)
+    loop.run_until_complete(runner.cleanup())
+
+
+@pytest.fixture
+def hass_factory(
+    loop: asyncio.AbstractEventLoop,
+    fake_511: FakeServer,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Iterator[Callable[[], BenchmarkHomeAssistant]]:
+    """Return a factory of cores whose entries talk to the fake 511."""
+    monkeypatch.setattr(
+        integration,
+        "Bay511ApiClient",
+        functools.partial(Bay511ApiClient, base_url=fake_511.base_url),
+    )
+    started: list[BenchmarkHomeAssistant] = []
+
+    def _factory() -> BenchmarkHomeAssistant:
+        bench = BenchmarkHomeAssistant(loop, tmp_path_factory.mktemp("config"))
+        started.append(bench)
+        return bench
+
+    yield _factory
+    for bench in started:
+        if not bench.stopped:
+            bench.stop()
+
+
+@pytest.fixture
+def hass(
+    hass_factory: Callable[[], BenchmarkHomeAssistant],
+) -> BenchmarkHomeAssistant:
+    """Return a core whose entries talk to the fake 511."""
+    return hass_factory()
@@ -0,0 +1,111 @@
+"""
+Benchmarks of parsing, refreshes and setup for 1, 50 and 500 stops.
+
+Run them against the fake 511 server, save a run and compare a later one
+with it:
+
+    pytest tests/benchmarks --benchmark-save=baseline
+    pytest tests/benchmarks --benchmark-compare --fake-latency 0.05
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+
+from custom_components.bay_511.api import Bay511ApiClient
+from custom_components.bay_511.const import FETCH_MODE_AGENCY, FETCH_MODE_STOP
+
+from .conftest import API_KEY
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+    from .conftest import BenchmarkHomeAssistant, FakeServer
+
+STOPS = [1, 50, 500]
+FETCH_MODES = [FETCH_MODE_STOP, FETCH_MODE_AGENCY]
+
+
+def _check_loaded(entry: ConfigEntry) -> None:
+    """Fail the benchmark if the entry didn't set up."""
+    if entry.state is not ConfigEntryState.LOADED:
+        pytest.fail(f"Setup failed: {entry.state.value}")
+
+
+@pytest.mark.parametrize("stops", STOPS)
+def test_parse(benchmark: BenchmarkFixture, fake_511: FakeServer, stops: int) -> None:
+    """Parse an agency-wide StopMonitoring response, keeping `stops` stops."""
+    client = Bay511ApiClient(API_KEY, session=None)
+    data = fake_511.fake.stop_monitoring_payload()
+    codes = fake_511.fake.codes[:stops]
+
+    snapshots = benchmark(
+        client._parse_agency_stop_monitoring,  # noqa: SLF001
+        data,
+        codes,
+    )
+    benchmark.extra_info["arrivals"] = sum(
+        len(snapshot.arrivals) for snapshot in snapshots.values()
+    )
+
+
+@pytest.mark.parametrize("fetch_mode", FETCH_MODES)
+@pytest.mark.parametrize("stops", STOPS)
+def test_refresh(
+    benchmark: BenchmarkFixture,
+    hass: BenchmarkHomeAssistant,
+    fake_511: FakeServer,
+    stops: int,
+    fetch_mode: str,
+) -> None:
+    """Refresh every stop, from the request to the state writes."""
+    entry = hass.add_entry(fake_511.fake.codes[:stops], fetch_mode)
+    _check_loaded(entry)
+    if fetch_mode == FETCH_MODE_AGENCY:
+        refreshed = list(entry.runtime_data.agency_coordinators.values())
+    else:
+        refreshed = list(entry.runtime_data.coordinators.values())
+
+    async def _async_refresh() -> None:
+        await asyncio.gather(
+            *(coordinator.async_refresh() for coordinator in refreshed)
+        )
+
+    state_writes = hass.count_state_writes(entry)
+    benchmark(lambda: hass.run(_async_refresh()))
+    benchmark.extra_info.update(state_writes())
+
+
+@pytest.mark.parametrize("fetch_mode", FETCH_MODES)
+@pytest.mark.parametrize("stops", STOPS)
+def test_setup(
+    benchmark: BenchmarkFixture,
+    hass_factory: Callable[[], BenchmarkHomeAssistant],
+    fake_511: FakeServer,
+    stops: int,
+    fetch_mode: str,
+) -> None:
+    """Set up a config entry, including the first refreshes."""
+    codes = fake_511.fake.codes[:stops]
+    requests = fake_511.fake.requests
+
+    def _setup() -> tuple[tuple[BenchmarkHomeAssistant], dict]:
+        requests.clear()
+        return (hass_factory(),), {}
+
+    def _add_entry(bench: BenchmarkHomeAssistant) -> None:
+        _check_loaded(bench.add_entry(codes, fetch_mode))
+
+    benchmark.pedantic(
+        _add_entry,
+        setup=_setup,
+        teardown=lambda bench: bench.stop(),
+        rounds=3,
+    )
+    benchmark.extra_info["requests"] = sum(requests.values())
@@ -0,0 +1,31 @@
+"""Shared test setup."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parents[1]
+
+# The integration is imported as custom_components.bay_511, and the fake 511
+# server lives with the other scripts
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the options passed to the fake 511 server by the benchmarks."""
+    group = parser.getgroup("fake 511")
+    group.addoption("--fake-arrivals", type=int, default=8, help="arrivals per stop")
+    group.addoption(
+        "--fake-latency", type=float, default=0.0, help="seconds before responding"
+    )
+    group.addoption(
+        "--fake-error-rate", type=float, default=0.0, help="share of failed responses"
+    )
+    group.addoption(
+        "--fake-no-bom", action="store_true", help="don't prefix JSON with a BOM"
+    )
+    group.addoption(
+        "--fake-replay", help="directory of responses recorded by record_511.py"
+    )